@@ -0,0 +1,83 @@
+"""
+Benchmark de los catálogos de Netflix: explode + sort + merge por columna
+(antes) contra create_catalogs de utils en una sola pasada (después).
+
+Uso:
+    python benchmarks/bench_catalog.py [filas ...]
+Por defecto mide 10k, 100k y 1M filas con un DataFrame sintético con columnas
+de listas separadas por ', ' como cast/director/country/listed_in.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils  # noqa: E402
+
+COLUMNAS = {
+    'cast': 'actor_id',
+    'director': 'director_id',
+    'country': 'country_id',
+    'listed_in': 'genre_id',
+}
+
+
+def legacy_create_catalog(df, col_name, id_col_name):
+    """Implementación original (explode + sort + merge) usada como referencia."""
+    temp_df = df[['show_id', col_name]].copy()
+    temp_df = temp_df[temp_df[col_name].notna() & (temp_df[col_name] != 'N/A')]
+    temp_df[col_name] = temp_df[col_name].astype(str).apply(lambda x: x.split(', '))
+    exploded_df = temp_df.explode(col_name)
+    exploded_df[col_name] = exploded_df[col_name].str.strip()
+    unique_vals = exploded_df[col_name].unique()
+    catalog_df = pd.DataFrame(unique_vals, columns=['name']).sort_values('name')
+    catalog_df[id_col_name] = range(1, len(catalog_df) + 1)
+    relation_df = exploded_df.merge(catalog_df, left_on=col_name, right_on='name')
+    relation_df = relation_df[['show_id', id_col_name]]
+    return catalog_df[[id_col_name, 'name']], relation_df
+
+
+def generar_frame(n, seed=42):
+    """DataFrame sintético con listas de largo variable y valores 'N/A'."""
+    rng = np.random.default_rng(seed)
+
+    def listas(prefijo, vocabulario, maximo):
+        nombres = np.array([f"{prefijo} {i}" for i in range(vocabulario)], dtype=object)
+        largos = rng.integers(0, maximo + 1, n)
+        elegidos = nombres[rng.integers(0, vocabulario, int(largos.sum()))]
+        cortes = np.cumsum(largos)[:-1]
+        return [', '.join(grupo) if len(grupo) else 'N/A' for grupo in np.split(elegidos, cortes)]
+
+    return pd.DataFrame({
+        'show_id': [f"s{i}" for i in range(1, n + 1)],
+        'cast': listas('Actor', max(n, 10), 8),
+        'director': listas('Director', max(n // 2, 10), 2),
+        'country': listas('Country', 120, 3),
+        'listed_in': listas('Genre', 40, 3),
+    })
+
+
+def main(tamanos):
+    print(f"{'filas':>10} | {'antes (s)':>10} | {'después (s)':>12} | {'mejora':>7}")
+    print("-" * 50)
+    for n in tamanos:
+        df = generar_frame(n)
+        inicio = time.perf_counter()
+        antes = {col: legacy_create_catalog(df, col, id_col) for col, id_col in COLUMNAS.items()}
+        t_antes = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        despues = utils.create_catalogs(df, COLUMNAS)
+        t_despues = time.perf_counter() - inicio
+        for col in COLUMNAS:
+            for a, b in zip(antes[col], despues[col]):
+                if not a.reset_index(drop=True).equals(b):
+                    raise SystemExit(f"ERROR: el catálogo '{col}' difiere para {n} filas")
+        print(f"{n:>10} | {t_antes:>10.3f} | {t_despues:>12.3f} | {t_antes / t_despues:>6.1f}x")
+
+
+if __name__ == "__main__":
+    tamanos = [int(x) for x in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    main(tamanos)
@@ -0,0 +1,81 @@
+"""
+Benchmark de lectura de los tres CSV: pd.read_csv sin parámetros (antes) contra
+utils.load_data con el esquema de cada dataset (después) y, si está instalado
+pyarrow, con CSV_ENGINE=pyarrow.
+
+Uso:
+    python benchmarks/bench_load.py [filas ...]
+Por defecto mide 50k y 200k filas por dataset con los CSV sintéticos de
+generadores.py (mismas columnas que netflix_titles.csv, data.csv y dataset.csv).
+Para cada lectura reporta el tiempo de parseo, el pico de memoria (tracemalloc;
+no ve la memoria interna de pyarrow) y la memoria final del DataFrame
+(memory_usage(deep=True)).
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils  # noqa: E402
+import normalize_netflix  # noqa: E402
+import normalize_ecommerce  # noqa: E402
+import normalize_hospital  # noqa: E402
+from generadores import generar_netflix, generar_ecommerce, generar_hospital  # noqa: E402
+
+MB = 1024 * 1024
+
+
+DATASETS = [
+    ('netflix', generar_netflix, normalize_netflix.ESQUEMA),
+    ('ecommerce', generar_ecommerce, normalize_ecommerce.ESQUEMA),
+    ('hospital', generar_hospital, normalize_hospital.ESQUEMA),
+]
+
+
+def medir(fn):
+    """Ejecuta fn y retorna (DataFrame, segundos, pico MB)."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    df = fn()
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, segundos, pico / MB
+
+
+def main(tamanos):
+    try:
+        import pyarrow  # noqa: F401
+        motores = [None, 'pyarrow']
+    except ImportError:
+        motores = [None]
+
+    print(f"{'dataset':>10} | {'filas':>8} | {'lectura':>16} | {'tiempo (s)':>10} | "
+          f"{'pico (MB)':>9} | {'df (MB)':>8}")
+    print("-" * 78)
+    with tempfile.TemporaryDirectory() as tmp:
+        for nombre, generar, esquema in DATASETS:
+            for n in tamanos:
+                ruta = os.path.join(tmp, f"{nombre}_{n}.csv")
+                generar(n, np.random.default_rng(42)).to_csv(ruta, index=False)
+
+                lecturas = [('read_csv', lambda: pd.read_csv(ruta))]
+                for motor in motores:
+                    etiqueta = f"esquema ({motor or 'c'})"
+                    lecturas.append((etiqueta, lambda motor=motor: utils.load_data(ruta, schema=esquema,
+                                                                                  engine=motor)))
+                for etiqueta, fn in lecturas:
+                    df, segundos, pico = medir(fn)
+                    memoria = df.memory_usage(deep=True).sum() / MB
+                    print(f"{nombre:>10} | {n:>8} | {etiqueta:>16} | {segundos:>10.3f} | "
+                          f"{pico:>9.1f} | {memoria:>8.1f}")
+
+
+if __name__ == "__main__":
+    tamanos = [int(x) for x in sys.argv[1:]] or [50_000, 200_000]
+    main(tamanos)
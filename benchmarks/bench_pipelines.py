@@ -0,0 +1,215 @@
+"""
+Benchmark por etapa de los tres pipelines con los CSV sintéticos de
+generadores.py, a varios tamaños, con comparación contra una línea base.
+
+Uso:
+    python benchmarks/bench_pipelines.py [filas ...] [--datasets netflix,hospital]
+                                         [--repeticiones 3] [--guardar-base]
+                                         [--base benchmarks/baseline.json] [--umbral 0.15]
+Por defecto mide 10k y 100k filas por dataset. Cada etapa se ejecuta
+--repeticiones veces sobre una copia de su entrada y se reporta el mejor tiempo:
+
+- carga: load_data + la limpieza de cada script (hospital: cargar_y_limpiar)
+- normalizacion: PLAN.normalize del spec del script (catálogos, entidades,
+  mediciones despivotadas, agregados)
+- sql: PLAN.write (DDL + datos) con SqlWriter
+
+La etapa sql escribe en un directorio temporal con SQL_OUTPUT_FORMAT,
+SQL_BATCH_SIZE y SQL_COMPRESSION del entorno. Con --guardar-base los resultados
+se guardan como línea base; sin él se comparan con la línea base (si existe) y
+el script termina con código 1 si alguna etapa empeoró más que --umbral.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils  # noqa: E402
+import normalize_netflix  # noqa: E402
+import normalize_ecommerce  # noqa: E402
+import normalize_hospital  # noqa: E402
+from generadores import GENERADORES, escribir_csv  # noqa: E402
+
+BASE_POR_DEFECTO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Diferencias menores a esto se consideran ruido aunque superen el umbral relativo
+RUIDO_S = 0.005
+
+def opciones_sql():
+    return utils.get_output_format(), utils.get_batch_size(), utils.get_compression()
+
+
+def escribir_tablas(modulo, tablas, carpeta):
+    """Escribe {tabla: df} con el PLAN del script, como lo hacen los scripts, y retorna la ruta."""
+    output_format, batch_size, compression = opciones_sql()
+    nombre = modulo.PLAN.dataset
+    with utils.SqlWriter(os.path.join(carpeta, f"{nombre}.sql"), compression) as sql:
+        sql.write("BEGIN;\n")
+        modulo.PLAN.write(sql, tablas, output_format, batch_size, os.path.join(carpeta, nombre))
+        sql.write("\nCOMMIT;\n")
+    return sql.path
+
+
+# --- Etapas: cada una recibe la salida de la anterior (la primera, la ruta del CSV) ---
+
+def netflix_carga(ruta):
+    # Igual que cargar() en normalize_netflix.main
+    df = utils.load_data(ruta, schema=normalize_netflix.ESQUEMA, engine=utils.get_csv_engine())
+    df = utils.clean_text_columns(df, ['director', 'cast', 'country', 'rating', 'date_added', 'duration'])
+    df['release_year'] = df['release_year'].fillna(0).astype(int)
+    return df
+
+
+def ecommerce_carga(ruta):
+    df = utils.load_data(ruta, schema=normalize_ecommerce.ESQUEMA, engine=utils.get_csv_engine())
+    return normalize_ecommerce.clean_ecommerce_specific(df)
+
+
+def etapas(modulo, carga):
+    return [
+        ('carga', lambda ruta, carpeta: carga(ruta)),
+        ('normalizacion', lambda df, carpeta: modulo.PLAN.normalize(df)),
+        ('sql', lambda tablas, carpeta: escribir_tablas(modulo, tablas, carpeta)),
+    ]
+
+
+ETAPAS = {
+    'netflix': etapas(normalize_netflix, netflix_carga),
+    'ecommerce': etapas(normalize_ecommerce, ecommerce_carga),
+    'hospital': etapas(normalize_hospital, normalize_hospital.cargar_y_limpiar),
+}
+
+
+def copiar(valor):
+    """Copia los DataFrames de la entrada: varias etapas modifican su entrada."""
+    if isinstance(valor, pd.DataFrame):
+        return valor.copy()
+    if isinstance(valor, dict):
+        return {k: copiar(v) for k, v in valor.items()}
+    if isinstance(valor, tuple):
+        return tuple(copiar(v) for v in valor)
+    return valor
+
+
+def medir_dataset(dataset, n, repeticiones, carpeta):
+    """Genera el CSV, ejecuta las etapas en cadena y retorna {etapa: mejor tiempo}."""
+    ruta = escribir_csv(dataset, n, carpeta)
+    tiempos = {}
+    valor = ruta
+    for etapa, fn in ETAPAS[dataset]:
+        mejor = None
+        for _ in range(repeticiones):
+            entrada = copiar(valor)
+            # Los pipelines imprimen su progreso: se descarta para no mezclarlo con la tabla
+            with contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                salida = fn(entrada, carpeta)
+                segundos = time.perf_counter() - inicio
+            mejor = segundos if mejor is None else min(mejor, segundos)
+        tiempos[etapa] = round(mejor, 6)
+        valor = salida
+    return tiempos
+
+
+def metadatos():
+    output_format, batch_size, compression = opciones_sql()
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'maquina': platform.platform(),
+        'cpus': os.cpu_count(),
+        'sql': {'formato': output_format, 'batch_size': batch_size, 'compresion': compression},
+        'csv_engine': utils.get_csv_engine(),
+    }
+
+
+def comparar(actual, base, umbral):
+    """Imprime la diferencia contra la línea base y retorna las regresiones encontradas."""
+    if base['meta'] != actual['meta']:
+        print("Advertencia: la línea base se midió con otro entorno u otras opciones:")
+        for clave in sorted(set(base['meta']) | set(actual['meta'])):
+            if base['meta'].get(clave) != actual['meta'].get(clave):
+                print(f"  {clave}: {base['meta'].get(clave)} -> {actual['meta'].get(clave)}")
+
+    regresiones = []
+    print(f"\n{'dataset':>10} | {'filas':>8} | {'etapa':>13} | {'base (s)':>9} | {'actual (s)':>10} | {'cambio':>8}")
+    print("-" * 75)
+    for dataset, por_tamano in actual['resultados'].items():
+        for n, etapas in por_tamano.items():
+            previas = base['resultados'].get(dataset, {}).get(n)
+            if previas is None:
+                continue
+            for etapa, segundos in etapas.items():
+                previo = previas.get(etapa)
+                if previo is None:
+                    continue
+                cambio = (segundos - previo) / previo if previo else 0.0
+                marca = ''
+                if cambio > umbral and segundos - previo > RUIDO_S:
+                    marca = '  REGRESIÓN'
+                    regresiones.append((dataset, n, etapa, previo, segundos))
+                print(f"{dataset:>10} | {n:>8} | {etapa:>13} | {previo:>9.3f} | {segundos:>10.3f} | "
+                      f"{cambio:>+7.0%}{marca}")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark por etapa de los tres pipelines.")
+    parser.add_argument('filas', nargs='*', type=int, default=[10_000, 100_000])
+    parser.add_argument('--datasets', default=','.join(GENERADORES))
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--base', default=BASE_POR_DEFECTO, help="archivo JSON de la línea base")
+    parser.add_argument('--guardar-base', action='store_true', help="guarda los resultados como línea base")
+    parser.add_argument('--umbral', type=float, default=0.15,
+                        help="empeoramiento relativo que se marca como regresión (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    datasets = [d.strip() for d in args.datasets.split(',') if d.strip()]
+    desconocidos = [d for d in datasets if d not in ETAPAS]
+    if desconocidos:
+        parser.error(f"datasets desconocidos {desconocidos}; opciones: {list(ETAPAS)}")
+
+    actual = {'meta': metadatos(), 'resultados': {}}
+    print(f"{'dataset':>10} | {'filas':>8} | {'etapa':>13} | {'tiempo (s)':>10} | {'filas/s':>12}")
+    print("-" * 66)
+    for dataset in datasets:
+        for n in args.filas:
+            with tempfile.TemporaryDirectory() as carpeta:
+                tiempos = medir_dataset(dataset, n, max(1, args.repeticiones), carpeta)
+            # Las claves del JSON son texto: el tamaño se guarda como str para comparar
+            actual['resultados'].setdefault(dataset, {})[str(n)] = tiempos
+            for etapa, segundos in tiempos.items():
+                print(f"{dataset:>10} | {n:>8} | {etapa:>13} | {segundos:>10.3f} | "
+                      f"{n / segundos if segundos else 0:>12,.0f}")
+
+    if args.guardar_base:
+        with open(args.base, 'w', encoding='utf-8') as f:
+            json.dump(actual, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nLínea base guardada en {args.base}")
+        return 0
+
+    if not os.path.exists(args.base):
+        print(f"\nSin línea base en {args.base}: ejecutar con --guardar-base para crearla.")
+        return 0
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    regresiones = comparar(actual, base, args.umbral)
+    if regresiones:
+        print(f"\n{len(regresiones)} etapas empeoraron más de {args.umbral:.0%}.")
+        return 1
+    print("\nSin regresiones respecto a la línea base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Benchmark de df_to_sql_insert: renderizado clásico con iterrows (antes) contra
+el renderizado por columnas de utils (después).
+
+Uso:
+    python benchmarks/bench_sql_insert.py [filas ...]
+Por defecto mide 10k, 100k y 1M filas con un DataFrame sintético con la forma
+de la tabla Order_Details/Invoices de e-commerce.
+"""
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils  # noqa: E402
+
+
+def legacy_df_to_sql_insert(df, table_name):
+    """Implementación original (fila por fila) usada como referencia."""
+    statements = []
+    statements.append(f"\n-- Datos para tabla: {table_name} --")
+    for _, row in df.iterrows():
+        vals = []
+        for v in row:
+            if pd.isna(v):
+                vals.append("NULL")
+            elif isinstance(v, str):
+                clean_str = v.replace("'", "''")
+                vals.append(f"'{clean_str}'")
+            elif isinstance(v, (datetime.date, datetime.time, pd.Timestamp)):
+                vals.append(f"'{v}'")
+            else:
+                vals.append(str(v))
+        val_str = ", ".join(vals)
+        statements.append(f"INSERT INTO {table_name} VALUES ({val_str}) ON CONFLICT DO NOTHING;")
+    return "\n".join(statements)
+
+
+def generar_frame(n, seed=42):
+    """DataFrame sintético con texto (con comillas), enteros, floats, nulos, fechas y horas."""
+    rng = np.random.default_rng(seed)
+    fechas = pd.Timestamp('2010-12-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, n), unit='min')
+    descripciones = np.array(["WHITE HANGING HEART", "JUMBO BAG 'RED'", "PARTY BUNTING", None], dtype=object)
+    return pd.DataFrame({
+        'InvoiceNo': rng.integers(536365, 581587, n).astype(str),
+        'Description': descripciones[rng.integers(0, len(descripciones), n)],
+        'Quantity': rng.integers(1, 100, n),
+        'UnitPrice': np.where(rng.random(n) < 0.01, np.nan, np.round(rng.random(n) * 20, 2)),
+        'Date': fechas.date,
+        'Time': fechas.time,
+    })
+
+
+def casos_borde():
+    """
+    Frames pequeños donde el renderizado por columnas debe seguir a iterrows:
+    timestamps a medianoche o con fracciones, float32, fechas/horas con nulos, etc.
+    """
+    medianoche = pd.to_datetime(['2020-01-01', '2020-01-02', None])
+    con_hora = pd.to_datetime(['2020-01-01 08:26', '2020-01-02 10:00:00.5', None], format='mixed')
+    float32 = np.array([0.1, 2.5, np.nan], dtype=np.float32)
+    return {
+        'timestamp a medianoche': pd.DataFrame({'a': medianoche}),
+        'timestamp a medianoche + texto': pd.DataFrame({'a': medianoche, 's': ['x', 'y', 'z']}),
+        'timestamp con fracciones': pd.DataFrame({'a': con_hora, 's': ['x', 'y', 'z']}),
+        'timestamp con zona horaria': pd.DataFrame({'a': con_hora.tz_localize('UTC'), 's': ['x', 'y', 'z']}),
+        'float32': pd.DataFrame({'a': float32}),
+        'float32 + int': pd.DataFrame({'a': float32, 'b': [1, 2, 3]}),
+        'float32 + texto': pd.DataFrame({'a': float32, 's': ['x', 'y', 'z']}),
+        'fechas con None': pd.DataFrame({'d': [datetime.date(2020, 1, 1), None, datetime.date(2020, 1, 3)],
+                                         's': ['x', 'y', 'z']}),
+        'horas con None': pd.DataFrame({'t': [datetime.time(8, 26), None, datetime.time(9, 0, 0, 500)]}),
+        'int + float': pd.DataFrame({'a': [1, 2, 3], 'b': [0.5, np.nan, 2.0]}),
+        'bool + texto': pd.DataFrame({'a': [True, False, True], 's': ['x', 'y', None]}),
+        'category': pd.DataFrame({'a': pd.Categorical(['x', None, "O'R"]), 'b': [1, 2, 3]}),
+        'string': pd.DataFrame({'a': pd.array(['x', None, 'y'], dtype='string'), 'b': [1, 2, 3]}),
+    }
+
+
+def verificar_casos_borde():
+    """Termina con error si algún caso borde no es idéntico byte a byte a iterrows."""
+    distintos = [nombre for nombre, df in casos_borde().items()
+                 if legacy_df_to_sql_insert(df, 'bench') != utils.df_to_sql_insert(df, 'bench')]
+    if distintos:
+        raise SystemExit(f"ERROR: la salida difiere en: {', '.join(distintos)}")
+
+
+def medir(func, df):
+    inicio = time.perf_counter()
+    resultado = func(df, 'bench')
+    return time.perf_counter() - inicio, resultado
+
+
+def main(tamanos):
+    verificar_casos_borde()
+    print(f"{'filas':>10} | {'antes (filas/s)':>16} | {'después (filas/s)':>18} | {'mejora':>7}")
+    print("-" * 62)
+    for n in tamanos:
+        df = generar_frame(n)
+        t_antes, sql_antes = medir(legacy_df_to_sql_insert, df)
+        t_despues, sql_despues = medir(utils.df_to_sql_insert, df)
+        if sql_antes != sql_despues:
+            raise SystemExit(f"ERROR: la salida difiere para {n} filas")
+        print(f"{n:>10} | {n / t_antes:>16,.0f} | {n / t_despues:>18,.0f} | {t_antes / t_despues:>6.1f}x")
+
+
+if __name__ == "__main__":
+    tamanos = [int(x) for x in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    main(tamanos)
@@ -0,0 +1,81 @@
+"""
+Benchmark de memoria: script SQL acumulado en memoria (df_to_sql_insert +
+write_sql_file) contra la escritura en streaming de utils.SqlWriter.
+
+Uso:
+    python benchmarks/bench_sql_writer.py [filas ...]
+Mide con tracemalloc el pico de memoria asignado durante la generación del
+script (sin contar el DataFrame de entrada). Con SqlWriter el pico debe
+mantenerse acotado aunque crezca el tamaño del archivo generado.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils  # noqa: E402
+
+
+def generar_frame(n, seed=42):
+    """DataFrame sintético con la forma de Order_Details (texto, enteros y floats)."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'InvoiceNo': rng.integers(536365, 581587, n).astype(str),
+        'StockCode': rng.integers(10000, 90000, n).astype(str),
+        'Quantity': rng.integers(1, 100, n),
+        'UnitPrice': np.round(rng.random(n) * 20, 2),
+    })
+
+
+def escribir_en_memoria(df, ruta):
+    sql_parts = ["BEGIN;\n", utils.df_to_sql_insert(df, 'Order_Details'), "\nCOMMIT;"]
+    utils.write_sql_file(sql_parts, ruta)
+
+
+def escribir_en_streaming(df, ruta, compression=None):
+    with utils.SqlWriter(ruta, compression, verbose=False) as sql:
+        sql.write("BEGIN;\n")
+        sql.write_table(df, 'Order_Details')
+        sql.write("\nCOMMIT;\n")
+        return sql.path
+
+
+def medir(func, *args):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    func(*args)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return segundos, pico / 2**20
+
+
+def main(tamanos):
+    print(f"{'filas':>10} | {'archivo (MB)':>12} | {'pico lista (MB)':>15} | "
+          f"{'pico streaming (MB)':>19} | {'pico gzip (MB)':>14}")
+    print("-" * 84)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'bench.sql')
+        for n in tamanos:
+            df = generar_frame(n)
+            stdout = sys.stdout
+            sys.stdout = open(os.devnull, 'w')  # silenciar los prints de write_sql_file
+            try:
+                _, pico_lista = medir(escribir_en_memoria, df, ruta)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            tamano = os.path.getsize(ruta) / 2**20
+            _, pico_stream = medir(escribir_en_streaming, df, ruta)
+            _, pico_gzip = medir(escribir_en_streaming, df, ruta, 'gzip')
+            print(f"{n:>10} | {tamano:>12.1f} | {pico_lista:>15.1f} | {pico_stream:>19.1f} | {pico_gzip:>14.1f}")
+
+
+if __name__ == "__main__":
+    tamanos = [int(x) for x in sys.argv[1:]] or [100_000, 500_000, 1_000_000]
+    main(tamanos)
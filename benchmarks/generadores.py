@@ -0,0 +1,183 @@
+"""
+Generadores sintéticos (con semilla) de los tres CSV de raw/, para medir sin los
+archivos reales. Escalan a cualquier número de filas y reproducen la forma que
+importa para el rendimiento:
+
+- netflix_titles.csv: listas separadas por ', ' en cast / director / country /
+  listed_in (largo variable, con nulos) y vocabularios que crecen con n.
+- data.csv: líneas de factura con InvoiceNo / StockCode repetidos, facturas
+  canceladas ('C...'), CustomerID nulo (~25%), descripciones con comillas y
+  ~1% de filas duplicadas.
+- dataset.csv: columnas base del paciente / UCI / diagnóstico, cientos de
+  columnas d1_ / h1_ (~30% nulas) y la columna basura 'Unnamed: 83'.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+MESES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+         'August', 'September', 'October', 'November', 'December']
+
+VARIABLES_HOSPITAL = [
+    'albumin', 'bilirubin', 'bun', 'calcium', 'creatinine', 'glucose', 'hco3', 'hemaglobin',
+    'hematocrit', 'inr', 'lactate', 'platelets', 'potassium', 'sodium', 'wbc', 'arterial_pco2',
+    'arterial_ph', 'arterial_po2', 'pao2fio2ratio', 'diasbp', 'diasbp_invasive', 'diasbp_noninvasive',
+    'heartrate', 'mbp', 'mbp_invasive', 'mbp_noninvasive', 'resprate', 'spo2', 'sysbp',
+    'sysbp_invasive', 'sysbp_noninvasive', 'temp', 'calcium_ionized', 'magnesium', 'phosphorus',
+    'chloride', 'ast', 'alt', 'troponin', 'fio2',
+]
+
+
+def listas(rng, n, prefijo, vocabulario, maximo, vacio=None):
+    """n textos 'Prefijo i, Prefijo j, ...' de 0..maximo elementos (vacío -> `vacio`)."""
+    nombres = np.array([f"{prefijo} {i}" for i in range(vocabulario)], dtype=object)
+    largos = rng.integers(0, maximo + 1, n)
+    elegidos = nombres[rng.integers(0, vocabulario, int(largos.sum()))]
+    cortes = np.cumsum(largos)[:-1]
+    return [', '.join(grupo) if len(grupo) else vacio for grupo in np.split(elegidos, cortes)]
+
+
+def generar_netflix(n, rng):
+    ids = np.arange(1, n + 1)
+    anios = rng.integers(2008, 2022, n)
+    fechas = [f"{MESES[m]} {d}, {a}" for m, d, a in zip(rng.integers(0, 12, n), rng.integers(1, 29, n), anios)]
+    fechas = np.array(fechas, dtype=object)
+    fechas[rng.random(n) < 0.01] = None
+    return pd.DataFrame({
+        'show_id': [f"s{i}" for i in ids],
+        'type': rng.choice(['Movie', 'TV Show'], n, p=[0.7, 0.3]),
+        'title': [f"Title {i}" for i in ids],
+        'director': listas(rng, n, 'Director', max(n // 2, 10), 2),
+        'cast': listas(rng, n, 'Actor', max(n * 4, 10), 10),
+        'country': listas(rng, n, 'Country', 120, 3),
+        'date_added': fechas,
+        'release_year': np.minimum(anios, rng.integers(1950, 2022, n)),
+        'rating': rng.choice(['TV-MA', 'TV-14', 'PG-13', 'R', 'PG', 'TV-PG', 'TV-Y7', None], n),
+        'duration': rng.choice([f"{m} min" for m in range(60, 200)] + [f"{s} Seasons" for s in range(2, 10)]
+                               + ['1 Season'], n),
+        'listed_in': listas(rng, n, 'Genre', 40, 3, vacio='International Movies'),
+        'description': [f"A \"story\" about show {i}, with its twists." for i in ids],
+    })
+
+
+def generar_ecommerce(n, rng):
+    n_facturas = max(n // 20, 1)
+    n_productos = max(min(n // 10, 4000), 1)
+    n_clientes = max(min(n // 50, 4400), 1)
+
+    # Atributos por factura: cliente (nulo ~25%), fecha y cancelación
+    cliente_factura = rng.integers(12346, 12346 + n_clientes, n_facturas).astype(float)
+    cliente_factura[rng.random(n_facturas) < 0.25] = np.nan
+    minutos = rng.integers(0, 373 * 24 * 60, n_facturas)
+    fecha_factura = (pd.Timestamp('2010-12-01 08:00') + pd.to_timedelta(minutos, unit='min'))
+    fecha_factura = [f"{t.month}/{t.day}/{t.year} {t.hour}:{t.minute:02d}" for t in fecha_factura]
+    numero_factura = np.array([f"{536365 + i}" for i in range(n_facturas)], dtype=object)
+    canceladas = rng.random(n_facturas) < 0.02
+    numero_factura[canceladas] = 'C' + numero_factura[canceladas]
+
+    # Atributos por producto: código alfanumérico, descripción (nula ~0.3%) y precio
+    codigos = np.array([f"{10000 + i}{'ABC'[i % 3] if i % 5 == 0 else ''}" for i in range(n_productos)],
+                       dtype=object)
+    descripciones = np.array([f"PRODUCT'S {i} {'RED' if i % 2 else 'WHITE'}" for i in range(n_productos)],
+                             dtype=object)
+    descripciones[rng.random(n_productos) < 0.003] = None
+    precios = np.round(rng.gamma(2.0, 2.0, n_productos), 2)
+    paises = np.array(['United Kingdom'] * 8 + ['France', 'Germany', 'EIRE', 'Spain', 'Netherlands'], dtype=object)
+    pais_cliente = paises[rng.integers(0, len(paises), n_clientes)]
+
+    factura = np.sort(rng.integers(0, n_facturas, n))
+    producto = rng.integers(0, n_productos, n)
+    cantidad = rng.integers(1, 50, n)
+    cantidad[canceladas[factura]] *= -1
+    cliente = cliente_factura[factura]
+    pais = np.where(np.isnan(cliente), 'United Kingdom',
+                    pais_cliente[np.nan_to_num(cliente - 12346).astype(int) % n_clientes])
+
+    df = pd.DataFrame({
+        'InvoiceNo': numero_factura[factura],
+        'StockCode': codigos[producto],
+        'Description': descripciones[producto],
+        'Quantity': cantidad,
+        'InvoiceDate': np.array(fecha_factura, dtype=object)[factura],
+        'UnitPrice': precios[producto],
+        'CustomerID': cliente,
+        'Country': pais,
+    })
+    # ~1% de filas exactamente duplicadas (el drop_duplicates de normalize_ecommerce las quita)
+    orden = np.arange(n)
+    duplicadas = rng.random(n) < 0.01
+    orden[duplicadas] = rng.integers(0, n, int(duplicadas.sum()))
+    return df.iloc[np.sort(orden)].reset_index(drop=True)
+
+
+def columnas_medicion(metricas):
+    """Nombres d1_/h1_<variable>_max/min como los de dataset.csv (metricas columnas)."""
+    nombres = []
+    for prefijo in ('d1', 'h1'):
+        for variable in VARIABLES_HOSPITAL:
+            for sufijo in ('max', 'min'):
+                nombres.append(f"{prefijo}_{variable}_{sufijo}")
+    i = 0
+    while len(nombres) < metricas:
+        nombres.append(f"d1_extra{i}_max")
+        i += 1
+    # Alternar d1_ / h1_ para que las columnas no queden agrupadas por prefijo
+    return sorted(nombres[:metricas], key=lambda c: (c.split('_', 1)[1], c))
+
+
+def generar_hospital(n, rng, metricas=160):
+    n_icu = max(min(n // 100, 1000), 1)
+    icu_id = rng.integers(1, n_icu + 1, n)
+    icu_tipos = np.array(['Med-Surg ICU', 'CCU-CTICU', 'MICU', 'Neuro ICU', 'SICU', 'CSICU'], dtype=object)
+    diagnosticos = np.round(rng.random(max(min(n // 200, 400), 1)) * 1000 + 100, 2)
+    sistemas = np.array(['Cardiovascular', 'Neurological', 'Sepsis', 'Respiratory', 'Trauma', None],
+                        dtype=object)
+    diagnostico = rng.integers(0, len(diagnosticos), n)
+
+    df = pd.DataFrame({
+        'encounter_id': rng.permutation(np.arange(1, n + 1) * 3 + 66000),
+        # Algunos pacientes con más de un encuentro
+        'patient_id': rng.integers(1, max(int(n * 1.2), 2), n),
+        'hospital_id': (icu_id % 200) + 1,
+        'age': np.where(rng.random(n) < 0.05, np.nan, rng.integers(16, 90, n)),
+        'bmi': np.where(rng.random(n) < 0.04, np.nan, np.round(rng.normal(29, 8, n), 6)),
+        'elective_surgery': rng.integers(0, 2, n),
+        'ethnicity': rng.choice(['Caucasian', 'African American', 'Hispanic', 'Asian', 'Other/Unknown', None], n),
+        'gender': rng.choice(['M', 'F', None], n, p=[0.54, 0.455, 0.005]),
+        'height': np.round(rng.normal(169, 10, n), 1),
+        'hospital_admit_source': rng.choice(['Floor', 'Emergency Department', 'Operating Room', None], n),
+        'icu_admit_source': rng.choice(['Floor', 'Accident & Emergency', 'Operating Room / Recovery'], n),
+        'icu_id': icu_id,
+        'icu_stay_type': rng.choice(['admit', 'transfer', 'readmit'], n, p=[0.95, 0.04, 0.01]),
+        'icu_type': icu_tipos[icu_id % len(icu_tipos)],
+        'pre_icu_los_days': np.round(rng.exponential(0.8, n), 6),
+        'weight': np.round(rng.normal(84, 25, n), 1),
+        'apache_2_diagnosis': rng.integers(100, 400, n).astype(float),
+        'apache_3j_diagnosis': diagnosticos[diagnostico],
+        'hospital_death': (rng.random(n) < 0.09).astype(int),
+    })
+    medidas = np.round(rng.random((n, metricas)) * 200, 1)
+    medidas[rng.random((n, metricas)) < 0.3] = np.nan
+    df = pd.concat([df, pd.DataFrame(medidas, columns=columnas_medicion(metricas))], axis=1)
+    df['apache_4a_hospital_death_prob'] = np.round(rng.random(n), 2)
+    df['apache_3j_bodysystem'] = sistemas[diagnostico % len(sistemas)]
+    df['apache_2_bodysystem'] = rng.choice(['Cardiovascular', 'Neurologic', 'Respiratory', None], n)
+    df['Unnamed: 83'] = np.nan
+    return df
+
+
+# Nombre del CSV real en raw/ y generador de cada dataset
+GENERADORES = {
+    'netflix': ('netflix_titles.csv', generar_netflix),
+    'ecommerce': ('data.csv', generar_ecommerce),
+    'hospital': ('dataset.csv', generar_hospital),
+}
+
+
+def escribir_csv(dataset, n, carpeta, seed=42):
+    """Genera el CSV sintético de `dataset` con n filas en carpeta y retorna su ruta."""
+    archivo, generar = GENERADORES[dataset]
+    ruta = os.path.join(carpeta, archivo)
+    generar(n, np.random.default_rng(seed)).to_csv(ruta, index=False)
+    return ruta
@@ -0,0 +1,115 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# --- REGISTRO PERSISTENTE DE IDS DE CATÁLOGO ---
+# Guarda entre ejecuciones la asignación nombre -> ID de cada catálogo (actores,
+# directores, países, géneros) y los pares de relación ya emitidos, en una base
+# SQLite dentro de sql/state/. Los nombres registrados conservan su ID y los nuevos
+# se agregan a continuación del máximo, así una ejecución solo emite las filas
+# nuevas de catálogos y relaciones en lugar de recargar todo.
+
+def registry_enabled():
+    """True si CATALOG_REGISTRY está activado (1 / true / si)."""
+    return os.environ.get('CATALOG_REGISTRY', '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+def open_registry(state_dir, dataset, force=False):
+    """
+    Abre el registro del dataset si CATALOG_REGISTRY está activado (o force, lo usa
+    el modo delta); si no, None.
+    """
+    if not (force or registry_enabled()):
+        return None
+    return CatalogRegistry(os.path.join(state_dir, f"{dataset}_catalogos.sqlite"))
+
+class CatalogRegistry:
+    """
+    Registro de IDs de catálogo en SQLite. Los cambios de delta() quedan en una
+    transacción abierta hasta commit(): si el script falla antes de terminar de
+    escribir el .sql, el registro no avanza.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS catalogos (
+                tabla TEXT NOT NULL, name TEXT NOT NULL, id INTEGER NOT NULL,
+                PRIMARY KEY (tabla, name));
+            CREATE TABLE IF NOT EXISTS relaciones (
+                tabla TEXT NOT NULL, clave TEXT NOT NULL, id INTEGER NOT NULL,
+                PRIMARY KEY (tabla, clave, id));
+        """)
+
+    def _asignar_ids(self, tabla, catalog_df, id_col):
+        # IDs estables: los nombres conocidos mantienen el suyo y los nuevos
+        # (en el orden de catalog_df, es decir alfabético) siguen al máximo
+        existentes = dict(self.conn.execute("SELECT name, id FROM catalogos WHERE tabla = ?", (tabla,)))
+        siguiente = max(existentes.values(), default=0) + 1
+
+        nombres = catalog_df['name'].to_numpy(dtype=object)
+        es_nuevo = np.fromiter((n not in existentes for n in nombres), dtype=bool, count=len(nombres))
+        estables = np.empty(len(nombres), dtype=np.int64)
+        estables[~es_nuevo] = [existentes[n] for n in nombres[~es_nuevo]]
+        estables[es_nuevo] = np.arange(siguiente, siguiente + int(es_nuevo.sum()))
+
+        self.conn.executemany(
+            "INSERT INTO catalogos (tabla, name, id) VALUES (?, ?, ?)",
+            ((tabla, n, int(i)) for n, i in zip(nombres[es_nuevo], estables[es_nuevo])),
+        )
+
+        # mapa[id_de_esta_ejecucion] -> id estable
+        ids = catalog_df[id_col].to_numpy()
+        mapa = np.zeros(int(ids.max()) + 1 if len(ids) else 1, dtype=np.int64)
+        mapa[ids] = estables
+        nuevos = pd.DataFrame({id_col: estables[es_nuevo], 'name': nombres[es_nuevo]})
+        return nuevos, mapa
+
+    def _relaciones_nuevas(self, tabla, relation_df, key_col, id_col):
+        # Descarta los pares (clave, id) ya emitidos en ejecuciones anteriores
+        previas = pd.read_sql_query(
+            "SELECT clave, id FROM relaciones WHERE tabla = ?", self.conn, params=(tabla,)
+        )
+        claves = relation_df[key_col].astype(str).to_numpy(dtype=object)
+        ids = relation_df[id_col].to_numpy(dtype=np.int64)
+        pares = pd.MultiIndex.from_arrays([claves, ids])
+        mask = ~pares.isin(pd.MultiIndex.from_arrays([previas['clave'], previas['id'].astype(np.int64)]))
+
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO relaciones (tabla, clave, id) VALUES (?, ?, ?)",
+            ((tabla, c, int(i)) for c, i in zip(claves[mask], ids[mask])),
+        )
+        return relation_df[mask].reset_index(drop=True)
+
+    def olvidar_relaciones(self, tabla, claves):
+        """
+        Olvida los pares de relación de estas claves (ej. shows modificados en modo
+        delta): delta() los vuelve a emitir completos tras el DELETE de sus filas.
+        """
+        self.conn.executemany(
+            "DELETE FROM relaciones WHERE tabla = ? AND clave = ?",
+            ((tabla, str(c)) for c in claves),
+        )
+
+    def delta(self, tabla, catalog_df, relation_df):
+        """
+        Aplica el registro a un catálogo y su relación (salida de create_catalog).
+        Retorna (catalog_df, relation_df) con IDs estables y solo las filas nuevas.
+        """
+        id_col = catalog_df.columns[0]
+        key_col = relation_df.columns[0]
+        nuevos, mapa = self._asignar_ids(tabla, catalog_df, id_col)
+
+        relation_df = relation_df.copy()
+        relation_df[id_col] = mapa[relation_df[id_col].to_numpy()]
+        return nuevos, self._relaciones_nuevas(tabla, relation_df, key_col, id_col)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        # Sin commit() previo, los cambios pendientes se descartan
+        self.conn.close()
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+import profiling
+
+# --- FECHAS Y HORAS ---
+# pd.to_datetime sin formato infiere el formato a partir de los datos en cada
+# llamada. Aquí el formato se detecta una sola vez sobre una muestra de valores
+# distintos (entre DATE_FORMATS) y se memoriza por columna, así cada bloque de
+# una lectura por chunks reutiliza el mismo formato. El parseo es vectorizado y
+# sobre los valores distintos (una fecha de factura se repite en todas sus
+# líneas). Las fechas y horas quedan como period[D] / timedelta64 nativos:
+# utils los renderiza a literales SQL en bloque.
+
+# Formatos candidatos, en orden de preferencia ante empates (mes antes que día,
+# como pandas por defecto)
+DATE_FORMATS = (
+    '%m/%d/%Y %H:%M',       # 12/1/2010 8:26 (InvoiceDate)
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y',
+    '%d/%m/%Y %H:%M',
+    '%d/%m/%Y',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%B %d, %Y',            # September 25, 2021 (date_added)
+    '%b %d, %Y',
+    '%d %B %Y',
+)
+
+# Formato detectado por columna: {(nombre, formatos): formato}
+_FORMATOS = {}
+
+def detect_format(values, formats=DATE_FORMATS, sample_size=1000):
+    """
+    Formato de formats que parsea más valores de una muestra de values (strings
+    sin nulos). Retorna None si ninguno parsea al menos un valor.
+    """
+    muestra = pd.Series(values[:sample_size], dtype=object)
+    mejor, parseados = None, 0
+    for fmt in formats:
+        n = pd.to_datetime(muestra, format=fmt, errors='coerce').notna().sum()
+        if n > parseados:
+            mejor, parseados = fmt, n
+            if n == len(muestra):
+                break
+    return mejor
+
+def clear_cache():
+    """Olvida los formatos detectados (ej. al cambiar de archivo con las mismas columnas)."""
+    _FORMATOS.clear()
+
+@profiling.stage(detail=lambda col, *args, **kwargs: col.name)
+def parse_datetimes(col, fmt=None, formats=DATE_FORMATS, sample_size=1000):
+    """
+    Convierte una columna de texto (object o category) a datetime64. Los valores
+    que no cumplen el formato quedan como NaT (igual que errors='coerce').
+    fmt: formato explícito; sin él se detecta sobre una muestra y se memoriza
+    por nombre de columna. Si ningún formato aplica, se usa la inferencia de pandas.
+    """
+    if pd.api.types.is_datetime64_any_dtype(col.dtype):
+        return col
+    codes, uniques = pd.factorize(col)
+    textos = pd.Series(np.asarray(uniques, dtype=object), dtype=object).str.strip()
+
+    if fmt is None:
+        clave = (col.name, tuple(formats))
+        fmt = _FORMATOS.get(clave)
+        if fmt is None:
+            fmt = detect_format(textos.dropna().to_numpy(), formats, sample_size)
+            if fmt is not None:
+                _FORMATOS[clave] = fmt
+
+    if fmt is None:
+        fechas = pd.to_datetime(textos, errors='coerce')
+    else:
+        fechas = pd.to_datetime(textos, format=fmt, errors='coerce', cache=False)
+    # Centinela NaT al final: los nulos (código -1) lo toman al indexar
+    valores = np.append(fechas.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))[codes]
+    return pd.Series(valores, index=col.index, name=col.name)
+
+def as_dates(col):
+    """
+    Columna datetime64 como fechas: period[D] (enteros por día), que se renderiza
+    'YYYY-MM-DD' y se declara DATE. Un datetime64 a medianoche seguiría siendo un
+    timestamp ('YYYY-MM-DD 00:00:00').
+    """
+    return col.dt.to_period('D')
+
+def split_datetime(col):
+    """
+    Separa una columna datetime64 en (fecha, hora): la fecha como period[D] (ver
+    as_dates) y la hora como timedelta64 desde la medianoche (se renderiza
+    'HH:MM:SS'). NaT se mantiene en ambas.
+    """
+    return as_dates(col), col - col.dt.normalize()
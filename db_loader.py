@@ -0,0 +1,224 @@
+import datetime
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pandas as pd
+import utils
+import profiling
+
+# --- CARGA DIRECTA A POSTGRESQL ---
+# Carga las tablas normalizadas directamente en la base de datos (sin reproducir
+# el .sql a mano) usando las variables DB_HOST / DB_USER / DB_PASS / DB_NAME_*
+# que ya define docker-compose. Requiere el paquete opcional psycopg (v3).
+
+COPY_FORMATS = ('binary', 'text')
+
+def load_enabled():
+    """True si DB_LOAD está activado (1 / true / si)."""
+    return os.environ.get('DB_LOAD', '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+def get_conninfo(db_name_var):
+    """
+    Cadena de conexión a partir del entorno. db_name_var es la variable con el
+    nombre de la base (ej. 'DB_NAME_NETFLIX').
+    """
+    params = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'port': os.environ.get('DB_PORT', '5432'),
+        'user': os.environ.get('DB_USER', 'postgres'),
+        'password': os.environ.get('DB_PASS', ''),
+        'dbname': os.environ.get(db_name_var, 'postgres'),
+    }
+    return " ".join(f"{k}={v}" for k, v in params.items() if v)
+
+def get_load_options():
+    """Lee DB_LOAD_WORKERS (conexiones en paralelo) y DB_COPY_FORMAT (binary / text)."""
+    workers = int(os.environ.get('DB_LOAD_WORKERS', '').strip() or 4)
+    copy_format = os.environ.get('DB_COPY_FORMAT', '').strip().lower() or 'binary'
+    if copy_format not in COPY_FORMATS:
+        raise ValueError(f"DB_COPY_FORMAT debe ser uno de {COPY_FORMATS}, no '{copy_format}'")
+    return max(1, workers), copy_format
+
+def _import_psycopg():
+    # Dependencia opcional: solo se necesita para la carga directa
+    try:
+        import psycopg
+    except ImportError:
+        raise ImportError("La carga directa requiere el paquete 'psycopg' (pip install \"psycopg[binary]\")") from None
+    return psycopg
+
+class ConnectionPool:
+    """
+    Pool mínimo de conexiones (thread-safe). Las conexiones se abren bajo demanda
+    hasta 'size' y se reutilizan entre tablas.
+    """
+
+    def __init__(self, conninfo, size=4):
+        self._psycopg = _import_psycopg()
+        self.conninfo = conninfo
+        self.size = size
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.closed or conn.info.transaction_status != self._psycopg.pq.TransactionStatus.IDLE:
+                # Conexión rota o con transacción a medias: se descarta
+                conn.close()
+                with self._lock:
+                    self._created -= 1
+                self._idle.put(None)
+            else:
+                self._idle.put(conn)
+
+    def _acquire(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if self._created < self.size:
+                        self._created += 1
+                        break
+                conn = self._idle.get()
+            if conn is not None:
+                return conn
+            # None: una conexión descartada liberó su lugar, se intenta abrir otra
+
+        try:
+            return self._psycopg.connect(self.conninfo)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def close(self):
+        while not self._idle.empty():
+            conn = self._idle.get_nowait()
+            if conn is not None:
+                conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def _column_types(cur, table_name):
+    """Tipos PostgreSQL de las columnas de una tabla (para COPY binario)."""
+    cur.execute(
+        "SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped",
+        (table_name,),
+    )
+    return {name: tipo.split('(')[0] for name, tipo in cur.fetchall()}
+
+_TEXT_TYPES = ('character varying', 'character', 'text')
+_INT_TYPES = ('smallint', 'integer', 'bigint')
+
+def _python_rows(df, pg_types):
+    """
+    Filas como tuplas de valores nativos de Python (None para nulos), adaptados
+    al tipo de destino: COPY binario exige el tipo exacto de cada columna
+    (Decimal para numeric, str para texto, int para enteros, date / time para
+    fechas y horas).
+    """
+    columns = []
+    for i, pg_type in enumerate(pg_types):
+        col = df.iloc[:, i]
+        values = col.astype(object).tolist() if isinstance(col.dtype, pd.CategoricalDtype) else col.tolist()
+        if col.hasnans:
+            mask = col.isna().tolist()
+            values = [None if nulo else v for v, nulo in zip(values, mask)]
+        if pg_type == 'numeric':
+            values = [Decimal(repr(v)) if isinstance(v, float) else v for v in values]
+        elif pg_type in _TEXT_TYPES:
+            values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+        elif pg_type in _INT_TYPES:
+            values = [int(v) if isinstance(v, float) else v for v in values]
+        elif pg_type == 'date':
+            # Columnas period[D] (date_parsing.as_dates) o datetime64
+            values = [v.start_time.date() if isinstance(v, pd.Period)
+                      else v.date() if isinstance(v, datetime.datetime) else v for v in values]
+        elif pg_type == 'time without time zone':
+            # Columnas timedelta64: hora desde la medianoche
+            values = [(datetime.datetime.min + v).time() if isinstance(v, datetime.timedelta) else v
+                      for v in values]
+        columns.append(values)
+    return zip(*columns)
+
+def copy_table(conn, df, table_name, columns=None, copy_format='binary', upsert=None):
+    """
+    Carga un DataFrame en una tabla con COPY, en su propia transacción.
+    Se copia a una tabla temporal y luego INSERT ... ON CONFLICT DO NOTHING, con
+    la misma semántica que los scripts .sql (idempotente, tolera duplicados).
+    Con upsert (columnas de la clave primaria) las filas existentes se actualizan.
+    """
+    if columns is None:
+        columns = [str(c) for c in df.columns]
+    cols = ', '.join(columns)
+    staging = f"tmp_{table_name}"
+
+    with conn.transaction(), conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE {staging} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP")
+        if copy_format == 'binary':
+            tipos = _column_types(cur, staging)
+            with cur.copy(f"COPY {staging} ({cols}) FROM STDIN (FORMAT BINARY)") as copy:
+                pg_types = [tipos[c.lower()] for c in columns]
+                copy.set_types(pg_types)
+                for start in range(0, len(df), utils.STREAM_CHUNK_ROWS):
+                    for row in _python_rows(df.iloc[start:start + utils.STREAM_CHUNK_ROWS], pg_types):
+                        copy.write_row(row)
+        else:
+            with cur.copy(f"COPY {staging} ({cols}) FROM STDIN") as copy:
+                for start in range(0, len(df), utils.STREAM_CHUNK_ROWS):
+                    lines = utils.render_copy_rows(df.iloc[start:start + utils.STREAM_CHUNK_ROWS])
+                    copy.write("".join([line + "\n" for line in lines]))
+        conflicto = utils.conflict_clause(columns, upsert)
+        cur.execute(f"INSERT INTO {table_name} ({cols}) SELECT {cols} FROM {staging} {conflicto}")
+        return cur.rowcount
+
+@profiling.stage()
+def load_tables(conninfo, ddl, etapas, workers=4, copy_format='binary'):
+    """
+    Crea el esquema (ddl) y carga las tablas por etapas respetando las FKs.
+    etapas: lista de etapas; cada etapa es una lista de (nombre_tabla, df),
+    (nombre_tabla, df, columnas) o (nombre_tabla, df, columnas, upsert). Las tablas
+    de una misma etapa son independientes y se cargan en paralelo, cada una por su
+    propia conexión del pool.
+    """
+    print(f"\n--- Cargando en PostgreSQL ({copy_format}, {workers} conexiones) ---")
+    inicio = time.perf_counter()
+    with ConnectionPool(conninfo, workers) as pool:
+        with pool.connection() as conn:
+            with conn.transaction():
+                conn.execute(ddl)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for etapa in etapas:
+                futuros = {}
+                for tabla in etapa:
+                    nombre, df = tabla[0], tabla[1]
+                    columnas = tabla[2] if len(tabla) > 2 else None
+                    upsert = tabla[3] if len(tabla) > 3 else None
+                    futuros[nombre] = executor.submit(_load_one, pool, df, nombre, columnas, copy_format, upsert)
+                # Una etapa termina antes de empezar la siguiente (orden de FKs)
+                for nombre, futuro in futuros.items():
+                    filas = futuro.result()
+                    print(f"Tabla {nombre}: {filas} filas insertadas")
+    print(f"¡Carga completada en {time.perf_counter() - inicio:.1f}s!")
+
+def _load_one(pool, df, table_name, columns, copy_format, upsert=None):
+    with pool.connection() as conn:
+        return copy_table(conn, df, table_name, columns, copy_format, upsert)
@@ -0,0 +1,119 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import profiling
+import utils
+
+# --- MODO DELTA (HUELLAS DE FILAS) ---
+# Guarda entre ejecuciones una huella por clave natural de la fuente (show_id,
+# InvoiceNo+StockCode, encounter_id): hash de la clave + hash del contenido de sus
+# filas, en una base SQLite dentro de sql/state/. Cada ejecución compara el CSV con
+# las huellas guardadas y los scripts procesan solo las claves nuevas (INSERT) o
+# modificadas (UPSERT). Las filas hijas de una clave modificada (relaciones,
+# líneas, mediciones) se borran y se vuelven a insertar completas (delete_rows).
+# Las claves que desaparecen del CSV no se eliminan.
+
+def delta_enabled():
+    """True si DELTA_MODE está activado (1 / true / si)."""
+    return os.environ.get('DELTA_MODE', '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+def open_fingerprints(state_dir, dataset):
+    """Abre las huellas del dataset si DELTA_MODE está activado; si no, None."""
+    if not delta_enabled():
+        return None
+    return FingerprintStore(os.path.join(state_dir, f"{dataset}_huellas.sqlite"))
+
+def delete_rows(table_name, column, keys):
+    """
+    DELETE de las filas de table_name cuya column está en keys (las claves
+    modificadas): se reemplazan completas, incluidas las que dejaron de existir.
+    Cadena vacía si no hay claves.
+    """
+    if keys is None or len(keys) == 0:
+        return ""
+    ids = ", ".join(utils.render_sql_column(pd.Series(keys)))
+    return f"DELETE FROM {table_name} WHERE {column} IN ({ids});\n"
+
+def _canonical_text(value):
+    # 3.0 y 3 son el mismo valor aunque la columna pase de int a float
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _hash_column(col):
+    # Hash del texto de cada valor distinto: no depende del dtype con que se leyó
+    # la columna (int32 / int64, category / object / str), solo de sus valores
+    codes, uniques = pd.factorize(col)
+    textos = np.array([_canonical_text(v) for v in uniques], dtype=object)
+    hashes = pd.util.hash_array(textos) if len(textos) else np.empty(0, dtype=np.uint64)
+    # Centinela al final para los nulos (código -1)
+    return np.append(hashes, np.uint64(0))[codes]
+
+def _hash_rows(df):
+    # hash_pandas_object es determinista (clave de hash fija): sirve entre ejecuciones
+    columnas = pd.DataFrame({i: _hash_column(df.iloc[:, i]) for i in range(len(df.columns))})
+    return pd.util.hash_pandas_object(columnas, index=False).to_numpy(dtype=np.uint64)
+
+class FingerprintStore:
+    """
+    Huellas (clave -> contenido) en SQLite. Igual que el registro de catálogos, los
+    cambios quedan pendientes hasta commit(), que se llama al terminar la salida.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS huellas (clave INTEGER PRIMARY KEY, contenido INTEGER NOT NULL)"
+        )
+
+    @profiling.stage(name='delta_cambios')
+    def cambios(self, df, key_cols):
+        """
+        Compara las filas de df con las huellas guardadas.
+        Retorna (nuevas, modificadas): máscaras booleanas por fila de df según su
+        clave natural (key_cols). Una clave con varias filas (ej. líneas repetidas
+        de una factura) cambia si cambia cualquiera de sus filas distintas.
+        """
+        claves = _hash_rows(df[key_cols])
+        contenido = _hash_rows(df)
+
+        # Huella de contenido por clave: suma (módulo 2^64) de los hashes de sus
+        # filas distintas, independiente del orden de las filas en el CSV
+        pares = pd.DataFrame({'clave': claves, 'contenido': contenido}).drop_duplicates()
+        codigos, unicas = pd.factorize(pares['clave'].to_numpy())
+        suma = np.zeros(len(unicas), dtype=np.uint64)
+        np.add.at(suma, codigos, pares['contenido'].to_numpy())
+
+        # SQLite guarda enteros con signo: mismos 64 bits vistos como int64
+        unicas = unicas.astype(np.uint64).view(np.int64)
+        suma = suma.view(np.int64)
+        guardadas = pd.read_sql_query("SELECT clave, contenido FROM huellas", self.conn)
+        posicion = pd.Index(guardadas['clave'].to_numpy(dtype=np.int64)).get_indexer(unicas)
+        # Centinela al final: posicion == -1 (clave nueva) lo apunta sin fallar
+        previo = np.append(guardadas['contenido'].to_numpy(dtype=np.int64), 0)[posicion]
+
+        es_nueva = posicion == -1
+        es_modificada = ~es_nueva & (previo != suma)
+        pendientes = es_nueva | es_modificada
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO huellas (clave, contenido) VALUES (?, ?)",
+            zip(unicas[pendientes].tolist(), suma[pendientes].tolist()),
+        )
+        print(f"Modo delta: {int(es_nueva.sum())} claves nuevas, {int(es_modificada.sum())} modificadas, "
+              f"{int((~pendientes).sum())} sin cambios.")
+
+        # De claves a filas
+        posicion = pd.Index(unicas).get_indexer(claves.view(np.int64))
+        return es_nueva[posicion], es_modificada[posicion]
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        # Sin commit() previo, los cambios pendientes se descartan
+        self.conn.close()
@@ -0,0 +1,607 @@
+import importlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import profiling
+import utils
+
+# --- MOTOR DE NORMALIZACIÓN DECLARATIVO ---
+# Cada dataset se describe con un spec (dict de Python, o YAML / JSON con load_spec):
+# sus tablas, la clave de cada una, las columnas multivaluadas a catalogar, las
+# columnas a despivotar y las FKs. compile_spec valida el spec y arma un plan:
+# - orden de las tablas según las FKs (y etapas de carga paralela para db_loader),
+# - un único create_catalogs para todas las columnas multivaluadas,
+# - el DDL, con los tipos del spec o derivados de los dtypes,
+# - la escritura del script con SqlWriter / TableSpool.
+#
+# Tipos de tabla ('kind'):
+# - entity:    columnas de la fuente (lista, o dict fuente -> nombre) deduplicadas por
+#              'key' con keep='first' | 'last' | None; distinct=True quita antes las
+#              variantes repetidas (drop_duplicates de la fila completa).
+# - base:      todas las columnas que quedan (sin las catalogadas, despivotadas ni
+#              las de 'drop'), deduplicadas por 'key' igual que entity.
+# - catalog:   'column' con listas separadas por ', ' -> catálogo (id, name) y la
+#              tabla de relación 'relation' (clave de 'parent', id).
+# - unpivot:   columnas que cumplen 'pattern' -> tabla larga (key, id, value) y la
+#              tabla 'lookup' (id, name) con un id por columna.
+# - aggregate: groupby('by') con 'aggs' {columna: función}.
+# Opcionales por tabla: 'references' {columna: tabla} (FKs) y 'types' {columna:
+# tipo SQL}; 'relation_types' / 'lookup_types' para la segunda tabla de catalog /
+# unpivot. Del dataset: 'prepare' (función df -> df antes de normalizar),
+# 'distinct_rows' (drop_duplicates de la fuente), 'sql_names' (función que limpia
+# los nombres de columna para SQL) y 'ddl_per_table' (el script lleva el CREATE
+# TABLE de cada tabla junto a sus datos en lugar de todo el DDL al inicio).
+
+KINDS = ('entity', 'base', 'catalog', 'unpivot', 'aggregate')
+
+# Funciones de agregación que se pueden combinar entre bloques (normalize_chunks)
+PARTIAL_AGGS = ('sum', 'count', 'min', 'max', 'mean')
+
+# Al combinar resultados parciales los conteos se suman; sum / min / max se repiten
+REDUCE_AGGS = {'count': 'sum'}
+
+# Un tipo SERIAL genera valores: la columna que lo referencia usa el entero base
+SERIAL_TYPES = {'SMALLSERIAL': 'SMALLINT', 'SERIAL': 'INTEGER', 'BIGSERIAL': 'BIGINT'}
+
+def sql_type(dtype):
+    """Tipo SQL por defecto de una columna según su dtype."""
+    if dtype == np.int16: return 'SMALLINT'
+    if pd.api.types.is_integer_dtype(dtype): return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype): return 'FLOAT'
+    if isinstance(dtype, pd.PeriodDtype): return 'DATE'
+    if pd.api.types.is_datetime64_any_dtype(dtype): return 'TIMESTAMP'
+    if pd.api.types.is_timedelta64_dtype(dtype): return 'TIME'
+    return 'VARCHAR(255)'
+
+def _resolve(value):
+    # En YAML / JSON las funciones se indican como "modulo.funcion"
+    if value is None or callable(value):
+        return value
+    module, _, name = str(value).rpartition('.')
+    return getattr(importlib.import_module(module), name)
+
+def load_spec(path):
+    """Lee un spec desde un archivo .json o .yaml / .yml."""
+    with open(path, encoding='utf-8') as f:
+        if os.path.splitext(path)[1].lower() == '.json':
+            return json.load(f)
+        # Dependencia opcional: solo se necesita para specs en YAML
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Los specs en YAML requieren el paquete 'pyyaml' (pip install pyyaml)") from None
+        return yaml.safe_load(f)
+
+def compile_spec(spec):
+    """Valida un spec (dict o ruta a un archivo) y retorna su NormalizationPlan."""
+    if isinstance(spec, str):
+        spec = load_spec(spec)
+    return NormalizationPlan(spec)
+
+def _as_list(value):
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+def _unique_mask(codes, keep='first'):
+    """Máscara de las filas que conserva drop_duplicates(keep=keep) sobre códigos enteros."""
+    return ~pd.Series(codes, copy=False).duplicated(keep=keep).to_numpy()
+
+class ColumnCodes:
+    """
+    Códigos enteros (pd.factorize) de las columnas de un DataFrame, calculados una
+    sola vez por normalización y compartidos por todas sus tablas. Los nulos
+    tienen su propio código (el último), así se comparan como drop_duplicates.
+    group() combina los códigos de varias columnas en uno solo por fila.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._factorized = {}
+        self._rows = None
+        self._columns = {}
+        self._groups = {}
+
+    def select(self, mask):
+        """ColumnCodes de las filas de mask, reutilizando las factorizaciones."""
+        sub = ColumnCodes(self.df)
+        sub._factorized = self._factorized
+        sub._rows = np.flatnonzero(mask) if self._rows is None else self._rows[mask]
+        return sub
+
+    def _factorize(self, col):
+        if col not in self._factorized:
+            codes, uniques = pd.factorize(self.df[col])
+            n = len(uniques)
+            codes = codes.astype(np.int64)
+            codes[codes < 0] = n
+            self._factorized[col] = (codes, uniques)
+        return self._factorized[col]
+
+    def column(self, col, sort=False):
+        """(códigos, cantidad de códigos). sort=True: códigos en el orden de los valores."""
+        clave = (col, sort)
+        if clave not in self._columns:
+            codes, uniques = self._factorize(col)
+            if sort:
+                rango = np.empty(len(uniques) + 1, dtype=np.int64)
+                rango[pd.Index(uniques).argsort()] = np.arange(len(uniques))
+                rango[-1] = len(uniques)
+                codes = rango[codes]
+            if self._rows is not None:
+                codes = codes[self._rows]
+            self._columns[clave] = (codes, len(uniques) + 1)
+        return self._columns[clave]
+
+    def missing(self, col):
+        """Máscara de los nulos de col."""
+        codes, n = self.column(col)
+        return codes == n - 1
+
+    def group(self, cols, sort=False):
+        """
+        Un código por fila para la combinación de cols (dos filas tienen el mismo
+        código si coinciden en todas las columnas). Con sort=True el orden de los
+        códigos es el orden lexicográfico de los valores, como groupby(sort=True).
+        """
+        clave = (tuple(cols), sort)
+        if clave not in self._groups:
+            combinado, total = None, 1
+            for col in cols:
+                codes, n = self.column(col, sort)
+                if combinado is None:
+                    combinado, total = codes, n
+                    continue
+                if total * n >= 2 ** 62:
+                    # Se compactan los códigos antes de que el producto desborde int64
+                    combinado = pd.factorize(combinado, sort=sort)[0]
+                    total = int(combinado.max()) + 1 if len(combinado) else 1
+                combinado, total = combinado * n + codes, total * n
+            if combinado is None:
+                combinado = np.zeros(len(self.df) if self._rows is None else len(self._rows), dtype=np.int64)
+            self._groups[clave] = combinado
+        return self._groups[clave]
+
+class NormalizationPlan:
+    """
+    Plan compilado de un spec. normalize() ejecuta la normalización de un
+    DataFrame completo y normalize_chunks() la de un archivo leído por bloques;
+    ddl(), write() y load_stages() derivan el esquema, el script y la carga.
+    """
+
+    def __init__(self, spec):
+        self.dataset = spec.get('dataset', 'dataset')
+        self.prepare = _resolve(spec.get('prepare'))
+        self.sql_names = _resolve(spec.get('sql_names'))
+        self.distinct_rows = bool(spec.get('distinct_rows', False))
+        self.ddl_per_table = bool(spec.get('ddl_per_table', False))
+
+        # Tablas de salida: cada catalog / unpivot produce dos. Las tablas derivadas
+        # (relaciones y tablas largas) van al final, después de todas las declaradas
+        self.tables = {}
+        derivadas = []
+        for entry in spec['tables']:
+            kind = entry.get('kind', 'entity')
+            if kind not in KINDS:
+                raise ValueError(f"Tabla {entry.get('name')}: kind desconocido '{kind}'; opciones: {KINDS}")
+            if kind == 'catalog':
+                self._add(entry['name'], dict(entry, role='catalog'))
+                derivadas.append((entry['relation'], dict(entry, role='relation',
+                                                          types=entry.get('relation_types', {}))))
+            elif kind == 'unpivot':
+                self._add(entry['lookup'], dict(entry, role='lookup', types=entry.get('lookup_types', {})))
+                derivadas.append((entry['name'], dict(entry, role='long')))
+            else:
+                self._add(entry['name'], dict(entry, role=kind))
+        for name, entry in derivadas:
+            self._add(name, entry)
+
+        self.keys = {name: self._key(entry) for name, entry in self.tables.items()}
+        self.references = {name: self._references(entry) for name, entry in self.tables.items()}
+        self.order = self._order()
+
+        # Columnas que no pasan a la tabla base
+        self.catalog_columns = [e['column'] for e in self.tables.values() if e['role'] == 'catalog']
+        # Pares (catálogo, relación), ej. para aplicar catalog_registry
+        self.catalogs = [(e['name'], e['relation']) for e in self.tables.values() if e['role'] == 'catalog']
+        self.unpivot_patterns = [re.compile(e['pattern']) for e in self.tables.values() if e['role'] == 'lookup']
+
+    def _add(self, name, entry):
+        if name in self.tables:
+            raise ValueError(f"Spec {self.dataset}: la tabla '{name}' está definida dos veces")
+        self.tables[name] = entry
+
+    def _key(self, entry):
+        role = entry['role']
+        if role == 'catalog':
+            return [entry['id']]
+        if role == 'lookup':
+            return [entry['id']]
+        if role == 'relation':
+            return [self.tables[entry['parent']]['key'], entry['id']]
+        if role == 'long':
+            return [entry['key'], entry['id']]
+        if role == 'aggregate':
+            return _as_list(entry['by'])
+        return _as_list(entry.get('key'))
+
+    def _references(self, entry):
+        role = entry['role']
+        if role == 'relation':
+            return {self.tables[entry['parent']]['key']: entry['parent'], entry['id']: entry['name']}
+        if role == 'long':
+            return {entry['key']: entry['parent'], entry['id']: entry['lookup']}
+        return dict(entry.get('references', {}))
+
+    def _order(self):
+        # Orden topológico estable: en cada paso, la primera tabla (en el orden del
+        # spec) cuyas referencias ya están ubicadas
+        for name, refs in self.references.items():
+            for col, ref in refs.items():
+                if ref not in self.tables:
+                    raise ValueError(f"Tabla {name}: la FK {col} referencia a '{ref}', que no está en el spec")
+                if len(self.keys[ref]) != 1:
+                    raise ValueError(f"Tabla {name}: la FK {col} referencia a '{ref}', que no tiene clave simple")
+        orden, pendientes = [], list(self.tables)
+        while pendientes:
+            lista = next((n for n in pendientes
+                          if all(r in orden or r == n for r in self.references[n].values())), None)
+            if lista is None:
+                raise ValueError(f"Spec {self.dataset}: FKs circulares entre {pendientes}")
+            orden.append(lista)
+            pendientes.remove(lista)
+        return orden
+
+    def load_stages(self, tables, upsert=None):
+        """
+        Etapas de db_loader.load_tables: cada tabla va en la etapa siguiente a la
+        más tardía de las tablas que referencia, así las independientes se cargan
+        en paralelo. upsert: {tabla: columnas de conflicto}.
+        """
+        upsert = upsert or {}
+        nivel = {}
+        for name in self.order:
+            refs = [r for r in self.references[name].values() if r != name]
+            nivel[name] = 1 + max((nivel[r] for r in refs), default=-1)
+        etapas = [[] for _ in range(max(nivel.values(), default=-1) + 1)]
+        for name in self.order:
+            etapas[nivel[name]].append((name, tables[name], None, upsert.get(name)))
+        return etapas
+
+    # --- Ejecución ---
+
+    @profiling.stage(name='normalize_spec', detail=lambda self, *args, **kwargs: self.dataset)
+    def normalize(self, df, drop_empty=False):
+        """
+        Normaliza un DataFrame completo. Retorna {tabla: df} en el orden de FKs.
+        drop_empty: las tablas unpivot omiten los valores nulos o en 0.
+        """
+        if self.prepare is not None:
+            df = self.prepare(df)
+        # Cada columna se factoriza una sola vez: distinct_rows, las entidades y los
+        # agregados se deduplican comparando códigos enteros en lugar de texto
+        codigos = ColumnCodes(df)
+        if self.distinct_rows:
+            unicas = _unique_mask(codigos.group(list(df.columns)))
+            if not unicas.all():
+                df, codigos = df[unicas], codigos.select(unicas)
+        tables = self._normalize_frame(df, drop_empty, codigos=codigos)
+        return {name: tables[name] for name in self.order}
+
+    def _normalize_frame(self, df, drop_empty, dedup=True, codigos=None):
+        tables = {}
+        if codigos is None:
+            codigos = ColumnCodes(df)
+
+        # Todas las columnas multivaluadas en una sola pasada (por clave de la relación)
+        por_clave = {}
+        for name, entry in self.tables.items():
+            if entry['role'] == 'catalog':
+                key_col = self.tables[entry['parent']]['key']
+                por_clave.setdefault(key_col, {})[entry['column']] = (name, entry)
+        for key_col, columnas in por_clave.items():
+            catalogos = utils.create_catalogs(df, {col: e['id'] for col, (_, e) in columnas.items()}, key_col)
+            for col, (name, entry) in columnas.items():
+                tables[name], tables[entry['relation']] = catalogos[col]
+
+        for name, entry in self.tables.items():
+            role = entry['role']
+            if role == 'entity':
+                tables[name] = self._entity(df, entry, dedup, codigos)
+            elif role == 'base':
+                tables[name] = self._base(df, entry, dedup, codigos)
+            elif role == 'lookup':
+                tables[name], tables[entry['name']] = self._unpivot(df, entry, drop_empty)
+            elif role == 'aggregate':
+                tables[name] = self._aggregate(df, entry, codigos)
+        return tables
+
+    def _entity(self, df, entry, dedup=True, codigos=None):
+        columnas = entry['columns']
+        mapa = dict(columnas) if isinstance(columnas, dict) else {c: c for c in columnas}
+        faltantes = [c for c in mapa if c not in df.columns]
+        if faltantes:
+            raise ValueError(f"Tabla {entry['name']}: columnas inexistentes en la fuente: {faltantes}")
+        # La clave se declara con los nombres de salida: se traduce a las columnas de la fuente
+        fuente = {v: k for k, v in mapa.items()}
+        tabla = self._dedup(df, list(mapa), entry, dedup, codigos, fuente)
+        if any(k != v for k, v in mapa.items()):
+            tabla = tabla.rename(columns=mapa)
+        return tabla
+
+    def _base(self, df, entry, dedup=True, codigos=None):
+        excluidas = set(self.catalog_columns) | set(entry.get('drop', []))
+        columnas = [c for c in df.columns
+                    if c not in excluidas and not any(p.match(c) for p in self.unpivot_patterns)]
+        return self._dedup(df, columnas, entry, dedup, codigos)
+
+    def _dedup(self, df, columnas, entry, dedup=True, codigos=None, fuente=None):
+        """
+        Columnas `columnas` de df con las filas que conservan drop_duplicates()
+        (distinct) y drop_duplicates(subset=key, keep=keep), calculadas sobre los
+        códigos enteros de ColumnCodes. fuente: nombre de salida -> columna de df.
+        """
+        if codigos is None:
+            codigos = ColumnCodes(df)
+        keep = entry.get('keep', 'first')
+        key = [(fuente or {}).get(k, k) for k in _as_list(entry.get('key'))] if dedup and keep else []
+        filas = np.arange(len(df))
+        # Con keep='first' la primera aparición de cada clave ya es la primera de su
+        # variante: el distinct solo cambia el resultado con keep='last' o sin clave
+        if entry.get('distinct') and (not key or keep != 'first'):
+            filas = np.flatnonzero(_unique_mask(codigos.group(columnas)))
+        if key:
+            filas = filas[_unique_mask(codigos.group(key)[filas], keep)]
+        # iloc arma una tabla propia: no es una vista del DataFrame de origen
+        return df.iloc[filas, df.columns.get_indexer(columnas)]
+
+    def _aggregate(self, df, entry, codigos=None):
+        """
+        groupby(by).agg(aggs).reset_index() agrupando por un único código entero
+        (códigos ordenados de cada columna combinados), con el mismo orden de grupos.
+        """
+        by, aggs = _as_list(entry['by']), entry['aggs']
+        if any(isinstance(df[c].dtype, pd.CategoricalDtype) for c in by):
+            # groupby ordena las categorías por su orden propio (y puede incluir las no observadas)
+            return df.groupby(by).agg(aggs).reset_index()
+        if codigos is None:
+            codigos = ColumnCodes(df)
+        grupos = codigos.group(by, sort=True)
+        # groupby descarta las filas con la clave nula
+        validas = np.ones(len(df), dtype=bool)
+        for col in by:
+            validas &= ~codigos.missing(col)
+        if not validas.all():
+            df, grupos = df[validas], grupos[validas]
+        _, primeras, inverso = np.unique(grupos, return_index=True, return_inverse=True)
+        agregado = df[list(aggs)].groupby(inverso.reshape(-1)).agg(aggs).reset_index(drop=True)
+        claves = df.iloc[primeras, df.columns.get_indexer(by)].reset_index(drop=True)
+        return pd.concat([claves, agregado], axis=1)
+
+    def unpivot_columns(self, df, entry):
+        patron = re.compile(entry['pattern'])
+        return [c for c in df.columns if patron.match(c)]
+
+    def _lookup(self, df, entry):
+        columnas = self.unpivot_columns(df, entry)
+        return pd.DataFrame({
+            entry['id']: np.arange(1, len(columnas) + 1, dtype=np.int16),
+            entry.get('name_column', 'name'): columnas,
+        })
+
+    def _unpivot(self, df, entry, drop_empty):
+        # Mismo orden que melt (columna por columna) armado con numpy, con el id de
+        # la columna en lugar de repetir su nombre como texto en cada fila
+        columnas = self.unpivot_columns(df, entry)
+        medidas = df[columnas]
+        no_numericas = [c for c in columnas if not pd.api.types.is_numeric_dtype(medidas[c])]
+        if no_numericas:
+            medidas = medidas.assign(**{c: pd.to_numeric(medidas[c], errors='coerce') for c in no_numericas})
+        valores = medidas.to_numpy(dtype=np.float64).ravel(order='F')
+        larga = pd.DataFrame({
+            entry['key']: np.tile(df[entry['key']].to_numpy(), len(columnas)),
+            entry['id']: np.repeat(np.arange(1, len(columnas) + 1, dtype=np.int16), len(df)),
+            entry.get('value', 'value'): valores,
+        })
+        if drop_empty:
+            larga = larga[(valores != 0) & ~np.isnan(valores)].reset_index(drop=True)
+        return self._lookup(df, entry), larga
+
+    def normalize_chunks(self, chunks, drop_empty=False):
+        """
+        Versión por bloques de normalize() para archivos más grandes que la RAM.
+        Genera tuplas (tabla, filas_nuevas) a medida que procesa cada bloque:
+        - distinct_rows descarta los duplicados entre bloques con un hash por fila.
+        - entity / base con keep='first' se deduplican contra los bloques anteriores;
+          con keep='last' se acumulan las variantes y se emiten al final.
+        - lookup sale del primer bloque y las tablas largas se emiten por bloque.
+        - aggregate se agrega parcialmente por bloque y se emite al final (el
+          promedio puede diferir de groupby().mean() en el último dígito flotante).
+        Los catálogos necesitan todos los nombres para asignar los IDs en orden
+        alfabético: un spec con tablas catalog no se puede procesar por bloques.
+        """
+        if self.catalog_columns:
+            raise ValueError(f"Spec {self.dataset}: las tablas catalog requieren el archivo completo")
+        for name, entry in self.tables.items():
+            if entry['role'] == 'aggregate':
+                invalidas = [f for f in entry['aggs'].values() if f not in PARTIAL_AGGS]
+                if invalidas:
+                    raise ValueError(f"Tabla {name}: agregaciones {invalidas} no combinables por bloques")
+
+        hashes_vistos = np.empty(0, dtype=np.uint64)
+        claves_vistas = {}
+        acumuladas = {}
+        parciales = {}
+        primero = True
+
+        for chunk in chunks:
+            df = self.prepare(chunk) if self.prepare is not None else chunk
+            if self.distinct_rows:
+                # drop_duplicates() global: duplicados dentro del bloque y contra bloques previos
+                hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+                nuevas = ~pd.Series(hashes).duplicated().to_numpy() & ~np.isin(hashes, hashes_vistos)
+                df = df[nuevas]
+                hashes_vistos = np.union1d(hashes_vistos, hashes[nuevas])
+
+            tables = self._normalize_frame(df, drop_empty, dedup=False)
+            for name in self.order:
+                entry = self.tables[name]
+                role = entry['role']
+                tabla = tables.get(name)
+                if role == 'lookup':
+                    if primero:
+                        yield name, tabla
+                elif role == 'aggregate':
+                    parciales[name] = self._partial_agg(df, entry, parciales.get(name))
+                elif role in ('entity', 'base') and entry.get('key') and entry.get('keep', 'first'):
+                    key = _as_list(entry['key'])
+                    if entry.get('keep', 'first') == 'last':
+                        previas = acumuladas.get(name)
+                        tabla = tabla if previas is None else pd.concat([previas, tabla])
+                        acumuladas[name] = tabla.drop_duplicates() if entry.get('distinct') else tabla
+                        continue
+                    tabla = tabla.drop_duplicates(subset=key)
+                    claves = tabla[key[0]] if len(key) == 1 else pd.MultiIndex.from_frame(tabla[key])
+                    vistas = claves_vistas.setdefault(name, set())
+                    nuevas = ~np.asarray(claves.isin(vistas))
+                    vistas.update(claves[nuevas].tolist())
+                    yield name, tabla[nuevas]
+                else:
+                    yield name, tabla
+            primero = False
+
+        for name in self.order:
+            entry = self.tables[name]
+            if name in acumuladas:
+                yield name, acumuladas[name].drop_duplicates(subset=_as_list(entry['key']), keep='last')
+            elif name in parciales:
+                yield name, self._final_agg(entry, parciales[name])
+
+    def _partial_agg(self, df, entry, previo):
+        by = _as_list(entry['by'])
+        columnas = {}
+        for col, func in entry['aggs'].items():
+            if func == 'mean':
+                columnas[f"{col}__sum"] = (col, 'sum')
+                columnas[f"{col}__count"] = (col, 'count')
+            else:
+                columnas[f"{col}__{func}"] = (col, func)
+        parcial = df.groupby(by).agg(**columnas)
+        if previo is None:
+            return parcial
+        # Reducimos en cada bloque para que la memoria dependa de las claves, no de las filas
+        juntos = pd.concat([previo, parcial]).groupby(level=list(range(len(by))))
+        reducido = {}
+        for col in parcial.columns:
+            func = col.rpartition('__')[2]
+            reducido[col] = getattr(juntos[col], REDUCE_AGGS.get(func, func))()
+        return pd.DataFrame(reducido)
+
+    def _final_agg(self, entry, parcial):
+        salida = {}
+        for col, func in entry['aggs'].items():
+            if func == 'mean':
+                salida[col] = parcial[f"{col}__sum"] / parcial[f"{col}__count"]
+            else:
+                salida[col] = parcial[f"{col}__{func}"]
+        return pd.DataFrame(salida).reset_index()
+
+    # --- Esquema y salida ---
+
+    def sql_name(self, col):
+        return self.sql_names(col) if self.sql_names is not None else col
+
+    def sql_columns(self, df):
+        """Nombres SQL de las columnas de df (None si el spec no los cambia)."""
+        if self.sql_names is None:
+            return None
+        return [self.sql_name(str(c)) for c in df.columns]
+
+    def sql_frame(self, df):
+        """df con los nombres de columna SQL (para TableSpool y la carga directa)."""
+        return df.rename(columns=self.sql_names) if self.sql_names is not None else df
+
+    def _column_type(self, name, col, tables):
+        tipo = self.tables[name].get('types', {}).get(col)
+        if tipo is not None:
+            return tipo
+        # Una FK toma el tipo de la clave que referencia (SERIAL -> entero)
+        ref = self.references[name].get(col)
+        if ref is not None and ref != name:
+            tipo = self._column_type(ref, self.keys[ref][0], tables)
+            tipo = tipo.replace('NOT NULL', '').strip()
+            return SERIAL_TYPES.get(tipo.upper(), tipo)
+        df = tables.get(name)
+        if df is None or col not in df.columns:
+            raise ValueError(f"Tabla {name}: no hay tipo para la columna {col} (falta en el spec y en los datos)")
+        return sql_type(df[col].dtype)
+
+    def table_ddl(self, name, tables):
+        """CREATE TABLE de una tabla (tables: {tabla: df o muestra con sus dtypes})."""
+        df = tables.get(name)
+        if df is None:
+            raise ValueError(f"Tabla {name}: faltan sus datos para derivar el DDL")
+        key = self.keys[name]
+        cols_def = []
+        for col in df.columns:
+            definicion = f"    {self.sql_name(col)} {self._column_type(name, col, tables)}"
+            if key == [col]:
+                definicion += " PRIMARY KEY"
+            cols_def.append(definicion)
+        if len(key) > 1:
+            cols_def.append(f"    PRIMARY KEY ({', '.join(self.sql_name(c) for c in key)})")
+        for col, ref in self.references[name].items():
+            cols_def.append(f"    FOREIGN KEY ({self.sql_name(col)}) "
+                            f"REFERENCES {ref}({self.sql_name(self.keys[ref][0])})")
+        return f"CREATE TABLE IF NOT EXISTS {name} (\n" + ",\n".join(cols_def) + "\n);\n"
+
+    def ddl(self, tables):
+        """DDL de todas las tablas en el orden de FKs."""
+        return "".join(self.table_ddl(name, tables) for name in self.order)
+
+    def write(self, sql, tables, output_format='insert', batch_size=None, tsv_dir=None, upsert=None,
+              before=None):
+        """
+        Escribe DDL y datos de todas las tablas en un SqlWriter abierto (con
+        ddl_per_table, el CREATE TABLE de cada tabla justo antes de sus datos).
+        upsert: {tabla: columnas de conflicto}; before: {tabla: SQL previo a sus datos}.
+        Los INSERT usan los dtypes reales de cada columna (los mismos del DDL), sin
+        la promoción a float de iterrows.
+        """
+        upsert = upsert or {}
+        before = before or {}
+        if not self.ddl_per_table:
+            sql.write(self.ddl(tables))
+        for name in self.order:
+            if self.ddl_per_table:
+                sql.write(self.table_ddl(name, tables))
+            if before.get(name):
+                sql.write(before[name])
+            df = tables[name]
+            sql.write_table(df, name, output_format, batch_size, tsv_dir,
+                            columns=self.sql_columns(df), upsert=upsert.get(name), iterrows_compat=False)
+
+    def spools(self, output_format='insert', batch_size=None, tsv_dir=None):
+        """Un utils.TableSpool por tabla para la escritura por bloques (ver write_spools)."""
+        return {name: utils.TableSpool(name, output_format, batch_size, tsv_dir,
+                                       explicit_columns=self.sql_names is not None, iterrows_compat=False)
+                for name in self.order}
+
+    def spool_chunks(self, chunks, spools, drop_empty=False):
+        """Normaliza por bloques y acumula cada tabla en su spool (con nombres SQL)."""
+        for name, df in self.normalize_chunks(chunks, drop_empty):
+            spools[name].append(self.sql_frame(df))
+
+    def write_spools(self, sql, spools):
+        """Escribe DDL (de los dtypes del primer bloque) y los spools en el orden de FKs."""
+        muestras = {name: spool.sample for name, spool in spools.items()}
+        if not self.ddl_per_table:
+            sql.write(self.ddl(muestras))
+        for name in self.order:
+            if self.ddl_per_table:
+                sql.write(self.table_ddl(name, muestras))
+            sql.write_spool(spools[name])
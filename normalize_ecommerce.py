@@ -1,59 +1,73 @@
 import os
-import pandas as pd
 import utils  # El nuevo módulo unificado
+import db_loader
+import delta_state
+import stage_cache
+import profiling
+import normalization_spec
+import date_parsing
+import sql_shards
 
 # --- Lógica Específica del Dataset 2 ---
 
+# Esquema de lectura: país y descripción se repiten en cada línea de factura.
+# InvoiceNo / StockCode se fijan como texto: son las claves de Invoices, Products y
+# del groupby de detalles, y deben tener el mismo tipo en todos los bloques
+ESQUEMA = utils.CsvSchema(categories=['Country', 'Description'],
+                          dtypes={'InvoiceNo': str, 'StockCode': str})
+
+@profiling.stage()
 def clean_ecommerce_specific(df):
     """Limpieza específica para columnas de E-commerce"""
     # Verificamos si existen las columnas antes de operar para evitar errores
     if 'CustomerID' in df.columns:
         df['CustomerID'] = df['CustomerID'].fillna(0).astype(int)
     if 'Description' in df.columns:
-        df['Description'] = df['Description'].fillna('N/A')
+        df['Description'] = utils.fill_text(df['Description'], 'N/A')
     if 'Country' in df.columns:
-        df['Country'] = df['Country'].fillna('Unknown')
+        df['Country'] = utils.fill_text(df['Country'], 'Unknown')
     return df
 
-def normalize_ecommerce(df):
-    # 1FN: Separar fechas
+@profiling.stage()
+def split_invoice_date(df):
+    """1FN: Separa InvoiceDate en columnas Date y Time"""
     if 'InvoiceDate' in df.columns:
-        # Convertir a datetime, manejando errores
-        df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], errors='coerce')
-        df['Date'] = df['InvoiceDate'].dt.date
-        df['Time'] = df['InvoiceDate'].dt.time
+        # Formato detectado una vez (ej. 12/1/2010 8:26); los inválidos quedan NaT.
+        # Date / Time quedan como period[D] / timedelta64 (no objetos de Python)
+        fechas = date_parsing.parse_datetimes(df['InvoiceDate'])
+        df['Date'], df['Time'] = date_parsing.split_datetime(fechas)
         df = df.drop(columns=['InvoiceDate'])
-    
-    df = df.drop_duplicates()
+    return df
 
-    # 3FN: Creación de tablas independientes
-    # Usamos .copy() para evitar advertencias de SettingWithCopyWarning
-    customers = df[['CustomerID', 'Country']].drop_duplicates('CustomerID').copy()
-    products = df[['StockCode', 'Description']].drop_duplicates('StockCode').copy()
-    invoices = df[['InvoiceNo', 'CustomerID', 'Date', 'Time']].drop_duplicates('InvoiceNo').copy()
-    
-    details = df.groupby(['InvoiceNo', 'StockCode']).agg({
-        'Quantity': 'sum',
-        'UnitPrice': 'mean'
-    }).reset_index()
-
-    return {
-        'Customers': customers,
-        'Products': products,
-        'Invoices': invoices,
-        'Order_Details': details
-    }
-
-def get_ddl_ecommerce():
-    """Devuelve el string con la creación de tablas"""
-    return """
-    CREATE TABLE IF NOT EXISTS Customers (CustomerID INT PRIMARY KEY, Country VARCHAR(100));
-    CREATE TABLE IF NOT EXISTS Products (StockCode VARCHAR(50) PRIMARY KEY, Description TEXT);
-    CREATE TABLE IF NOT EXISTS Invoices (InvoiceNo VARCHAR(50) PRIMARY KEY, CustomerID INT, Date DATE, Time TIME);
-    CREATE TABLE IF NOT EXISTS Order_Details (InvoiceNo VARCHAR(50), StockCode VARCHAR(50), Quantity INT, UnitPrice DECIMAL(10,2), PRIMARY KEY(InvoiceNo, StockCode));
-    """
+# Spec de normalización: clientes, productos y facturas son entidades de las líneas
+# (primera aparición de cada clave) y Order_Details agrega las líneas por factura y
+# producto. split_invoice_date (1FN) y el drop_duplicates de filas van antes
+SPEC = {
+    'dataset': 'ecommerce',
+    'prepare': split_invoice_date,
+    'distinct_rows': True,
+    'tables': [
+        {'name': 'Customers', 'columns': ['CustomerID', 'Country'], 'key': 'CustomerID',
+         'types': {'CustomerID': 'INT', 'Country': 'VARCHAR(100)'}},
+        {'name': 'Products', 'columns': ['StockCode', 'Description'], 'key': 'StockCode',
+         'types': {'StockCode': 'VARCHAR(50)', 'Description': 'TEXT'}},
+        {'name': 'Invoices', 'columns': ['InvoiceNo', 'CustomerID', 'Date', 'Time'], 'key': 'InvoiceNo',
+         'references': {'CustomerID': 'Customers'},
+         'types': {'InvoiceNo': 'VARCHAR(50)', 'Date': 'DATE', 'Time': 'TIME'}},
+        {'name': 'Order_Details', 'kind': 'aggregate', 'by': ['InvoiceNo', 'StockCode'],
+         'aggs': {'Quantity': 'sum', 'UnitPrice': 'mean'},
+         'references': {'InvoiceNo': 'Invoices', 'StockCode': 'Products'},
+         'types': {'Quantity': 'INT', 'UnitPrice': 'DECIMAL(10,2)'}},
+    ],
+}
+PLAN = normalization_spec.compile_spec(SPEC)
+
+def normalize_ecommerce(df):
+    """Normaliza las líneas de factura según SPEC. Retorna {tabla: df}."""
+    return PLAN.normalize(df)
 
 # --- Ejecución Principal ---
+@profiling.pipeline('ecommerce', utils.get_project_paths(__file__)['profile'])
 def main():
     # 1. Configurar Rutas (Adaptado al nuevo utils)
     paths = utils.get_project_paths(__file__)
@@ -63,30 +77,119 @@ def main():
     
     print("--- Procesando Dataset: E-commerce ---")
 
+    # SQL_OUTPUT_FORMAT elige INSERT / COPY / TSV; SQL_BATCH_SIZE activa los INSERT multi-fila
+    output_format = utils.get_output_format()
+    batch_size = utils.get_batch_size()
+    tsv_dir = os.path.join(paths['sql'], 'ecommerce_normalized')
+
+    # CSV_CHUNKSIZE activa la lectura por bloques (archivos más grandes que la RAM)
+    chunksize = utils.get_chunksize()
+
+    # DELTA_MODE=1: solo se procesan las facturas nuevas o modificadas (cualquier línea
+    # agregada, cambiada o quitada cambia la huella de su factura)
+    huellas = delta_state.open_fingerprints(paths['state'], 'ecommerce')
+    if huellas is not None and chunksize:
+        print("Advertencia: DELTA_MODE no está disponible con CSV_CHUNKSIZE; se procesa el archivo completo.")
+        huellas.close()
+        huellas = None
+    # Facturas y líneas modificadas se actualizan (UPSERT por su clave primaria); las
+    # líneas de una factura modificada se borran antes (ver delta_state.delete_rows)
+    upsert = {'Invoices': ['InvoiceNo'], 'Order_Details': ['InvoiceNo', 'StockCode']} if huellas is not None else {}
+    borrar = {}
+
+    # STAGE_CACHE=1: carga, normalización y SQL se reutilizan si el CSV y el código no
+    # cambiaron (no aplica a la lectura por bloques)
+    cache = None
+    if not chunksize:
+        cache = stage_cache.open_cache(paths['cache'], __file__, utils.__file__, normalization_spec.__file__,
+                                       sql_shards.__file__, date_parsing.__file__)
+
     # 2. Cargar (Adaptado al nuevo utils)
-    df_raw = utils.load_data(input_csv)
-    if df_raw is None: return
+    def cargar():
+        df = utils.load_data(input_csv, schema=ESQUEMA, engine=utils.get_csv_engine())
+        return clean_ecommerce_specific(df) if df is not None else None
+
+    if chunksize:
+        df_raw = utils.load_data(input_csv, chunksize=chunksize, schema=ESQUEMA)
+    else:
+        df_raw = stage_cache.cached_frames(cache, stage_cache.stage_key(cache, 'carga', input_csv), cargar)
+    if df_raw is None: return False
     
     # 3. Normalizar
-    df_clean = clean_ecommerce_specific(df_raw)
-    normalized_tables = normalize_ecommerce(df_clean)
+    if chunksize:
+        # Cada bloque se renderiza al llegar y se acumula en disco por tabla
+        print(f"Normalizando por bloques de {chunksize} filas...")
+        spools = PLAN.spools(output_format, batch_size, tsv_dir)
+        PLAN.spool_chunks((clean_ecommerce_specific(chunk) for chunk in df_raw), spools)
+    else:
+        df_clean = df_raw
+        if huellas is not None:
+            nuevas, modificadas = huellas.cambios(df_clean, ['InvoiceNo'])
+            # Se reprocesan las facturas tocadas completas: la cabecera de Invoices sale
+            # de su primera línea, igual que en una ejecución completa
+            modificadas_ids = df_clean.loc[modificadas, 'InvoiceNo'].unique()
+            borrar = {'Order_Details': delta_state.delete_rows('Order_Details', 'InvoiceNo', modificadas_ids)}
+            df_clean = df_clean[nuevas | modificadas].copy()
+        # En modo delta df_clean depende de las huellas, no solo del CSV: no se cachea
+        clave = stage_cache.stage_key(cache, 'normalizacion', input_csv) if huellas is None else None
+        normalized_tables = stage_cache.cached_frames(cache, clave, lambda: normalize_ecommerce(df_clean))
     
     # 4. Generar Contenido SQL
     print("Construyendo script SQL...")
-    sql_parts = ["-- Script E-commerce\nBEGIN;\n"]
-    
-    # Agregar DDL
-    sql_parts.append(get_ddl_ecommerce())
-    
-    # Agregar Inserts (Iteramos sobre el diccionario de tablas devuelto)
-    for table_name, df_table in normalized_tables.items():
-        print(f"Generando inserts para: {table_name}...")
-        sql_parts.append(utils.df_to_sql_insert(df_table, table_name))
-        
-    sql_parts.append("\nCOMMIT;")
-
-    # 5. Guardar Archivo
-    utils.write_sql_file(sql_parts, output_sql)
+
+    # 5. Guardar en streaming (SQL_COMPRESSION=gzip|zstd comprime al vuelo)
+    compression = utils.get_compression()
+    clave_sql = None
+    if huellas is None:
+        clave_sql = stage_cache.stage_key(cache, 'sql', input_csv, output_sql, output_format,
+                                          batch_size, compression)
+    # SQL_SHARDS=1: un archivo por tabla / rango de filas con su manifest (ver sql_shards)
+    shard_dir = None
+    if sql_shards.shards_enabled():
+        if chunksize:
+            print("Advertencia: SQL_SHARDS no está disponible con CSV_CHUNKSIZE; se genera un único script.")
+        else:
+            shard_dir = os.path.join(paths['sql'], 'ecommerce_shards')
+            shard_rows, shard_workers = sql_shards.get_shard_options()
+            if clave_sql is not None:
+                clave_sql = stage_cache.stage_key(cache, 'sql', input_csv, shard_dir, output_format,
+                                                  batch_size, compression, shard_rows)
+    if shard_dir is not None:
+        if not stage_cache.outputs_current(cache, clave_sql):
+            sql_shards.write_shards(PLAN, normalized_tables, shard_dir, output_format, batch_size, compression,
+                                    upsert=upsert, before=borrar, shard_rows=shard_rows, workers=shard_workers)
+            stage_cache.record_outputs(cache, clave_sql, [shard_dir])
+    elif not stage_cache.outputs_current(cache, clave_sql):
+        with utils.SqlWriter(output_sql, compression) as sql:
+            sql.write("-- Script E-commerce\nBEGIN;\n")
+
+            # DDL y datos derivados del SPEC, en el orden de FKs
+            if chunksize:
+                PLAN.write_spools(sql, spools)
+            else:
+                PLAN.write(sql, normalized_tables, output_format, batch_size, tsv_dir, upsert=upsert,
+                           before=borrar)
+
+            sql.write("\nCOMMIT;\n")
+        stage_cache.record_outputs(cache, clave_sql, [sql.path] + ([tsv_dir] if output_format == 'tsv' else []))
+
+    # 6. Carga directa a PostgreSQL (DB_LOAD=1)
+    if db_loader.load_enabled():
+        if chunksize:
+            print("Advertencia: DB_LOAD no está disponible con CSV_CHUNKSIZE; cargue el script SQL generado.")
+        else:
+            workers, copy_format = db_loader.get_load_options()
+            # Los DELETE del modo delta van con el DDL: se ejecutan antes de cargar las tablas
+            db_loader.load_tables(db_loader.get_conninfo('DB_NAME_ECOMMERCE'),
+                                  PLAN.ddl(normalized_tables) + "".join(borrar.values()),
+                                  PLAN.load_stages(normalized_tables, upsert), workers, copy_format)
+
+    # 7. Las huellas solo avanzan si todo lo anterior terminó bien
+    if huellas is not None:
+        huellas.commit()
+        huellas.close()
+
+    return True
 
 if __name__ == "__main__":
     main()
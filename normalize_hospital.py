@@ -2,13 +2,28 @@ import pandas as pd
 import numpy as np
 import re
 import os
+import utils
+import db_loader
+import delta_state
+import stage_cache
+import profiling
+import normalization_spec
+import sql_shards
 
 # --- FUNCIONES DE PROCESAMIENTO ---
 
+# Esquema de lectura: sin columnas basura (Unnamed), texto de pocos valores
+# distintos como category y enteros reducidos a int32
+ESQUEMA = utils.CsvSchema(
+    usecols=lambda col: 'Unnamed' not in col,
+    categories=['ethnicity', 'gender', 'hospital_admit_source', 'icu_admit_source',
+                'icu_stay_type', 'icu_type', 'apache_3j_bodysystem', 'apache_2_bodysystem'],
+)
+
 def limpiar_nombre_columna(nombre):
     """
     Limpia nombres de columnas para que sean compatibles con SQL.
-    Ej: "Unnamed: 83" -> "unnamed_83" (aunque las borraremos antes)
+    Ej: "Unnamed: 83" -> "unnamed_83" (aunque ESQUEMA ya no las lee)
     Ej: "Total (kg)" -> "total_kg"
     """
     # Reemplazar caracteres no alfanuméricos por guion bajo
@@ -17,174 +32,277 @@ def limpiar_nombre_columna(nombre):
     nuevo_nombre = nuevo_nombre.strip('_')
     return nuevo_nombre
 
-def cargar_y_limpiar(filepath):
+@profiling.stage()
+def cargar_y_limpiar(filepath, chunksize=None):
+    """
+    Carga el CSV (sin columnas basura, ver ESQUEMA) e imputa nulos.
+    Con chunksize devuelve un iterador de bloques ya limpios (ver cargar_por_bloques).
+    """
     print(f"--- 1. Buscando archivo en: {filepath} ---")
     try:
         if not os.path.exists(filepath):
             print(f"ERROR: No se encuentra el archivo en la ruta especificada.")
             return None
+
+        if chunksize:
+            return cargar_por_bloques(filepath, chunksize)
             
-        df = pd.read_csv(filepath)
+        df = utils.load_data(filepath, schema=ESQUEMA, engine=utils.get_csv_engine())
         print(f"Datos cargados: {df.shape[0]} filas, {df.shape[1]} columnas.")
-        
-        # --- NUEVO: Eliminar columnas basura (Unnamed) ---
-        cols_basura = [c for c in df.columns if 'Unnamed' in c]
-        if cols_basura:
-            print(f"Eliminando {len(cols_basura)} columnas basura: {cols_basura}")
-            df.drop(columns=cols_basura, inplace=True)
 
         # Imputación
         cols_num = df.select_dtypes(include=np.number).columns
         df[cols_num] = df[cols_num].fillna(0)
-        cols_obj = df.select_dtypes(include='object').columns
-        df[cols_obj] = df[cols_obj].fillna('N/A')
+        cols_obj = df.select_dtypes(include=['object', 'category']).columns
+        for col in cols_obj:
+            df[col] = utils.fill_text(df[col], 'N/A')
         
         return df
     except Exception as e:
         print(f"Error crítico al cargar el archivo: {e}")
         return None
 
-def normalizar_1fn(df):
-    print("\n--- 2. Aplicando Primera Forma Normal (1FN) ---")
-    patron_medicion = re.compile(r'^(d1|h1)_')
-    cols_medicion = [c for c in df.columns if patron_medicion.match(c)]
-    cols_base = [c for c in df.columns if c not in cols_medicion]
-    
-    # Unpivot
-    df_mediciones = df.melt(
-        id_vars=['encounter_id'], 
-        value_vars=cols_medicion,
-        var_name='metric_name', 
-        value_name='metric_value'
-    )
-    df_encuentros_base = df[cols_base].copy()
-    print("Tablas separadas correctamente (Base y Mediciones).")
-    return df_encuentros_base, df_mediciones
-
-def normalizar_2fn_3fn(df_base):
-    print("\n--- 3. Aplicando Segunda (2FN) y Tercera Forma Normal (3FN) ---")
-    
-    # 2FN: Pacientes
-    cols_paciente = ['patient_id', 'gender', 'ethnicity']
-    df_pacientes = df_base[cols_paciente].drop_duplicates().reset_index(drop=True)
-    df_pacientes = df_pacientes.drop_duplicates(subset=['patient_id'], keep='last')
-
-    # 3FN: UCIs
-    cols_uci = ['icu_id', 'icu_type', 'hospital_id', 'icu_admit_source']
-    # Aseguramos que existan las columnas antes de seleccionar (por si acaso se borró alguna)
-    cols_uci_existentes = [c for c in cols_uci if c in df_base.columns]
-    df_uci = df_base[cols_uci_existentes].drop_duplicates().reset_index(drop=True)
-    df_uci = df_uci.drop_duplicates(subset=['icu_id'], keep='first')
-
-    # 3FN: Diagnósticos
-    cols_diag = ['apache_3j_diagnosis', 'apache_3j_bodysystem']
-    cols_diag_existentes = [c for c in cols_diag if c in df_base.columns]
-    df_diagnosticos = df_base[cols_diag_existentes].drop_duplicates().reset_index(drop=True)
-    # Renombrar solo si existen ambas columnas
-    if len(df_diagnosticos.columns) == 2:
-        df_diagnosticos.columns = ['diagnosis_code', 'body_system']
-    
-    if 'diagnosis_code' in df_diagnosticos.columns:
-        df_diagnosticos = df_diagnosticos.drop_duplicates(subset=['diagnosis_code'], keep='first')
-
-    # Limpieza final de Encuentros
-    cols_eliminar = ['gender', 'ethnicity', 'icu_type', 'hospital_id', 
-                     'icu_admit_source', 'apache_3j_bodysystem', 'bmi']
-    cols_a_borrar = [c for c in cols_eliminar if c in df_base.columns]
-    df_encuentros_final = df_base.drop(columns=cols_a_borrar)
-    
-    return {
-        'pacientes': df_pacientes,
-        'unidades_uci': df_uci,
-        'diagnosticos': df_diagnosticos,
-        'encuentros': df_encuentros_final
-    }
-
-def generar_sql(diccionario_tablas, df_mediciones, output_path):
+def cargar_por_bloques(filepath, chunksize):
+    """
+    Versión por bloques de cargar_y_limpiar: genera bloques de chunksize filas ya
+    limpios. Las columnas numéricas/texto a imputar se fijan con el primer bloque
+    para que todos los bloques se imputen igual.
+    """
+    cols_num = cols_obj = None
+    for df in utils.iter_csv_chunks(filepath, chunksize, schema=ESQUEMA):
+        if cols_num is None:
+            cols_num = df.select_dtypes(include=np.number).columns
+            cols_obj = df.select_dtypes(include=['object', 'category']).columns
+        df[cols_num] = df[cols_num].fillna(0)
+        for col in cols_obj:
+            df[col] = utils.fill_text(df[col], 'N/A')
+        yield df
+
+def omitir_mediciones_vacias():
+    """
+    True si HOSPITAL_DROP_EMPTY_MEASUREMENTS está activado: las mediciones nulas o
+    en 0 (cargar_y_limpiar imputa los nulos numéricos con 0) no se exportan.
+    """
+    return os.environ.get('HOSPITAL_DROP_EMPTY_MEASUREMENTS', '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+# Spec de normalización: pacientes / UCIs / diagnósticos son entidades de cada
+# encuentro, encuentros es el resto de las columnas y las mediciones d1_ / h1_ se
+# despivotan a (encounter_id, metric_id, metric_value) con el nombre de cada
+# métrica en la tabla metricas
+SPEC = {
+    'dataset': 'hospital',
+    'sql_names': limpiar_nombre_columna,
+    # Como el script original: CREATE TABLE de cada tabla seguido de sus INSERT
+    'ddl_per_table': True,
+    'tables': [
+        # 2FN: Pacientes (última variante de cada paciente)
+        {'name': 'pacientes', 'columns': ['patient_id', 'gender', 'ethnicity'], 'key': 'patient_id',
+         'distinct': True, 'keep': 'last'},
+        # 3FN: UCIs y diagnósticos
+        {'name': 'unidades_uci', 'columns': ['icu_id', 'icu_type', 'hospital_id', 'icu_admit_source'],
+         'key': 'icu_id', 'distinct': True},
+        {'name': 'diagnosticos', 'key': 'diagnosis_code', 'distinct': True,
+         'columns': {'apache_3j_diagnosis': 'diagnosis_code', 'apache_3j_bodysystem': 'body_system'}},
+        # Nota: diagnosis podría requerir ajuste manual si diagnosis_code es float (sin FK)
+        {'name': 'encuentros', 'kind': 'base', 'key': 'encounter_id', 'keep': None,
+         'drop': ['gender', 'ethnicity', 'icu_type', 'hospital_id', 'icu_admit_source',
+                  'apache_3j_bodysystem', 'bmi'],
+         'references': {'patient_id': 'pacientes', 'icu_id': 'unidades_uci'}},
+        # 1FN: mediciones en formato largo
+        {'name': 'mediciones', 'kind': 'unpivot', 'pattern': r'^(d1|h1)_', 'key': 'encounter_id',
+         'parent': 'encuentros', 'lookup': 'metricas', 'id': 'metric_id', 'name_column': 'metric_name',
+         'value': 'metric_value'},
+    ],
+}
+PLAN = normalization_spec.compile_spec(SPEC)
+
+def upsert_delta(modificados):
+    """
+    Modo delta: pacientes y encuentros modificados se actualizan (UPSERT por su
+    clave primaria). Fuera del modo delta (modificados es None) todo es DO NOTHING.
+    """
+    if modificados is None:
+        return {}
+    return {'pacientes': ['patient_id'], 'encuentros': ['encounter_id']}
+
+def borrar_mediciones(modificados):
+    """
+    DELETE de las mediciones de los encuentros modificados: sus filas se reemplazan
+    completas (incluidas las que dejaron de existir o pasaron a vacías).
+    """
+    return delta_state.delete_rows('mediciones', 'encounter_id', modificados)
+
+@profiling.stage()
+def generar_sql(tablas, output_path, batch_size=None, formato='insert', compresion=None, modificados=None):
+    """
+    formato: 'insert' (por defecto), 'copy' (COPY FROM stdin en el mismo script)
+    o 'tsv' (un .tsv por tabla junto al script, cargados con \\copy).
+    compresion: None, 'gzip' o 'zstd' (el script se escribe en streaming).
+    modificados: encounter_id modificados en modo delta (ver upsert_delta).
+    Retorna la ruta del script escrito (None si hubo un error).
+    """
     print(f"\n--- 4. Generando Script SQL en: {output_path} ---")
-    
-    def map_dtype(dtype):
-        if pd.api.types.is_integer_dtype(dtype): return 'INTEGER'
-        if pd.api.types.is_float_dtype(dtype): return 'FLOAT'
-        return 'VARCHAR(255)'
+    tsv_dir = os.path.splitext(output_path)[0]
 
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
+        with utils.SqlWriter(output_path, compresion, header=False, verbose=False) as f:
             f.write("BEGIN;\n\n")
-            
-            orden = [
-                ('pacientes', diccionario_tablas['pacientes'], 'patient_id'),
-                ('unidades_uci', diccionario_tablas['unidades_uci'], 'icu_id'),
-                ('diagnosticos', diccionario_tablas['diagnosticos'], 'diagnosis_code'),
-                ('encuentros', diccionario_tablas['encuentros'], 'encounter_id'),
-                ('mediciones', df_mediciones.head(1000), None) 
-            ]
-
-            for nombre, df, pk in orden:
-                # --- NUEVO: Sanitizar nombres de columnas ---
-                # Creamos un mapa de nombre_viejo -> nombre_nuevo_limpio
-                cols_map = {col: limpiar_nombre_columna(col) for col in df.columns}
-                
-                # DDL
-                cols_def = []
-                for col_orig in df.columns:
-                    col_sql = cols_map[col_orig] # Usamos el nombre limpio
-                    tipo = map_dtype(df[col_orig].dtype)
-                    
-                    # Definición de columnas
-                    if col_orig == pk: 
-                        cols_def.append(f"    {col_sql} {tipo} PRIMARY KEY")
-                    else: 
-                        cols_def.append(f"    {col_sql} {tipo}")
-                
-                # Definición de FKs (usando nombres limpios)
-                if nombre == 'encuentros':
-                    cols_def.append("    FOREIGN KEY (patient_id) REFERENCES pacientes(patient_id)")
-                    cols_def.append("    FOREIGN KEY (icu_id) REFERENCES unidades_uci(icu_id)")
-                    # Nota: diagnosis podría requerir ajuste manual si diagnosis_code es float
-                
-                if nombre == 'mediciones':
-                    cols_def.append("    FOREIGN KEY (encounter_id) REFERENCES encuentros(encounter_id)")
-
-                f.write(f"CREATE TABLE IF NOT EXISTS {nombre} (\n" + ",\n".join(cols_def) + "\n);\n")
-                
-                # DML
-                print(f"Generando INSERTS para {nombre}...")
-                for _, row in df.iterrows():
-                    vals = []
-                    for val in row:
-                        if isinstance(val, str):
-                            vals.append(f"'{val.replace("'", "''")}'")
-                        elif pd.isna(val) or val == 'nan':
-                            vals.append("NULL")
-                        else:
-                            vals.append(str(val))
-                    
-                    # Usamos los nombres limpios en el INSERT
-                    cols_limpias = [cols_map[c] for c in df.columns]
-                    f.write(f"INSERT INTO {nombre} ({', '.join(cols_limpias)}) VALUES ({', '.join(vals)}) ON CONFLICT DO NOTHING;\n")
-                f.write("\n")
-                
+            # DDL y datos del SPEC con los nombres de columna sanitizados (limpiar_nombre_columna)
+            print(f"Generando datos ({formato}) para {', '.join(PLAN.order)}...")
+            PLAN.write(f, tablas, formato, batch_size, tsv_dir, upsert=upsert_delta(modificados),
+                       before={'mediciones': borrar_mediciones(modificados)})
+            f.write("COMMIT;\n")
+        print("¡Archivo SQL generado exitosamente y sanitizado!")
+        return f.path
+    except Exception as e:
+        print(f"Error al escribir el archivo SQL: {e}")
+        return None
+
+@profiling.stage()
+def generar_sql_por_bloques(bloques, output_path, formato='insert', batch_size=None, compresion=None,
+                            omitir_vacias=False):
+    """
+    Normaliza los bloques (PLAN.normalize_chunks) acumulando cada tabla en disco
+    (utils.TableSpool) y escribe el script. El DDL se deriva de los dtypes del
+    primer bloque de cada tabla.
+    Retorna la ruta del script escrito (None si hubo un error, igual que generar_sql).
+    """
+    tsv_dir = os.path.splitext(output_path)[0]
+    spools = PLAN.spools(formato, batch_size, tsv_dir)
+    PLAN.spool_chunks(bloques, spools, drop_empty=omitir_vacias)
+
+    print(f"\n--- 4. Generando Script SQL en: {output_path} ---")
+    try:
+        with utils.SqlWriter(output_path, compresion, header=False, verbose=False) as f:
+            f.write("BEGIN;\n\n")
+            PLAN.write_spools(f, spools)
             f.write("COMMIT;\n")
         print("¡Archivo SQL generado exitosamente y sanitizado!")
+        return f.path
     except Exception as e:
         print(f"Error al escribir el archivo SQL: {e}")
+        return None
+
+@profiling.stage()
+def cargar_en_bd(tablas, conninfo, workers=4, copy_format='binary', modificados=None):
+    """
+    Carga directa a PostgreSQL: pacientes / UCIs / diagnósticos / métricas en
+    paralelo, luego encuentros y por último mediciones (orden de FKs del SPEC).
+    """
+    tablas = {nombre: PLAN.sql_frame(df) for nombre, df in tablas.items()}
+    # El DELETE de mediciones va con el DDL: se ejecuta antes de cargar las tablas
+    ddl = PLAN.ddl(tablas) + borrar_mediciones(modificados)
+    db_loader.load_tables(conninfo, ddl, PLAN.load_stages(tablas, upsert_delta(modificados)),
+                          workers, copy_format)
 
 # --- BLOQUE PRINCIPAL ---
-if __name__ == "__main__":
+@profiling.pipeline('hospital', utils.get_project_paths(__file__)['profile'])
+def main():
+    """Ejecuta el pipeline completo. Retorna False si el dataset no se pudo procesar."""
     base_dir = os.path.dirname(os.path.abspath(__file__))
     ruta_input = os.path.join(base_dir, '..', 'raw', 'dataset.csv')
     ruta_output = os.path.join(base_dir, '..', 'sql', 'hospital_normalizado.sql')
-    
+
     ruta_input = os.path.normpath(ruta_input)
     ruta_output = os.path.normpath(ruta_output)
 
     print(f"Directorio base del script: {base_dir}")
-    
+
+    # SQL_OUTPUT_FORMAT elige INSERT / COPY / TSV; SQL_BATCH_SIZE activa los INSERT multi-fila
+    # SQL_COMPRESSION=gzip|zstd comprime el script al vuelo
+    formato = utils.get_output_format()
+    batch_size = utils.get_batch_size()
+    compresion = utils.get_compression()
+    # CSV_CHUNKSIZE activa la lectura por bloques (archivos más grandes que la RAM)
+    chunksize = utils.get_chunksize()
+    # HOSPITAL_DROP_EMPTY_MEASUREMENTS=1 no exporta las mediciones nulas / en 0
+    omitir_vacias = omitir_mediciones_vacias()
+
+    paths = utils.get_project_paths(__file__)
+
+    # DELTA_MODE=1: solo se procesan los encuentros (encounter_id) nuevos o modificados
+    huellas = delta_state.open_fingerprints(paths['state'], 'hospital')
+    if huellas is not None and chunksize:
+        print("Advertencia: DELTA_MODE no está disponible con CSV_CHUNKSIZE; se procesa el archivo completo.")
+        huellas.close()
+        huellas = None
+
+    # STAGE_CACHE=1: carga, normalización y SQL se reutilizan si el CSV y el código no
+    # cambiaron (no aplica a la lectura por bloques)
+    cache = None
+    if not chunksize:
+        cache = stage_cache.open_cache(paths['cache'], __file__, utils.__file__, normalization_spec.__file__,
+                                       sql_shards.__file__)
+
     # Ejecución
-    df_raw = cargar_y_limpiar(ruta_input)
-    
-    if df_raw is not None:
-        df_base, df_mediciones = normalizar_1fn(df_raw)
-        tablas_maestras = normalizar_2fn_3fn(df_base)
-        generar_sql(tablas_maestras, df_mediciones, ruta_output)
+    if chunksize:
+        df_raw = cargar_y_limpiar(ruta_input, chunksize)
+    else:
+        df_raw = stage_cache.cached_frames(cache, stage_cache.stage_key(cache, 'carga', ruta_input),
+                                           lambda: cargar_y_limpiar(ruta_input))
+    modificados = None
+    if df_raw is not None and huellas is not None:
+        nuevas, cambiadas = huellas.cambios(df_raw, ['encounter_id'])
+        modificados = df_raw.loc[cambiadas, 'encounter_id'].unique()
+        df_raw = df_raw[nuevas | cambiadas].copy()
+    if df_raw is None:
+        return False
+
+    if chunksize:
+        if sql_shards.shards_enabled():
+            print("Advertencia: SQL_SHARDS no está disponible con CSV_CHUNKSIZE; se genera un único script.")
+        print(f"\n--- 2-3. Normalizando por bloques de {chunksize} filas ---")
+        # Un script truncado no cuenta como éxito: run_pipelines lo reporta como fallido
+        if generar_sql_por_bloques(df_raw, ruta_output, formato, batch_size, compresion, omitir_vacias) is None:
+            return False
+    else:
+        print("\n--- 2-3. Aplicando 1FN, 2FN y 3FN (SPEC) ---")
+        # En modo delta df_raw depende de las huellas, no solo del CSV: no se cachea
+        clave = None
+        if huellas is None:
+            clave = stage_cache.stage_key(cache, 'normalizacion', ruta_input, omitir_vacias)
+        tablas = stage_cache.cached_frames(cache, clave,
+                                           lambda: PLAN.normalize(df_raw, drop_empty=omitir_vacias))
+
+        clave_sql = None
+        if huellas is None:
+            clave_sql = stage_cache.stage_key(cache, 'sql', ruta_input, ruta_output, formato,
+                                              batch_size, compresion, omitir_vacias)
+        # SQL_SHARDS=1: un archivo por tabla / rango de filas con su manifest (ver sql_shards)
+        shard_dir = os.path.splitext(ruta_output)[0] + '_shards' if sql_shards.shards_enabled() else None
+        if shard_dir is not None:
+            shard_rows, shard_workers = sql_shards.get_shard_options()
+            if clave_sql is not None:
+                clave_sql = stage_cache.stage_key(cache, 'sql', ruta_input, shard_dir, formato,
+                                                  batch_size, compresion, omitir_vacias, shard_rows)
+            if not stage_cache.outputs_current(cache, clave_sql):
+                sql_shards.write_shards(PLAN, tablas, shard_dir, formato, batch_size, compresion,
+                                        upsert=upsert_delta(modificados),
+                                        before={'mediciones': borrar_mediciones(modificados)},
+                                        shard_rows=shard_rows, workers=shard_workers)
+                stage_cache.record_outputs(cache, clave_sql, [shard_dir])
+        elif not stage_cache.outputs_current(cache, clave_sql):
+            ruta_sql = generar_sql(tablas, ruta_output, batch_size, formato, compresion, modificados)
+            if ruta_sql is None:
+                return False
+            tsv_dir = os.path.splitext(ruta_output)[0]
+            stage_cache.record_outputs(cache, clave_sql, [ruta_sql] + ([tsv_dir] if formato == 'tsv' else []))
+
+    # Carga directa a PostgreSQL (DB_LOAD=1)
+    if db_loader.load_enabled():
+        if chunksize:
+            print("Advertencia: DB_LOAD no está disponible con CSV_CHUNKSIZE; cargue el script SQL generado.")
+        else:
+            workers, copy_format = db_loader.get_load_options()
+            cargar_en_bd(tablas, db_loader.get_conninfo('DB_NAME_HOSPITAL'), workers, copy_format,
+                         modificados)
+
+    # Las huellas solo avanzan si todo lo anterior terminó bien
+    if huellas is not None:
+        huellas.commit()
+        huellas.close()
+
+    return True
+
+if __name__ == "__main__":
+    main()
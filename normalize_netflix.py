@@ -1,7 +1,57 @@
 import os
 import pandas as pd
 import utils  # El nuevo módulo unificado
+import db_loader
+import catalog_registry
+import delta_state
+import stage_cache
+import profiling
+import normalization_spec
+import date_parsing
+import sql_shards
 
+# Esquema de lectura: texto de pocos valores distintos como category
+ESQUEMA = utils.CsvSchema(categories=['type', 'rating', 'duration'])
+
+# Spec de normalización: las cuatro columnas con listas se catalogan (catálogo +
+# relación con shows) y el resto de las columnas forma la tabla shows
+SPEC = {
+    'dataset': 'netflix',
+    'tables': [
+        {'name': 'actors', 'kind': 'catalog', 'column': 'cast', 'id': 'actor_id',
+         'relation': 'shows_actors', 'parent': 'shows',
+         'types': {'actor_id': 'SERIAL', 'name': 'VARCHAR(500)'}},
+        {'name': 'directors', 'kind': 'catalog', 'column': 'director', 'id': 'director_id',
+         'relation': 'shows_directors', 'parent': 'shows',
+         'types': {'director_id': 'SERIAL', 'name': 'VARCHAR(255) NOT NULL'}},
+        {'name': 'countries', 'kind': 'catalog', 'column': 'country', 'id': 'country_id',
+         'relation': 'shows_countries', 'parent': 'shows',
+         'types': {'country_id': 'SERIAL', 'name': 'VARCHAR(100) NOT NULL'}},
+        {'name': 'genres', 'kind': 'catalog', 'column': 'listed_in', 'id': 'genre_id',
+         'relation': 'shows_genres', 'parent': 'shows',
+         'types': {'genre_id': 'SERIAL', 'name': 'VARCHAR(100) NOT NULL'}},
+        {'name': 'shows', 'kind': 'base', 'key': 'show_id',
+         'types': {'show_id': 'VARCHAR(20)', 'type': 'VARCHAR(50)', 'title': 'VARCHAR(500)',
+                   'date_added': 'VARCHAR(100)', 'release_year': 'INT', 'rating': 'VARCHAR(50)',
+                   'duration': 'VARCHAR(100)', 'description': 'TEXT'}},
+    ],
+}
+PLAN = normalization_spec.compile_spec(SPEC)
+
+# Con NETFLIX_DATE_ADDED_AS_DATE=1 date_added ("September 25, 2021") se guarda como DATE
+_SHOWS = SPEC['tables'][-1]
+SPEC_DATE_ADDED = dict(SPEC, tables=SPEC['tables'][:-1] + [
+    dict(_SHOWS, types=dict(_SHOWS['types'], date_added='DATE'))])
+PLAN_DATE_ADDED = normalization_spec.compile_spec(SPEC_DATE_ADDED)
+
+def date_added_as_date():
+    """
+    True si NETFLIX_DATE_ADDED_AS_DATE está activado: date_added se convierte a
+    fecha (las vacías o inválidas quedan NULL) en lugar de guardarse como texto.
+    """
+    return os.environ.get('NETFLIX_DATE_ADDED_AS_DATE', '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+@profiling.pipeline('netflix', utils.get_project_paths(__file__)['profile'])
 def main():
     # 1. Configurar Rutas
     # CAMBIO: Usamos el diccionario que devuelve la nueva función
@@ -10,62 +60,113 @@ def main():
     output_file = os.path.join(paths['sql'], 'netflix_normalized.sql')
     
     print("--- Procesando Dataset: Netflix ---")
+
+    # STAGE_CACHE=1: carga, normalización y SQL se reutilizan si el CSV y el código no cambiaron
+    cache = stage_cache.open_cache(paths['cache'], __file__, utils.__file__, normalization_spec.__file__,
+                                   sql_shards.__file__, date_parsing.__file__)
+
+    # NETFLIX_DATE_ADDED_AS_DATE=1: date_added como DATE (usa el plan con ese tipo)
+    fechas = date_added_as_date()
+    plan = PLAN_DATE_ADDED if fechas else PLAN
     
     # 2. Cargar Datos
     # CAMBIO: load_csv ahora es load_data
-    df = utils.load_data(input_file)
-    if df is None: return
+    def cargar():
+        df = utils.load_data(input_file, schema=ESQUEMA, engine=utils.get_csv_engine())
+        if df is None: return None
+
+        # Limpieza específica de este dataset
+        text_cols = ['director', 'cast', 'country', 'rating', 'date_added', 'duration']
+        df = utils.clean_text_columns(df, text_cols)
+        df['release_year'] = df['release_year'].fillna(0).astype(int)
+        if fechas:
+            # 'N/A' (relleno de clean_text_columns) no es una fecha: queda NULL
+            df['date_added'] = date_parsing.as_dates(date_parsing.parse_datetimes(df['date_added']))
+        return df
+
+    df = stage_cache.cached_frames(cache, stage_cache.stage_key(cache, 'carga', input_file, fechas), cargar)
+    if df is None: return False
 
-    # Limpieza específica de este dataset
-    text_cols = ['director', 'cast', 'country', 'rating', 'date_added', 'duration']
-    df = utils.clean_text_columns(df, text_cols)
-    df['release_year'] = df['release_year'].fillna(0).astype(int)
+    # Modo delta (DELTA_MODE=1): solo se procesan los shows nuevos o modificados
+    huellas = delta_state.open_fingerprints(paths['state'], 'netflix')
+    modificados = None
+    if huellas is not None:
+        nuevas, modificadas = huellas.cambios(df, ['show_id'])
+        modificados = df.loc[modificadas, 'show_id'].unique()
+        df = df[nuevas | modificadas].copy()
 
-    # 3. Normalización
+    # 3. Normalización (SPEC): los cuatro catálogos se construyen en una sola pasada
     print("Generando catálogos y relaciones...")
-    actors_cat, actors_rel = utils.create_catalog(df, 'cast', 'actor_id')
-    directors_cat, directors_rel = utils.create_catalog(df, 'director', 'director_id')
-    countries_cat, countries_rel = utils.create_catalog(df, 'country', 'country_id')
-    genres_cat, genres_rel = utils.create_catalog(df, 'listed_in', 'genre_id')
 
-    cols_drop = ['cast', 'director', 'country', 'listed_in']
-    shows_df = df.drop(columns=cols_drop).drop_duplicates('show_id')
+    # En modo delta df depende de las huellas, no solo del CSV: no se cachea
+    clave = stage_cache.stage_key(cache, 'normalizacion', input_file, fechas) if huellas is None else None
+    tablas = stage_cache.cached_frames(cache, clave, lambda: plan.normalize(df))
+
+    # Registro persistente (CATALOG_REGISTRY=1): IDs estables entre ejecuciones y
+    # solo las filas nuevas de catálogos y relaciones. El modo delta lo necesita
+    # para que los IDs del subconjunto coincidan con los ya cargados
+    registro = catalog_registry.open_registry(paths['state'], 'netflix', force=huellas is not None)
+    if registro is not None:
+        for catalogo, relacion in plan.catalogs:
+            if modificados is not None:
+                registro.olvidar_relaciones(relacion, modificados)
+            tablas[catalogo], tablas[relacion] = registro.delta(catalogo, tablas[catalogo], tablas[relacion])
 
     # 4. Generación de SQL
     print("Construyendo script SQL...")
-    
-    # Creamos una lista para ir acumulando el contenido (más eficiente que concatenar strings gigantes)
-    sql_parts = ["-- Script Generado para Netflix (3FN)\nBEGIN;\n\n"]
-    
-    # DDL Manual
-    sql_parts.append("""
-    CREATE TABLE IF NOT EXISTS actors (actor_id SERIAL PRIMARY KEY, name VARCHAR(500));
-    CREATE TABLE shows (show_id VARCHAR(20) PRIMARY KEY, type VARCHAR(50), title VARCHAR(500), date_added VARCHAR(100), release_year INT, rating VARCHAR(50), duration VARCHAR(100), description TEXT);
-    CREATE TABLE IF NOT EXISTS shows_actors (show_id VARCHAR(20), actor_id INT, PRIMARY KEY(show_id, actor_id));
-    CREATE TABLE IF NOT EXISTS directors (director_id SERIAL PRIMARY KEY, name VARCHAR(255) NOT NULL);
-    CREATE TABLE IF NOT EXISTS countries (country_id SERIAL PRIMARY KEY, name VARCHAR(100) NOT NULL);
-    CREATE TABLE IF NOT EXISTS genres (genre_id SERIAL PRIMARY KEY, name VARCHAR(100) NOT NULL);
-    CREATE TABLE IF NOT EXISTS shows_directors (show_id VARCHAR(20) REFERENCES shows(show_id), director_id INT REFERENCES directors(director_id), PRIMARY KEY (show_id, director_id));
-    CREATE TABLE IF NOT EXISTS shows_countries (show_id VARCHAR(20) REFERENCES shows(show_id), country_id INT REFERENCES countries(country_id), PRIMARY KEY (show_id, country_id));
-    CREATE TABLE IF NOT EXISTS shows_genres (show_id VARCHAR(20) REFERENCES shows(show_id), genre_id INT REFERENCES genres(genre_id), PRIMARY KEY (show_id, genre_id));
-	""")
-
-    # DML (Inserts) usando la nueva utilidad df_to_sql_insert
-    sql_parts.append(utils.df_to_sql_insert(actors_cat, 'actors'))
-    sql_parts.append(utils.df_to_sql_insert(shows_df, 'shows'))
-    sql_parts.append(utils.df_to_sql_insert(actors_rel, 'shows_actors'))
-    sql_parts.append(utils.df_to_sql_insert(directors_cat, 'directors'))
-    sql_parts.append(utils.df_to_sql_insert(countries_cat, 'countries'))
-    sql_parts.append(utils.df_to_sql_insert(genres_cat, 'genres'))
-    sql_parts.append(utils.df_to_sql_insert(directors_rel, 'shows_directors'))
-    sql_parts.append(utils.df_to_sql_insert(countries_rel, 'shows_countries'))
-    sql_parts.append(utils.df_to_sql_insert(genres_rel, 'shows_genres'))
-    # ... agregar los demás dataframes ...
-
-    sql_parts.append("\nCOMMIT;")
-    
-    # 5. Guardar usando la función que acepta listas
-    utils.write_sql_file(sql_parts, output_file)
+
+    # DDL y DML derivados del SPEC: catálogos y shows, luego las relaciones (orden de FKs)
+    # SQL_OUTPUT_FORMAT elige INSERT / COPY / TSV; SQL_BATCH_SIZE activa los INSERT multi-fila
+    output_format = utils.get_output_format()
+    batch_size = utils.get_batch_size()
+    tsv_dir = os.path.join(paths['sql'], 'netflix_normalized')
+    # En modo delta los shows modificados se actualizan (UPSERT por show_id) y sus
+    # relaciones se borran y se insertan completas (incluidas las que ya no están)
+    upsert = {'shows': ['show_id']} if huellas is not None else {}
+    borrar = {relacion: delta_state.delete_rows(relacion, 'show_id', modificados)
+              for _, relacion in plan.catalogs}
+
+    # 5. Guardar en streaming: cada tabla se escribe al archivo por bloques de filas
+    # SQL_COMPRESSION=gzip|zstd comprime el script al vuelo
+    compression = utils.get_compression()
+    # Con registro o modo delta la salida depende del estado guardado: no se cachea
+    clave_sql = None
+    if registro is None and huellas is None:
+        clave_sql = stage_cache.stage_key(cache, 'sql', input_file, output_file, output_format,
+                                          batch_size, compression, fechas)
+    # SQL_SHARDS=1: un archivo por tabla / rango de filas con su manifest (ver sql_shards)
+    shard_dir = os.path.join(paths['sql'], 'netflix_shards') if sql_shards.shards_enabled() else None
+    if shard_dir is not None:
+        shard_rows, shard_workers = sql_shards.get_shard_options()
+        if clave_sql is not None:
+            clave_sql = stage_cache.stage_key(cache, 'sql', input_file, shard_dir, output_format,
+                                              batch_size, compression, shard_rows, fechas)
+    if not stage_cache.outputs_current(cache, clave_sql):
+        if shard_dir is not None:
+            sql_shards.write_shards(plan, tablas, shard_dir, output_format, batch_size, compression,
+                                    upsert=upsert, before=borrar, shard_rows=shard_rows, workers=shard_workers)
+            stage_cache.record_outputs(cache, clave_sql, [shard_dir])
+        else:
+            with utils.SqlWriter(output_file, compression) as sql:
+                sql.write("-- Script Generado para Netflix (3FN)\nBEGIN;\n\n")
+                plan.write(sql, tablas, output_format, batch_size, tsv_dir, upsert=upsert, before=borrar)
+                sql.write("\nCOMMIT;\n")
+            stage_cache.record_outputs(cache, clave_sql, [sql.path] + ([tsv_dir] if output_format == 'tsv' else []))
+
+    # 6. Carga directa a PostgreSQL (DB_LOAD=1): las tablas sin dependencias entre sí
+    # (catálogos y shows, luego las relaciones) se cargan en paralelo
+    if db_loader.load_enabled():
+        workers, copy_format = db_loader.get_load_options()
+        # Los DELETE del modo delta van con el DDL: se ejecutan antes de cargar las tablas
+        db_loader.load_tables(db_loader.get_conninfo('DB_NAME_NETFLIX'),
+                              plan.ddl(tablas) + "".join(borrar.values()),
+                              plan.load_stages(tablas, upsert), workers, copy_format)
+
+    # 7. El registro y las huellas solo avanzan si todo lo anterior terminó bien
+    for estado in (registro, huellas):
+        if estado is not None:
+            estado.commit()
+            estado.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,194 @@
+import functools
+import json
+import os
+import time
+import types
+
+try:
+    import resource  # Solo Unix: pico de memoria (RSS) del proceso
+except ImportError:
+    resource = None
+
+# --- INSTRUMENTACIÓN DE ETAPAS ---
+# Con PIPELINE_PROFILE=1 cada etapa decorada con @stage registra tiempo real, tiempo
+# de CPU, crecimiento del pico de memoria (RSS), filas de entrada/salida y bytes
+# escritos, y al terminar el pipeline se escribe un reporte JSON en sql/profile/.
+# Con PIPELINE_PROFILE_CPROFILE=1 además se guarda un .prof (cProfile) por etapa
+# de primer nivel, para abrir con snakeviz / flameprof. Desactivado, cada llamada
+# solo paga la comprobación de una variable global.
+# Las etapas que retornan un generador (lectura por bloques) se marcan 'lazy': su
+# tiempo, memoria y filas se acumulan mientras se consume el generador.
+
+_run = None
+
+def profiling_enabled():
+    """True si PIPELINE_PROFILE está activado (1 / true / si)."""
+    return os.environ.get('PIPELINE_PROFILE', '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+def cprofile_enabled():
+    """True si PIPELINE_PROFILE_CPROFILE está activado (requiere PIPELINE_PROFILE)."""
+    return os.environ.get('PIPELINE_PROFILE_CPROFILE', '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+def _peak_rss_mb():
+    if resource is None:
+        return 0.0
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _count_rows(value):
+    """Filas de un DataFrame, o suma de las filas de los DataFrames de un dict / tupla."""
+    if hasattr(value, 'shape') and hasattr(value, 'columns'):
+        return len(value)
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (list, tuple)):
+        return None
+    filas = [n for n in (_count_rows(v) for v in value) if n is not None]
+    return sum(filas) if filas else None
+
+class RunReport:
+    """Registro de las etapas de una ejecución de un pipeline."""
+
+    def __init__(self, dataset, report_dir):
+        self.dataset = dataset
+        self.report_dir = report_dir
+        self.started = time.time()
+        self.stages = []
+        self._stack = []
+        self._cprofile = cprofile_enabled()
+
+    def record_bytes(self, n):
+        # Los bytes cuentan para todas las etapas abiertas (ej. generar_sql y write_table)
+        for entry in self._stack:
+            entry['bytes_out'] += n
+
+    def call(self, name, detail, fn, args, kwargs):
+        entry = {
+            'stage': name, 'detail': detail, 'depth': len(self._stack),
+            'rows_in': _count_rows([a for a in args if hasattr(a, 'columns') or isinstance(a, dict)]),
+            'rows_out': None, 'bytes_out': 0, 'ok': False,
+        }
+        self.stages.append(entry)
+        self._stack.append(entry)
+
+        profiler = None
+        if self._cprofile and entry['depth'] == 1:
+            # cProfile no se puede anidar: solo las etapas de primer nivel (bajo main)
+            import cProfile
+            profiler = cProfile.Profile()
+
+        rss = _peak_rss_mb()
+        cpu = time.process_time()
+        inicio = time.perf_counter()
+        try:
+            result = profiler.runcall(fn, *args, **kwargs) if profiler else fn(*args, **kwargs)
+            entry['ok'] = True
+        finally:
+            entry['wall_s'] = round(time.perf_counter() - inicio, 6)
+            entry['cpu_s'] = round(time.process_time() - cpu, 6)
+            entry['peak_rss_delta_mb'] = round(_peak_rss_mb() - rss, 1)
+            self._stack.pop()
+            if profiler is not None:
+                entry['profile'] = self._dump_profile(profiler, len(self.stages), name)
+
+        if isinstance(result, types.GeneratorType):
+            entry['lazy'] = True
+            entry['rows_out'] = 0
+            return self._consume(entry, result, rss)
+        entry['rows_out'] = _count_rows(result)
+        if isinstance(result, (str, bytes)):
+            entry['bytes_out'] += len(result)
+        return result
+
+    def _consume(self, entry, gen, rss):
+        """Itera gen sumando a entry el tiempo de cada next() (la etapa vuelve a estar abierta)."""
+        try:
+            while True:
+                self._stack.append(entry)
+                cpu = time.process_time()
+                inicio = time.perf_counter()
+                try:
+                    value = next(gen)
+                except StopIteration:
+                    return
+                except BaseException:
+                    entry['ok'] = False
+                    raise
+                finally:
+                    entry['wall_s'] = round(entry['wall_s'] + time.perf_counter() - inicio, 6)
+                    entry['cpu_s'] = round(entry['cpu_s'] + time.process_time() - cpu, 6)
+                    entry['peak_rss_delta_mb'] = round(_peak_rss_mb() - rss, 1)
+                    self._stack.pop()
+                entry['rows_out'] += _count_rows(value) or 0
+                yield value
+        finally:
+            gen.close()
+
+    def _dump_profile(self, profiler, n, name):
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(self.report_dir, f"{self.dataset}_{int(self.started)}_{n:03d}_{name}.prof")
+        profiler.dump_stats(path)
+        return path
+
+    def write(self):
+        """Escribe el reporte JSON y retorna su ruta."""
+        os.makedirs(self.report_dir, exist_ok=True)
+        resumen = {}
+        for entry in self.stages:
+            total = resumen.setdefault(entry['stage'], {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0})
+            total['calls'] += 1
+            total['wall_s'] = round(total['wall_s'] + entry.get('wall_s', 0.0), 6)
+            total['cpu_s'] = round(total['cpu_s'] + entry.get('cpu_s', 0.0), 6)
+        path = os.path.join(self.report_dir, f"{self.dataset}_{int(self.started)}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'dataset': self.dataset,
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'summary': resumen,
+                'stages': self.stages,
+            }, f, indent=2)
+        return path
+
+def stage(name=None, detail=None):
+    """
+    Decorador de etapa. name: nombre en el reporte (por defecto el de la función).
+    detail: función opcional que recibe los mismos argumentos y devuelve un texto
+    para distinguir llamadas (ej. el nombre de la tabla).
+    """
+    def decorador(fn):
+        nombre = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _run is None:
+                return fn(*args, **kwargs)
+            texto = detail(*args, **kwargs) if detail is not None else None
+            return _run.call(nombre, texto, fn, args, kwargs)
+        return wrapper
+    return decorador
+
+def pipeline(dataset, report_dir):
+    """
+    Decorador del main() de un script: si PIPELINE_PROFILE está activado, abre el
+    registro de la ejecución y al terminar (también si falla) escribe el reporte.
+    """
+    def decorador(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            global _run
+            if not profiling_enabled() or _run is not None:
+                return fn(*args, **kwargs)
+            _run = RunReport(dataset, report_dir)
+            try:
+                return _run.call('main', dataset, fn, args, kwargs)
+            finally:
+                path = _run.write()
+                _run = None
+                print(f"Reporte de perfilado: {path}")
+        return wrapper
+    return decorador
+
+def record_bytes(n):
+    """Suma bytes escritos a las etapas en curso (no hace nada si está desactivado)."""
+    if _run is not None:
+        _run.record_bytes(n)
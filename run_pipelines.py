@@ -0,0 +1,81 @@
+"""
+Orquestador: ejecuta los tres pipelines (Netflix, E-commerce, Hospital) en paralelo
+en un pool de procesos y termina con código 1 si alguno falla.
+
+Uso:
+    python scripts/run_pipelines.py [netflix] [ecommerce] [hospital]
+Sin argumentos ejecuta los tres. PIPELINE_WORKERS fija el número de procesos
+(por defecto 3; con 1 se ejecutan en secuencia en este mismo proceso).
+"""
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Se importan aquí (pandas incluido) para que los procesos hijos los hereden ya
+# cargados en lugar de pagar el import cada uno
+import normalize_netflix
+import normalize_ecommerce
+import normalize_hospital
+
+PIPELINES = {
+    'netflix': normalize_netflix.main,
+    'ecommerce': normalize_ecommerce.main,
+    'hospital': normalize_hospital.main,
+}
+
+def get_workers(default=3):
+    """Lee el número de procesos desde PIPELINE_WORKERS (mínimo 1)."""
+    value = os.environ.get('PIPELINE_WORKERS', '').strip()
+    return max(1, int(value or default))
+
+def run_pipeline(nombre):
+    """
+    Ejecuta un pipeline y retorna (nombre, ok, segundos). Un pipeline falla si
+    lanza una excepción o si su main() retorna False (ej. no encontró el CSV).
+    """
+    inicio = time.perf_counter()
+    try:
+        ok = PIPELINES[nombre]() is not False
+    except Exception:
+        traceback.print_exc()
+        ok = False
+    return nombre, ok, time.perf_counter() - inicio
+
+def main(argv=None):
+    nombres = list(argv) if argv else list(PIPELINES)
+    desconocidos = [n for n in nombres if n not in PIPELINES]
+    if desconocidos:
+        print(f"ERROR: pipelines desconocidos {desconocidos}; opciones: {list(PIPELINES)}")
+        return 2
+
+    workers = min(get_workers(), len(nombres))
+    print(f"--- Ejecutando {len(nombres)} pipelines con {workers} procesos ---")
+    inicio = time.perf_counter()
+    resultados = {}
+    if workers == 1:
+        for nombre in nombres:
+            resultados[nombre] = run_pipeline(nombre)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futuros = {executor.submit(run_pipeline, nombre): nombre for nombre in nombres}
+            for futuro in as_completed(futuros):
+                nombre = futuros[futuro]
+                try:
+                    resultados[nombre] = futuro.result()
+                except Exception as e:
+                    # El proceso hijo murió (ej. sin memoria) sin devolver resultado
+                    print(f"ERROR: el pipeline {nombre} terminó de forma anormal: {e}")
+                    resultados[nombre] = (nombre, False, time.perf_counter() - inicio)
+
+    print("\n--- Resumen ---")
+    for nombre in nombres:
+        _, ok, segundos = resultados[nombre]
+        print(f"{nombre:<10} {'OK' if ok else 'FALLÓ':<6} {segundos:8.1f}s")
+    print(f"Total: {time.perf_counter() - inicio:.1f}s")
+
+    return 0 if all(ok for _, ok, _ in resultados.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,228 @@
+"""
+Salida SQL particionada (SQL_SHARDS=1) y su cargador en paralelo.
+
+En lugar de un único .sql envuelto en BEGIN; ... COMMIT;, cada tabla (y las tablas
+grandes, por rangos de SQL_SHARD_ROWS filas) va a su propio archivo con su propia
+transacción: un error solo deshace ese shard y la carga se puede repartir entre
+varias conexiones. Los shards se renderizan en paralelo en SQL_SHARD_WORKERS
+procesos. manifest.json indica el orden de carga:
+
+- schema: el DDL (y el SQL previo a los datos, ej. el DELETE del modo delta).
+- stages: etapas en el orden de FKs (catálogos antes que relaciones; pacientes /
+  unidades_uci antes que encuentros y encuentros antes que mediciones). Los shards
+  de una misma etapa son independientes y se pueden cargar a la vez.
+
+Uso del cargador (requiere el cliente psql en el PATH):
+    python scripts/sql_shards.py sql/netflix_shards/manifest.json [--workers 4]
+                                 [--db-name-var DB_NAME_NETFLIX] [--solo ARCHIVO ...]
+La conexión se toma de DB_HOST / DB_PORT / DB_USER / DB_PASS / <db-name-var>.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import db_loader
+import profiling
+import utils
+
+MANIFEST = 'manifest.json'
+SCHEMA_FILE = 'schema.sql'
+
+# Archivos que genera write_shards (se borran antes de escribir un conjunto nuevo)
+_SHARD_FILE = re.compile(r'^(schema|\d{2}_.+_\d{4})\.sql(\.gz|\.zst)?$')
+
+def shards_enabled():
+    """True si SQL_SHARDS está activado (1 / true / si)."""
+    return os.environ.get('SQL_SHARDS', '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+def get_shard_options(default_rows=500_000):
+    """Lee SQL_SHARD_ROWS (filas máximas por shard) y SQL_SHARD_WORKERS (procesos de renderizado)."""
+    rows = int(os.environ.get('SQL_SHARD_ROWS', '').strip() or default_rows)
+    workers = int(os.environ.get('SQL_SHARD_WORKERS', '').strip() or os.cpu_count() or 1)
+    return max(1, rows), max(1, workers)
+
+def _clear_shards(out_dir):
+    # Un conjunto anterior con más shards dejaría archivos huérfanos
+    for nombre in os.listdir(out_dir):
+        if nombre == MANIFEST or _SHARD_FILE.match(nombre):
+            os.remove(os.path.join(out_dir, nombre))
+
+def _render_shard(df, path, table_name, output_format, batch_size, columns, upsert, compression):
+    # Corre en un proceso del pool: cada shard es un script completo con su transacción
+    with utils.SqlWriter(path, compression, header=False, verbose=False) as sql:
+        sql.write("BEGIN;\n")
+        sql.write_table(df, table_name, output_format, batch_size, columns=columns, upsert=upsert,
+                        iterrows_compat=False)
+        sql.write("COMMIT;\n")
+    return sql.path
+
+@profiling.stage()
+def write_shards(plan, tables, out_dir, output_format='insert', batch_size=None, compression=None,
+                 upsert=None, before=None, shard_rows=500_000, workers=1):
+    """
+    Escribe las tablas de un NormalizationPlan como shards en out_dir y su manifest.json.
+    upsert / before: como en NormalizationPlan.write (before va al final del schema).
+    El formato 'tsv' se escribe como 'copy': cada shard ya es su propio archivo.
+    Retorna la ruta del manifest.
+    """
+    upsert = upsert or {}
+    before = before or {}
+    if output_format == 'tsv':
+        print("Advertencia: SQL_OUTPUT_FORMAT=tsv no aplica a SQL_SHARDS; los shards usan COPY.")
+        output_format = 'copy'
+    os.makedirs(out_dir, exist_ok=True)
+    _clear_shards(out_dir)
+    print(f"\n--- Generando shards SQL en: {out_dir} ({workers} procesos) ---")
+
+    with utils.SqlWriter(os.path.join(out_dir, SCHEMA_FILE), compression, verbose=False) as sql:
+        sql.write(plan.ddl(tables))
+        for name in plan.order:
+            if before.get(name):
+                sql.write(before[name])
+    schema_path = sql.path
+
+    # Un shard por tabla o por rango de filas, numerados por etapa de FKs
+    tareas = []
+    stages = []
+    for nivel, etapa in enumerate(plan.load_stages(tables, upsert)):
+        shards = []
+        for name, df, _, conflicto in etapa:
+            columns = plan.sql_columns(df)
+            for parte, inicio in enumerate(range(0, max(len(df), 1), shard_rows)):
+                path = os.path.join(out_dir, f"{nivel:02d}_{name}_{parte:04d}.sql")
+                bloque = df.iloc[inicio:inicio + shard_rows]
+                tareas.append((bloque, path, name, output_format, batch_size, columns, conflicto, compression))
+                shards.append({'table': name, 'first_row': inicio, 'rows': len(bloque)})
+        stages.append(shards)
+
+    if workers == 1:
+        rutas = [_render_shard(*tarea) for tarea in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rutas = list(executor.map(_render_shard, *zip(*tareas)))
+
+    rutas = iter(rutas)
+    for shards in stages:
+        for shard in shards:
+            shard['file'] = os.path.basename(next(rutas))
+    manifest = {
+        'dataset': plan.dataset,
+        'format': output_format,
+        'compression': compression,
+        'schema': os.path.basename(schema_path),
+        'stages': stages,
+    }
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    total = sum(len(shards) for shards in stages)
+    print(f"¡{total} shards en {len(stages)} etapas generados exitosamente!")
+    return manifest_path
+
+# --- CARGA DESDE EL MANIFEST ---
+
+def _psql_command(conninfo):
+    psql = shutil.which('psql')
+    if psql is None:
+        raise FileNotFoundError("La carga de shards requiere el cliente 'psql' en el PATH")
+    return [psql, '-X', '-q', '-v', 'ON_ERROR_STOP=1', '-d', conninfo]
+
+def _open_shard(path):
+    # Los shards comprimidos se descomprimen al vuelo hacia la entrada de psql
+    if path.endswith('.gz'):
+        import gzip
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Los shards zstd requieren el paquete 'zstandard' (pip install zstandard)") from None
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return None
+
+def run_shard(command, path):
+    """Ejecuta un shard con psql. Retorna (ruta, ok, segundos, mensaje de error)."""
+    inicio = time.perf_counter()
+    # -f mantiene las rutas relativas y los números de línea en los errores
+    entrada = _open_shard(path)
+    if entrada is None:
+        proceso = subprocess.run(command + ['-f', path], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                 text=True)
+        return path, proceso.returncode == 0, time.perf_counter() - inicio, proceso.stderr.strip()
+
+    with entrada, subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE) as proceso:
+        try:
+            shutil.copyfileobj(entrada, proceso.stdin)
+        except BrokenPipeError:
+            # psql terminó antes (ON_ERROR_STOP): el error queda en stderr
+            pass
+        finally:
+            proceso.stdin.close()
+        error = proceso.stderr.read().decode('utf-8', 'replace')
+        proceso.wait()
+    return path, proceso.returncode == 0, time.perf_counter() - inicio, error.strip()
+
+@profiling.stage()
+def load_manifest(manifest_path, conninfo, workers=4, only=None):
+    """
+    Replica un manifest con hasta `workers` psql en paralelo: primero el schema,
+    luego cada etapa (una etapa termina antes de empezar la siguiente). Si falla
+    algún shard no se cargan las etapas siguientes, que dependen de él por FKs.
+    only: nombres de archivo a cargar (ej. para repetir los shards que fallaron);
+    en ese caso se omite el schema.
+    Retorna la lista de shards que fallaron.
+    """
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    command = _psql_command(conninfo)
+    print(f"\n--- Cargando shards de {manifest['dataset']} ({workers} conexiones) ---")
+    inicio = time.perf_counter()
+
+    if not only:
+        _, ok, _, error = run_shard(command, os.path.join(base, manifest['schema']))
+        if not ok:
+            print(f"ERROR en {manifest['schema']}:\n{error}")
+            return [manifest['schema']]
+
+    fallidos = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for nivel, shards in enumerate(manifest['stages']):
+            archivos = [s['file'] for s in shards if not only or s['file'] in only]
+            resultados = executor.map(lambda nombre: run_shard(command, os.path.join(base, nombre)), archivos)
+            for path, ok, segundos, error in resultados:
+                nombre = os.path.basename(path)
+                if ok:
+                    print(f"{nombre}: OK ({segundos:.1f}s)")
+                else:
+                    print(f"ERROR en {nombre}:\n{error}")
+                    fallidos.append(nombre)
+            if fallidos:
+                print(f"Se detiene la carga en la etapa {nivel}: {len(fallidos)} shards fallaron.")
+                break
+    print(f"Carga de shards terminada en {time.perf_counter() - inicio:.1f}s")
+    return fallidos
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carga en paralelo los shards SQL de un manifest.")
+    parser.add_argument('manifest', help="ruta al manifest.json de los shards")
+    parser.add_argument('--workers', type=int, default=4, help="conexiones psql en paralelo")
+    parser.add_argument('--db-name-var', default='DB_NAME', help="variable con el nombre de la base (ej. DB_NAME_NETFLIX)")
+    parser.add_argument('--solo', nargs='+', metavar='ARCHIVO', help="solo estos shards (sin el schema)")
+    args = parser.parse_args(argv)
+
+    fallidos = load_manifest(args.manifest, db_loader.get_conninfo(args.db_name_var), max(1, args.workers),
+                             args.solo)
+    if fallidos:
+        print(f"Repetir con: --solo {' '.join(fallidos)}")
+    return 1 if fallidos else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
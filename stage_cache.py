@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- CACHÉ DE ETAPAS (DIRECCIONADA POR CONTENIDO) ---
+# Guarda el resultado de las etapas de cada script (carga y limpieza, normalización)
+# en sql/cache/, en formato Feather sin comprimir (se lee con memory-map). La clave
+# de cada etapa es el hash del CSV de entrada + la versión del código (hash de los
+# .py que la producen) + los parámetros de la etapa: si nada cambió, la etapa se
+# reutiliza. La generación del .sql se omite si el archivo en disco sigue siendo
+# el que produjo la misma clave. Requiere el paquete opcional pyarrow.
+
+CACHE_FORMAT = 1
+
+def cache_enabled():
+    """True si STAGE_CACHE está activado (1 / true / si)."""
+    return os.environ.get('STAGE_CACHE', '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+def get_max_bytes(default_mb=2048):
+    """Tamaño máximo de la caché desde STAGE_CACHE_MAX_MB (por defecto 2048 MB)."""
+    value = os.environ.get('STAGE_CACHE_MAX_MB', '').strip()
+    return int(value or default_mb) * 1024 * 1024
+
+def open_cache(cache_dir, *sources):
+    """
+    Abre la caché si STAGE_CACHE está activado; si no, None.
+    sources: archivos .py cuyo contenido define la versión del código.
+    STAGE_CACHE_CLEAR=1 la vacía antes de usarla (invalidación manual).
+    """
+    if not cache_enabled():
+        return None
+    cache = StageCache(cache_dir, sources, get_max_bytes())
+    if os.environ.get('STAGE_CACHE_CLEAR', '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes'):
+        cache.clear()
+    return cache
+
+def _import_feather():
+    # Dependencia opcional: solo se necesita si se activa la caché
+    try:
+        import pyarrow
+        import pyarrow.feather
+    except ImportError:
+        raise ImportError("La caché de etapas requiere el paquete 'pyarrow' (pip install pyarrow)") from None
+    return pyarrow
+
+def file_sha256(path, block_size=1 << 20):
+    """Hash SHA-256 de un archivo, leído por bloques."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _nan_nulls(df):
+    # Arrow devuelve los nulos de texto como None; pandas los lee del CSV como NaN.
+    # Se restituye NaN para que los hashes (modo delta) coincidan con y sin caché
+    for col in df.columns[df.dtypes == object]:
+        nulos = df[col].isna()
+        if nulos.any():
+            df[col] = df[col].where(~nulos, np.nan)
+    return df
+
+# --- Atajos para los scripts: con cache None (caché desactivada) no hacen nada ---
+
+def stage_key(cache, stage, input_path, *parts):
+    """Clave de una etapa, o None si no hay caché."""
+    return cache.key(stage, input_path, *parts) if cache is not None else None
+
+def cached_frames(cache, key, build):
+    """Resultado de build() (DataFrame o dict de DataFrames), desde la caché si está."""
+    if cache is None or key is None:
+        return build()
+    return cache.frames(key, build)
+
+def outputs_current(cache, key):
+    """True si los archivos de salida registrados con key siguen intactos."""
+    return cache is not None and key is not None and cache.outputs_current(key)
+
+def record_outputs(cache, key, paths):
+    """Registra los archivos de salida (o carpetas) producidos con key."""
+    if cache is not None and key is not None:
+        cache.record_outputs(key, paths)
+
+class StageCache:
+    """
+    Caché de etapas en disco. Cada entrada es una carpeta <etapa>-<hash>/ con un
+    manifest.json y un .feather por tabla. Al superar max_bytes se eliminan las
+    entradas usadas hace más tiempo (LRU por fecha de modificación).
+    """
+
+    def __init__(self, cache_dir, sources=(), max_bytes=2048 * 1024 * 1024):
+        self._pa = _import_feather()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.dir = cache_dir
+        self.max_bytes = max_bytes
+        self._hashes_path = os.path.join(cache_dir, 'hashes.json')
+        # Versión del código: cambia si cambia cualquiera de los .py indicados
+        digest = hashlib.sha256()
+        for source in sources:
+            digest.update(file_sha256(source).encode())
+        self.version = digest.hexdigest()
+
+    def file_hash(self, path):
+        """
+        Hash del contenido de un archivo. Se memoriza por (tamaño, mtime) en
+        hashes.json para no releer un CSV grande que no cambió.
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        firma = [st.st_size, st.st_mtime_ns]
+        memo = self._read_json(self._hashes_path) or {}
+        previo = memo.get(path)
+        if previo and previo['firma'] == firma:
+            return previo['sha256']
+        digest = file_sha256(path)
+        memo[path] = {'firma': firma, 'sha256': digest}
+        self._write_json(self._hashes_path, memo)
+        return digest
+
+    def key(self, stage, input_path, *parts):
+        """
+        Clave de una etapa: hash de la entrada, versión del código y parámetros.
+        None si el archivo de entrada no existe (la etapa no se cachea).
+        """
+        if not os.path.exists(input_path):
+            return None
+        texto = json.dumps([CACHE_FORMAT, stage, self.file_hash(input_path), self.version, *parts],
+                           default=str)
+        return f"{stage}-{hashlib.sha256(texto.encode('utf-8')).hexdigest()[:24]}"
+
+    def frames(self, key, build):
+        """Devuelve la etapa desde la caché o la construye con build() y la guarda."""
+        cached = self.get_frames(key)
+        if cached is not None:
+            print(f"Caché: etapa '{key.split('-')[0]}' sin cambios, se reutiliza.")
+            return cached
+        result = build()
+        if result is not None:
+            self.put_frames(key, result)
+        return result
+
+    def get_frames(self, key):
+        entry = os.path.join(self.dir, key)
+        manifest = self._read_json(os.path.join(entry, 'manifest.json'))
+        if manifest is None or 'frames' not in manifest:
+            return None
+        frames = {}
+        for i, name in enumerate(manifest['frames']):
+            # memory_map: las columnas numéricas se leen sin copiar el archivo
+            table = self._pa.feather.read_table(os.path.join(entry, f"{i}.feather"), memory_map=True)
+            frames[name] = _nan_nulls(table.to_pandas())
+        self._touch(entry)
+        return frames[None] if manifest['single'] else frames
+
+    def put_frames(self, key, result):
+        single = isinstance(result, pd.DataFrame)
+        frames = {None: result} if single else result
+        entry = os.path.join(self.dir, key)
+        tmp = f"{entry}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        try:
+            for i, df in enumerate(frames.values()):
+                table = self._pa.Table.from_pandas(df, preserve_index=True)
+                self._pa.feather.write_feather(table, os.path.join(tmp, f"{i}.feather"),
+                                               compression='uncompressed')
+        except (self._pa.ArrowInvalid, self._pa.ArrowTypeError, self._pa.ArrowNotImplementedError) as e:
+            # Columnas con tipos mixtos que Arrow no representa: la etapa no se cachea
+            print(f"Advertencia: la etapa '{key.split('-')[0]}' no se puede cachear ({e}).")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+        self._write_json(os.path.join(tmp, 'manifest.json'), {'frames': list(frames), 'single': single})
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+        self.evict()
+        return True
+
+    def outputs_current(self, key):
+        manifest = self._read_json(os.path.join(self.dir, key, 'manifest.json'))
+        if manifest is None or 'outputs' not in manifest:
+            return False
+        for path, digest in manifest['outputs'].items():
+            if not os.path.exists(path) or self.file_hash(path) != digest:
+                return False
+        self._touch(os.path.join(self.dir, key))
+        print(f"Caché: etapa '{key.split('-')[0]}' sin cambios, se omite la generación.")
+        return True
+
+    def record_outputs(self, key, paths):
+        archivos = []
+        for path in paths:
+            if os.path.isdir(path):
+                archivos.extend(os.path.join(path, nombre) for nombre in sorted(os.listdir(path)))
+            else:
+                archivos.append(path)
+        entry = os.path.join(self.dir, key)
+        os.makedirs(entry, exist_ok=True)
+        outputs = {os.path.abspath(p): self.file_hash(p) for p in archivos}
+        self._write_json(os.path.join(entry, 'manifest.json'), {'outputs': outputs})
+
+    def evict(self):
+        """Elimina las entradas menos usadas hasta quedar por debajo de max_bytes."""
+        entradas = []
+        for nombre in os.listdir(self.dir):
+            entry = os.path.join(self.dir, nombre)
+            if not os.path.isdir(entry) or nombre.endswith('.tmp'):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+                entradas.append((os.path.getmtime(entry), size, entry))
+            except OSError:
+                # Entrada eliminada por otro proceso mientras se recorría
+                continue
+        total = sum(size for _, size, _ in entradas)
+        for _, size, entry in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Vacía la caché (todas las etapas y los hashes memorizados)."""
+        for nombre in os.listdir(self.dir):
+            path = os.path.join(self.dir, nombre)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+        print(f"Caché vaciada: {self.dir}")
+
+    def _touch(self, entry):
+        # La fecha de modificación de la carpeta marca el último uso (para evict)
+        now = time.time()
+        os.utime(entry, (now, now))
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_json(path, data):
+        # Temporal por proceso: los pipelines pueden correr en paralelo (run_pipelines.py)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Los módulos del proyecto y los generadores sintéticos se importan por nombre
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, 'benchmarks')]
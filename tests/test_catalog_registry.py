@@ -0,0 +1,47 @@
+"""
+CatalogRegistry entre ejecuciones: los nombres conocidos conservan su ID, los
+nuevos siguen al máximo y solo se emiten las filas nuevas de catálogo y relación.
+"""
+import pandas as pd
+
+import catalog_registry
+import utils
+
+def ejecutar(ruta, shows):
+    """Una ejecución: catálogo de actores con create_catalog y el registro de ruta."""
+    df = pd.DataFrame({'show_id': list(shows), 'cast': list(shows.values())})
+    catalogo, relacion = utils.create_catalog(df, 'cast', 'actor_id')
+    registro = catalog_registry.CatalogRegistry(ruta)
+    nuevos, relacion = registro.delta('actores', catalogo, relacion)
+    registro.commit()
+    registro.close()
+    return nuevos, relacion
+
+def filas(df):
+    return [tuple(fila) for fila in df.itertuples(index=False)]
+
+def test_registro_entre_dos_ejecuciones(tmp_path):
+    ruta = str(tmp_path / 'state' / 'netflix_catalogos.sqlite')
+    nuevos, relacion = ejecutar(ruta, {'s1': 'Carla, Ana', 's2': 'Bruno'})
+    assert filas(nuevos) == [(1, 'Ana'), (2, 'Bruno'), (3, 'Carla')]
+    assert sorted(filas(relacion)) == [('s1', 1), ('s1', 3), ('s2', 2)]
+
+    # Segunda ejecución: 'Abel' y 'Dora' ordenan antes/después de los conocidos pero
+    # reciben IDs a continuación del máximo; Ana, Bruno y Carla conservan el suyo
+    nuevos, relacion = ejecutar(ruta, {'s1': 'Carla, Ana', 's2': 'Bruno, Dora', 's3': 'Abel, Ana'})
+    assert filas(nuevos) == [(4, 'Abel'), (5, 'Dora')]
+    assert sorted(filas(relacion)) == [('s2', 5), ('s3', 1), ('s3', 4)]
+
+    # Sin cambios no se emite nada
+    nuevos, relacion = ejecutar(ruta, {'s1': 'Carla, Ana', 's2': 'Bruno, Dora', 's3': 'Abel, Ana'})
+    assert nuevos.empty and relacion.empty
+
+def test_registro_sin_commit_no_avanza(tmp_path):
+    ruta = str(tmp_path / 'catalogos.sqlite')
+    df = pd.DataFrame({'show_id': ['s1'], 'cast': ['Ana']})
+    catalogo, relacion = utils.create_catalog(df, 'cast', 'actor_id')
+    registro = catalog_registry.CatalogRegistry(ruta)
+    registro.delta('actores', catalogo, relacion)
+    registro.close()
+    nuevos, relacion = ejecutar(ruta, {'s1': 'Ana'})
+    assert filas(nuevos) == [(1, 'Ana')] and filas(relacion) == [('s1', 1)]
@@ -0,0 +1,75 @@
+"""
+date_parsing: detección del formato sobre una muestra, inferencia de pandas
+cuando ningún formato aplica, y fechas / horas iguales a las que daba
+pd.to_datetime(errors='coerce') con .dt.date / .dt.time.
+"""
+import pandas as pd
+import pytest
+
+import date_parsing
+import generadores
+import utils
+
+@pytest.fixture(autouse=True)
+def sin_formatos_memorizados():
+    date_parsing.clear_cache()
+    yield
+    date_parsing.clear_cache()
+
+@pytest.mark.parametrize('valores, formato', [
+    (['12/1/2010 8:26', '1/13/2011 17:05'], '%m/%d/%Y %H:%M'),
+    (['September 25, 2021', 'June 2, 2019'], '%B %d, %Y'),
+    (['Sep 25, 2021'], '%b %d, %Y'),
+    (['25/12/2010', '01/02/2011'], '%d/%m/%Y'),     # el día 25 descarta mes primero
+    (['01/02/2011'], '%m/%d/%Y'),                   # ambiguo: mes primero, como pandas
+    (['2010-12-01 08:26:00'], '%Y-%m-%d %H:%M:%S'),
+    (['2010/12/01 08:26', 'sin fecha'], None),
+])
+def test_detect_format(valores, formato):
+    assert date_parsing.detect_format(valores) == formato
+
+def test_formato_mixto_como_to_datetime():
+    # El formato de la mayoría se aplica a todos; el resto queda NaT (errors='coerce')
+    col = pd.Series(['12/1/2010 8:26', '12/1/2010 17:05:09', None, '1/13/2011 0:00', 'x'], name='InvoiceDate')
+    fechas = date_parsing.parse_datetimes(col)
+    assert fechas.tolist() == pd.to_datetime(col, errors='coerce').tolist()
+    assert fechas.isna().tolist() == [False, True, True, False, True]
+
+def test_sin_formato_usa_inferencia_de_pandas():
+    col = pd.Series(['2010/12/01 08:26', '2011/01/13 00:00', None, 'x'], name='fecha')
+    fechas = date_parsing.parse_datetimes(col)
+    assert fechas.tolist() == pd.to_datetime(col, errors='coerce').tolist()
+    assert fechas.notna().tolist() == [True, True, False, False] and not date_parsing._FORMATOS
+
+def test_formato_memorizado_por_columna():
+    primero = pd.Series(['12/1/2010 8:26'], name='InvoiceDate')
+    date_parsing.parse_datetimes(primero)
+    # Un bloque posterior ambiguo reutiliza el formato detectado en el primero
+    bloque = pd.Series(['01/02/2011 10:00', ' 3/4/2011 9:15 '], name='InvoiceDate', dtype='category')
+    fechas = date_parsing.parse_datetimes(bloque)
+    assert fechas.tolist() == [pd.Timestamp('2011-01-02 10:00'), pd.Timestamp('2011-03-04 09:15')]
+
+def test_as_dates():
+    fechas = pd.Series(pd.to_datetime(['2021-09-25 13:45', None, '2019-06-02 00:00']))
+    dias = date_parsing.as_dates(fechas)
+    assert dias.dtype == 'period[D]' and dias.isna().tolist() == [False, True, False]
+    assert list(utils.render_sql_column(dias)) == ["'2021-09-25'", 'NULL', "'2019-06-02'"]
+    assert list(utils.render_copy_column(dias)) == ['2021-09-25', '\\N', '2019-06-02']
+
+@pytest.mark.parametrize('dataset, columna', [('ecommerce', 'InvoiceDate'), ('netflix', 'date_added')])
+def test_fecha_y_hora_iguales_a_to_datetime(tmp_path, dataset, columna):
+    ruta = generadores.escribir_csv(dataset, 3000, str(tmp_path))
+    col = pd.read_csv(ruta, usecols=[columna])[columna]
+    # Como lo hacían los scripts antes: inferencia de pandas y .dt.date / .dt.time
+    previo = pd.to_datetime(col.str.strip(), errors='coerce')
+    fecha, hora = date_parsing.split_datetime(date_parsing.parse_datetimes(col))
+
+    assert fecha.isna().equals(previo.isna()) and hora.isna().equals(previo.isna())
+    validas = previo.notna()
+    assert (fecha[validas].dt.to_timestamp().dt.date == previo[validas].dt.date).all()
+    assert ((pd.Timestamp(0) + hora[validas]).dt.time == previo[validas].dt.time).all()
+    # Mismos literales SQL que str() de los date / time de antes
+    esperado_fecha = [f"'{v}'" for v in previo[validas].dt.date]
+    esperado_hora = [f"'{v}'" for v in previo[validas].dt.time]
+    assert list(utils.render_sql_column(fecha[validas])) == esperado_fecha
+    assert list(utils.render_sql_column(hora[validas])) == esperado_hora
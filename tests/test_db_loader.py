@@ -0,0 +1,112 @@
+"""
+La carga directa (DB_LOAD=1, db_loader.load_tables) debe dejar las mismas tablas
+que reproducir con psql el .sql que generan los scripts. Cubre copy_table en
+COPY binario (_python_rows) y de texto, y el ConnectionPool.
+
+Requiere una base PostgreSQL de pruebas y el cliente psql; sin TEST_PG_DSN se omite:
+    TEST_PG_DSN=postgresql://postgres@localhost/pruebas python -m pytest tests
+Cada carga usa su propio schema (prueba_*), que se borra al terminar.
+"""
+import os
+
+import pytest
+
+import bench_pipelines
+import date_parsing
+import db_loader
+import generadores
+import normalize_ecommerce
+import normalize_hospital
+import normalize_netflix
+import sql_shards
+import utils
+
+DSN = os.environ.get('TEST_PG_DSN', '').strip()
+FILAS = 300
+
+pytestmark = pytest.mark.skipif(not DSN, reason="requiere TEST_PG_DSN (base PostgreSQL de pruebas)")
+
+def netflix_fechas_carga(ruta):
+    # Igual que cargar() en normalize_netflix.main con NETFLIX_DATE_ADDED_AS_DATE=1
+    df = bench_pipelines.netflix_carga(ruta)
+    df['date_added'] = date_parsing.as_dates(date_parsing.parse_datetimes(df['date_added']))
+    return df
+
+# caso: (dataset de generadores, plan, carga y limpieza del script)
+CASOS = {
+    'netflix': ('netflix', normalize_netflix.PLAN, bench_pipelines.netflix_carga),
+    'netflix_fechas': ('netflix', normalize_netflix.PLAN_DATE_ADDED, netflix_fechas_carga),
+    'ecommerce': ('ecommerce', normalize_ecommerce.PLAN, bench_pipelines.ecommerce_carga),
+    'hospital': ('hospital', normalize_hospital.PLAN, normalize_hospital.cargar_y_limpiar),
+}
+
+@pytest.fixture
+def esquemas():
+    """Crea schemas de prueba vacíos y retorna la conninfo de cada uno (search_path)."""
+    psycopg = pytest.importorskip('psycopg')
+    creados = []
+
+    def crear(nombre):
+        with psycopg.connect(DSN, autocommit=True) as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {nombre} CASCADE")
+            conn.execute(f"CREATE SCHEMA {nombre}")
+        creados.append(nombre)
+        return psycopg.conninfo.make_conninfo(DSN, options=f"-csearch_path={nombre}")
+
+    yield crear
+    with psycopg.connect(DSN, autocommit=True) as conn:
+        for nombre in creados:
+            conn.execute(f"DROP SCHEMA IF EXISTS {nombre} CASCADE")
+
+def contenido(conninfo, plan):
+    """{tabla: filas ordenadas} de todas las tablas del plan."""
+    import psycopg
+    with psycopg.connect(conninfo) as conn:
+        return {name: sorted(conn.execute(f"SELECT * FROM {name}").fetchall(), key=repr)
+                for name in plan.order}
+
+@pytest.mark.parametrize('copy_format', db_loader.COPY_FORMATS)
+@pytest.mark.parametrize('caso', list(CASOS))
+def test_carga_directa_igual_a_script(tmp_path, esquemas, caso, copy_format):
+    dataset, plan, carga = CASOS[caso]
+    ruta = generadores.escribir_csv(dataset, FILAS, str(tmp_path))
+    tablas = plan.normalize(carga(ruta))
+
+    # Script .sql como lo escriben los scripts, reproducido con psql
+    script = str(tmp_path / f"{caso}.sql")
+    with utils.SqlWriter(script, verbose=False) as sql:
+        sql.write("BEGIN;\n")
+        plan.write(sql, tablas)
+        sql.write("COMMIT;\n")
+    conninfo_sql = esquemas(f"prueba_{caso}_sql")
+    _, ok, _, error = sql_shards.run_shard(sql_shards._psql_command(conninfo_sql), script)
+    assert ok, error
+
+    # Carga directa con varias conexiones del pool (tablas de una etapa en paralelo)
+    conninfo_copy = esquemas(f"prueba_{caso}_{copy_format}")
+    cargadas = {name: plan.sql_frame(df) for name, df in tablas.items()}
+    db_loader.load_tables(conninfo_copy, plan.ddl(cargadas), plan.load_stages(cargadas), workers=3,
+                          copy_format=copy_format)
+
+    esperado = contenido(conninfo_sql, plan)
+    obtenido = contenido(conninfo_copy, plan)
+    for name in plan.order:
+        # Los duplicados de clave se descartan en ambas cargas (ON CONFLICT DO NOTHING)
+        assert bool(obtenido[name]) == (len(tablas[name]) > 0), name
+        assert obtenido[name] == esperado[name], name
+
+def test_pool_descarta_conexion_con_transaccion_abierta(esquemas):
+    conninfo = esquemas("prueba_pool")
+    with db_loader.ConnectionPool(conninfo, size=1) as pool:
+        with pool.connection() as conn:
+            primera = conn
+            conn.execute("SELECT 1")  # deja una transacción abierta
+        with pool.connection() as conn:
+            assert conn is not primera and primera.closed
+            conn.execute("SELECT 1")
+            conn.commit()
+        with pool.connection() as conn:
+            # Sin transacción pendiente la conexión se reutiliza
+            segunda = conn
+        with pool.connection() as conn:
+            assert conn is segunda
@@ -0,0 +1,102 @@
+"""
+Modo delta (DELTA_MODE=1) de punta a punta con main() de cada script sobre un
+proyecto temporal: la segunda ejecución sin cambios no emite filas, y una clave
+modificada se actualiza y reemplaza sus filas hijas (incluidas las que se quitaron).
+"""
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import delta_state
+import generadores
+import normalize_ecommerce
+import normalize_netflix
+import utils
+
+@pytest.fixture
+def proyecto(tmp_path, monkeypatch):
+    """Rutas del proyecto en tmp_path (raw/, sql/, sql/state/) y solo DELTA_MODE activo."""
+    for var in ('STAGE_CACHE', 'SQL_OUTPUT_FORMAT', 'SQL_BATCH_SIZE', 'SQL_COMPRESSION', 'SQL_SHARDS',
+                'CSV_CHUNKSIZE', 'CSV_ENGINE', 'DB_LOAD', 'CATALOG_REGISTRY', 'PIPELINE_PROFILE',
+                'NETFLIX_DATE_ADDED_AS_DATE'):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv('DELTA_MODE', '1')
+    paths = utils.get_project_paths(str(tmp_path / 'scripts' / 'script.py'))
+    monkeypatch.setattr(utils, 'get_project_paths', lambda script_path: paths)
+    (tmp_path / 'raw').mkdir()
+    (tmp_path / 'sql').mkdir()
+    return paths
+
+def leer_csv(ruta):
+    return pd.read_csv(ruta, dtype=str, keep_default_na=False)
+
+def ejecutar(modulo, paths, archivo):
+    modulo.main()
+    with open(f"{paths['sql']}/{archivo}", encoding='utf-8') as f:
+        return f.read()
+
+def filas(sql, tabla):
+    return [l for l in sql.splitlines() if l.startswith(f"INSERT INTO {tabla} ")]
+
+def test_huellas_no_dependen_del_dtype(tmp_path):
+    store = delta_state.FingerprintStore(str(tmp_path / 'huellas.sqlite'))
+    df = pd.DataFrame({'k': ['a', 'b'], 'n': np.array([1, 2], dtype=np.int32),
+                       'c': pd.Categorical(['x', None])})
+    store.cambios(df, ['k'])
+    # int32 -> float64 y category -> object con los mismos valores: sin cambios
+    otro = pd.DataFrame({'k': ['a', 'b'], 'n': [1.0, 2.0], 'c': pd.Series(['x', None], dtype=object)})
+    nuevas, modificadas = store.cambios(otro, ['k'])
+    assert not nuevas.any() and not modificadas.any()
+    store.close()
+
+def test_netflix_delta(proyecto):
+    ruta = generadores.escribir_csv('netflix', 40, proyecto['raw'])
+    sql = ejecutar(normalize_netflix, proyecto, 'netflix_normalized.sql')
+    assert len(filas(sql, 'shows')) == 40
+
+    # Sin cambios: ni filas ni DELETE
+    sql = ejecutar(normalize_netflix, proyecto, 'netflix_normalized.sql')
+    assert not filas(sql, 'shows') and not filas(sql, 'shows_actors') and 'DELETE' not in sql
+
+    # s1 pierde su último actor (fila hija quitada) y s2 cambia de título
+    df = leer_csv(ruta)
+    actores = df.loc[0, 'cast'].split(', ')
+    df.loc[0, 'cast'] = ', '.join(actores[:-1])
+    df.loc[1, 'title'] = 'Otro título'
+    df.to_csv(ruta, index=False)
+    sql = ejecutar(normalize_netflix, proyecto, 'netflix_normalized.sql')
+
+    assert "DELETE FROM shows_actors WHERE show_id IN ('s1', 's2');" in sql
+    shows = filas(sql, 'shows')
+    assert len(shows) == 2 and all("ON CONFLICT (show_id) DO UPDATE" in l for l in shows)
+    assert "'Otro título'" in shows[1]
+    # Las relaciones de s1 se vuelven a insertar completas, sin el actor quitado
+    delete = sql.index("DELETE FROM shows_actors")
+    de_s1 = [l for l in filas(sql[delete:], 'shows_actors') if "VALUES ('s1'," in l]
+    assert len(de_s1) == len(actores) - 1
+
+def test_ecommerce_delta(proyecto):
+    ruta = generadores.escribir_csv('ecommerce', 400, proyecto['raw'])
+    sql = ejecutar(normalize_ecommerce, proyecto, 'ecommerce_normalized.sql')
+    assert filas(sql, 'Order_Details')
+
+    sql = ejecutar(normalize_ecommerce, proyecto, 'ecommerce_normalized.sql')
+    assert not filas(sql, 'Invoices') and not filas(sql, 'Order_Details') and 'DELETE' not in sql
+
+    # Factura a: se quita un producto (todas sus líneas). Factura b: cambia una cantidad
+    df = leer_csv(ruta)
+    productos = df.groupby('InvoiceNo')['StockCode'].nunique()
+    a, b = productos[productos > 1].index[:2]
+    quitado = df.loc[df['InvoiceNo'] == a, 'StockCode'].iloc[0]
+    df = df[~((df['InvoiceNo'] == a) & (df['StockCode'] == quitado))]
+    df.loc[df.index[df['InvoiceNo'] == b][0], 'Quantity'] = '999'
+    df.to_csv(ruta, index=False)
+    sql = ejecutar(normalize_ecommerce, proyecto, 'ecommerce_normalized.sql')
+
+    assert f"DELETE FROM Order_Details WHERE InvoiceNo IN ('{a}', '{b}');" in sql
+    lineas = filas(sql, 'Order_Details')
+    facturas = {re.search(r"VALUES \('([^']+)', '([^']+)'", l).groups() for l in lineas}
+    esperadas = {(f, s) for f, s in zip(df['InvoiceNo'], df['StockCode']) if f in (a, b)}
+    assert facturas == esperadas and (a, quitado) not in facturas
@@ -0,0 +1,61 @@
+"""
+load_data: el motor pyarrow aplica el mismo esquema que el motor C (columnas,
+categorías y dtypes fijos) y ambos pasan a ISO-8859-1 si el CSV no es UTF-8, sin
+volver a parsear el archivo.
+"""
+import io
+
+import pandas as pd
+import pytest
+
+import generadores
+import normalize_ecommerce
+import normalize_hospital
+import normalize_netflix
+import utils
+
+ESQUEMAS = {
+    'ecommerce': normalize_ecommerce.ESQUEMA,
+    'hospital': normalize_hospital.ESQUEMA,
+    'netflix': normalize_netflix.ESQUEMA,
+}
+
+@pytest.mark.parametrize('dataset', list(ESQUEMAS))
+def test_pyarrow_igual_a_c(tmp_path, dataset):
+    pytest.importorskip('pyarrow')
+    ruta = generadores.escribir_csv(dataset, 2000, str(tmp_path))
+    esquema = ESQUEMAS[dataset]
+    c = utils.load_data(ruta, schema=esquema)
+    arrow = utils.load_data(ruta, schema=esquema, engine='pyarrow')
+    pd.testing.assert_series_equal(c.dtypes, arrow.dtypes)
+    pd.testing.assert_frame_equal(c, arrow, check_categorical=False)
+
+@pytest.mark.parametrize('engine', utils.CSV_ENGINES)
+def test_iso_8859_1(tmp_path, engine):
+    if engine == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    ruta = tmp_path / 'latin.csv'
+    ruta.write_bytes("Unnamed: 0,id,nombre\n0,1,Café\n1,2,Ñandú\n".encode('ISO-8859-1'))
+    df = utils.load_data(str(ruta), schema=normalize_hospital.ESQUEMA, engine=engine)
+    assert list(df.columns) == ['id', 'nombre']
+    assert df['nombre'].tolist() == ['Café', 'Ñandú']
+
+def test_iso_8859_1_tras_filas_utf8_por_bloques_igual_a_completo(tmp_path):
+    # El primer byte inválido aparece tras muchas filas y cae a mitad de un bloque de lectura
+    filas = [f"{i},fila {i}" for i in range(5000)] + ["5000,Año", "5001,Müller"]
+    ruta = tmp_path / 'mixto.csv'
+    ruta.write_bytes(("id,nombre\n" + "\n".join(filas) + "\n").encode('ISO-8859-1'))
+    completo = utils.load_data(str(ruta))
+    por_bloques = pd.concat(utils.load_data(str(ruta), chunksize=700), ignore_index=True)
+    pd.testing.assert_frame_equal(completo, por_bloques)
+    assert completo['nombre'].tolist()[-2:] == ['Año', 'Müller']
+
+def test_lector_utf8_o_latin1_una_pasada(tmp_path):
+    datos = "á€,😀\n".encode('utf-8') * 3 + "ñ,\xe9\n".encode('ISO-8859-1')
+    ruta = tmp_path / 'datos.csv'
+    ruta.write_bytes(datos)
+    for block_size in (1, 2, 3, 1 << 20):
+        lector = utils.Utf8OrLatin1Reader(str(ruta), block_size)
+        with io.BufferedReader(lector) as f:
+            assert f.read().decode('utf-8') == "á€,😀\n" * 3 + "ñ,é\n"
+        assert lector.latin1_offset == len("á€,😀\n".encode('utf-8')) * 3
@@ -0,0 +1,100 @@
+"""
+NormalizationPlan a nivel de spec: orden topológico de las tablas, deduplicación
+keep='first' / 'last' igual en lectura completa y por bloques, y ColumnCodes
+equivalente a drop_duplicates / groupby de pandas.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import normalization_spec
+
+def plan(tablas, **extra):
+    return normalization_spec.compile_spec(dict({'dataset': 'prueba', 'tables': tablas}, **extra))
+
+def test_orden_topologico():
+    # Declaradas al revés de sus FKs: cada tabla queda después de las que referencia,
+    # y entre las independientes se respeta el orden del spec
+    p = plan([
+        {'name': 'lineas', 'columns': ['factura', 'producto'], 'key': ['factura', 'producto'],
+         'references': {'factura': 'facturas', 'producto': 'productos'}},
+        {'name': 'facturas', 'columns': ['factura', 'cliente'], 'key': 'factura',
+         'references': {'cliente': 'clientes'}},
+        {'name': 'productos', 'columns': ['producto'], 'key': 'producto'},
+        {'name': 'clientes', 'columns': ['cliente'], 'key': 'cliente'},
+    ])
+    assert p.order == ['productos', 'clientes', 'facturas', 'lineas']
+    tablas = {name: pd.DataFrame() for name in p.order}
+    assert [[t[0] for t in etapa] for etapa in p.load_stages(tablas)] == \
+        [['productos', 'clientes'], ['facturas'], ['lineas']]
+
+def test_orden_topologico_derivadas_y_errores():
+    p = plan([
+        {'name': 'shows', 'kind': 'base', 'key': 'show_id'},
+        {'name': 'actores', 'kind': 'catalog', 'column': 'cast', 'id': 'actor_id',
+         'parent': 'shows', 'relation': 'shows_actores'},
+    ])
+    assert p.order == ['shows', 'actores', 'shows_actores']
+    with pytest.raises(ValueError, match="circulares"):
+        plan([{'name': 'a', 'columns': ['x', 'y'], 'key': 'x', 'references': {'y': 'b'}},
+              {'name': 'b', 'columns': ['y', 'x'], 'key': 'y', 'references': {'x': 'a'}}])
+    with pytest.raises(ValueError, match="no está en el spec"):
+        plan([{'name': 'a', 'columns': ['x'], 'key': 'x', 'references': {'x': 'z'}}])
+
+def fuente(n=3000, seed=7):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': rng.integers(0, 400, n),
+        'grupo': rng.choice(['a', 'b', None], n),
+        'valor': rng.choice([1.5, 2.5, np.nan], n),
+    })
+
+def por_bloques(p, df, filas):
+    partes = {}
+    bloques = (df.iloc[i:i + filas] for i in range(0, len(df), filas))
+    for nombre, tabla in p.normalize_chunks(bloques):
+        partes.setdefault(nombre, []).append(tabla)
+    return {nombre: pd.concat(t) for nombre, t in partes.items()}
+
+@pytest.mark.parametrize('distinct', [False, True])
+@pytest.mark.parametrize('keep', ['first', 'last'])
+def test_keep_completo_y_por_bloques(keep, distinct):
+    df = fuente()
+    p = plan([{'name': 'entidad', 'columns': {'id': 'entidad_id', 'grupo': 'grupo', 'valor': 'valor'},
+               'key': 'entidad_id', 'keep': keep, 'distinct': distinct}])
+    esperado = df.drop_duplicates() if distinct else df
+    esperado = esperado.drop_duplicates(subset='id', keep=keep).rename(columns={'id': 'entidad_id'})
+
+    completo = p.normalize(df)['entidad']
+    pd.testing.assert_frame_equal(completo, esperado)
+
+    bloques = por_bloques(p, df, 350)['entidad']
+    ordenar = lambda t: t.sort_values('entidad_id').reset_index(drop=True)
+    pd.testing.assert_frame_equal(ordenar(bloques), ordenar(esperado))
+
+@pytest.mark.parametrize('keep', ['first', 'last', False])
+@pytest.mark.parametrize('cols', [['id'], ['grupo'], ['valor', 'grupo'], ['id', 'grupo', 'valor']])
+def test_column_codes_igual_a_drop_duplicates(cols, keep):
+    df = fuente()
+    df['grupo'] = df['grupo'].astype('category')
+    codigos = normalization_spec.ColumnCodes(df)
+    mascara = normalization_spec._unique_mask(codigos.group(cols), keep)
+    np.testing.assert_array_equal(mascara, ~df.duplicated(subset=cols, keep=keep).to_numpy())
+
+    # Sobre un subconjunto de filas (select) se reutilizan las factorizaciones
+    filas = df['valor'].notna().to_numpy()
+    sub = codigos.select(filas)
+    np.testing.assert_array_equal(normalization_spec._unique_mask(sub.group(cols), keep),
+                                  ~df[filas].duplicated(subset=cols, keep=keep).to_numpy())
+
+def test_column_codes_ordenados_como_groupby():
+    df = fuente().dropna()
+    codigos = normalization_spec.ColumnCodes(df).group(['grupo', 'id'], sort=True)
+    _, grupos = np.unique(codigos, return_inverse=True)
+    np.testing.assert_array_equal(grupos.reshape(-1), df.groupby(['grupo', 'id'], sort=True).ngroup().to_numpy())
+
+def test_aggregate_igual_a_groupby():
+    df = fuente()
+    p = plan([{'name': 'resumen', 'kind': 'aggregate', 'by': ['grupo', 'id'], 'aggs': {'valor': 'mean'}}])
+    esperado = df.groupby(['grupo', 'id']).agg({'valor': 'mean'}).reset_index()
+    pd.testing.assert_frame_equal(p.normalize(df)['resumen'], esperado)
@@ -0,0 +1,40 @@
+"""
+PIPELINE_PROFILE: las etapas que retornan un generador (lectura por bloques) cuentan
+el tiempo y las filas de su consumo, no solo la creación del generador.
+"""
+import json
+import time
+
+import generadores
+import normalize_hospital
+import profiling
+import utils
+
+def test_etapa_lazy_cuenta_el_consumo(tmp_path, monkeypatch):
+    monkeypatch.setenv('PIPELINE_PROFILE', '1')
+    monkeypatch.delenv('PIPELINE_PROFILE_CPROFILE', raising=False)
+    ruta = generadores.escribir_csv('hospital', 3000, str(tmp_path))
+
+    @profiling.stage()
+    def lenta():
+        for i in range(3):
+            time.sleep(0.02)
+            yield i
+
+    @profiling.pipeline('prueba', str(tmp_path / 'profile'))
+    def main():
+        assert list(lenta()) == [0, 1, 2]
+        limpias = sum(len(df) for df in normalize_hospital.cargar_y_limpiar(ruta, 700))
+        leidas = sum(len(df) for df in utils.load_data(ruta, chunksize=700))
+        return limpias, leidas
+
+    assert main() == (3000, 3000)
+    reporte, = (tmp_path / 'profile').glob('prueba_*.json')
+    etapas = {e['stage']: e for e in json.loads(reporte.read_text(encoding='utf-8'))['stages']}
+
+    assert etapas['lenta']['lazy'] and etapas['lenta']['wall_s'] >= 0.06
+    for nombre in ('cargar_y_limpiar', 'load_data'):
+        etapa = etapas[nombre]
+        assert etapa['lazy'] and etapa['ok'] and etapa['rows_out'] == 3000 and etapa['wall_s'] > 0
+    # El tiempo de main incluye el de las etapas consumidas dentro de él
+    assert etapas['main']['wall_s'] >= etapas['cargar_y_limpiar']['wall_s'] + etapas['load_data']['wall_s']
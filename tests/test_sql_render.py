@@ -0,0 +1,51 @@
+"""
+Renderizado de literales SQL: df_to_sql_insert replica a iterrows (int + float se
+promueve a float) y las tablas de un NormalizationPlan respetan los tipos de su DDL.
+El formato texto de COPY escapa barra invertida, tabulador y saltos de línea, y
+solo los nulos (no el texto 'N/A') salen como \\N.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import generadores
+import normalize_hospital
+import utils
+
+def test_df_to_sql_insert_promueve_como_iterrows():
+    df = pd.DataFrame({'a': [71382], 'b': [1], 'c': [177.6]})
+    assert "VALUES (71382.0, 1.0, 177.6)" in utils.df_to_sql_insert(df, 't')
+
+def test_mediciones_con_claves_enteras(tmp_path):
+    ruta = generadores.escribir_csv('hospital', 500, str(tmp_path))
+    plan = normalize_hospital.PLAN
+    tablas = plan.normalize(normalize_hospital.cargar_y_limpiar(ruta))
+    salida = str(tmp_path / 'hospital.sql')
+    with utils.SqlWriter(salida, verbose=False) as sql:
+        plan.write(sql, tablas)
+
+    with open(salida, encoding='utf-8') as f:
+        filas = [linea for linea in f if linea.startswith("INSERT INTO mediciones")]
+    assert filas
+    # encounter_id y metric_id son INTEGER: sin la promoción a float de iterrows
+    assert all(re.search(r"VALUES \(\d+, \d+, ", fila) for fila in filas)
+
+@pytest.mark.parametrize('dtype', [object, 'category'])
+def test_copy_escapa_texto(dtype):
+    col = pd.Series(['a\\b', 'c\td', 'e\nf', 'g\r\nh', 'N/A', None, '\\N'], dtype=dtype)
+    esperado = ['a\\\\b', 'c\\td', 'e\\nf', 'g\\r\\nh', 'N/A', '\\N', '\\\\N']
+    assert list(utils.render_copy_column(col)) == esperado
+    # El renderizado vectorizado coincide con el de valor a valor
+    assert [utils._copy_value(v) for v in col] == esperado
+
+def test_copy_nulos_en_numericos():
+    df = pd.DataFrame({'f': [1.5, np.nan, 3.0], 'i': [1, 2, 3], 'n': pd.array([7, None, 9], dtype='Int64')})
+    # Sin promoción de dtypes: el entero sigue siendo entero junto a un float
+    assert utils.render_copy_rows(df) == ['1.5\t1\t7', '\\N\t2\t\\N', '3.0\t3\t9']
+
+def test_sql_copy_block():
+    df = pd.DataFrame({'id': [1, 2], 'texto': ['uno\tdos', None]})
+    bloque = utils.sql_copy_block(df, 't', ['id', 'texto'])
+    assert bloque == ["COPY t (id, texto) FROM stdin;", "1\tuno\\tdos", "2\t\\N", "\\."]
@@ -0,0 +1,79 @@
+"""
+write_shards: el manifest lista las etapas en el orden de FKs, los rangos
+first_row / rows de cada tabla la cubren sin huecos ni solapamientos, los shards
+de un conjunto anterior se borran y SQL_OUTPUT_FORMAT=tsv se escribe como COPY.
+"""
+import json
+import os
+
+import pytest
+
+import generadores
+import normalize_ecommerce
+import sql_shards
+import utils
+
+PLAN = normalize_ecommerce.PLAN
+
+@pytest.fixture(scope='module')
+def tablas(tmp_path_factory):
+    ruta = generadores.escribir_csv('ecommerce', 2000, str(tmp_path_factory.mktemp('csv')))
+    df = normalize_ecommerce.clean_ecommerce_specific(utils.load_data(ruta, schema=normalize_ecommerce.ESQUEMA))
+    return PLAN.normalize(df)
+
+def escribir(tablas, carpeta, **opciones):
+    with open(sql_shards.write_shards(PLAN, tablas, str(carpeta), **opciones), encoding='utf-8') as f:
+        return json.load(f)
+
+def test_etapas_en_orden_de_fks(tablas, tmp_path):
+    manifest = escribir(tablas, tmp_path, shard_rows=10_000)
+    etapas = [[s['table'] for s in etapa] for etapa in manifest['stages']]
+    assert etapas == [[name for name, *_ in etapa] for etapa in PLAN.load_stages(tablas)]
+    cargadas = set()
+    for etapa in etapas:
+        # Cada tabla solo referencia tablas de etapas anteriores
+        for name in etapa:
+            assert set(PLAN.references[name].values()) - {name} <= cargadas, name
+        cargadas.update(etapa)
+    assert cargadas == set(PLAN.order)
+
+def test_rangos_cubren_cada_tabla(tablas, tmp_path):
+    shard_rows = 150
+    assert len(tablas['Order_Details']) > 3 * shard_rows
+    manifest = escribir(tablas, tmp_path, shard_rows=shard_rows)
+    for name, df in tablas.items():
+        shards = [s for etapa in manifest['stages'] for s in etapa if s['table'] == name]
+        siguiente = 0
+        for s in sorted(shards, key=lambda s: s['first_row']):
+            # Contiguos: cada rango empieza donde terminó el anterior
+            assert s['first_row'] == siguiente and 0 < s['rows'] <= shard_rows
+            with open(tmp_path / s['file'], encoding='utf-8') as f:
+                assert sum(linea.startswith(f"INSERT INTO {name} ") for linea in f) == s['rows']
+            siguiente += s['rows']
+        assert siguiente == len(df), name
+
+def test_borra_shards_anteriores(tablas, tmp_path):
+    for nombre in ('00_vieja_0007.sql', '03_Order_Details_0099.sql.gz', 'schema.sql.zst', 'notas.txt'):
+        (tmp_path / nombre).write_text("-- anterior\n", encoding='utf-8')
+    manifest = escribir(tablas, tmp_path, shard_rows=10_000)
+    archivos = {s['file'] for etapa in manifest['stages'] for s in etapa}
+    # Solo quedan el conjunto nuevo y los archivos que no son shards
+    assert set(os.listdir(tmp_path)) == archivos | {'schema.sql', 'manifest.json', 'notas.txt'}
+
+def test_tsv_se_escribe_como_copy(tablas, tmp_path, capsys):
+    manifest = escribir(tablas, tmp_path, output_format='tsv', shard_rows=10_000)
+    assert manifest['format'] == 'copy'
+    assert "los shards usan COPY" in capsys.readouterr().out
+    assert not [n for n in os.listdir(tmp_path) if n.endswith('.tsv') or os.path.isdir(tmp_path / n)]
+    for etapa in manifest['stages']:
+        for s in etapa:
+            with open(tmp_path / s['file'], encoding='utf-8') as f:
+                assert f"COPY {s['table']} " in f.read()
+
+def test_procesos_igual_a_un_proceso(tablas, tmp_path):
+    uno = escribir(tablas, tmp_path / 'uno', shard_rows=300)
+    varios = escribir(tablas, tmp_path / 'varios', shard_rows=300, workers=2)
+    assert uno['stages'] == varios['stages']
+    for etapa in uno['stages']:
+        for s in etapa:
+            assert (tmp_path / 'uno' / s['file']).read_bytes() == (tmp_path / 'varios' / s['file']).read_bytes()
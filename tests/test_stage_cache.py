@@ -0,0 +1,113 @@
+"""
+StageCache: la clave cambia con el CSV, el código o los parámetros de la etapa; el
+LRU respeta STAGE_CACHE_MAX_MB; y la generación del SQL solo se omite si los
+archivos de salida siguen teniendo el hash registrado.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import generadores
+import normalize_netflix
+import stage_cache
+import utils
+
+pytest.importorskip('pyarrow')
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('STAGE_CACHE', '1')
+    monkeypatch.delenv('STAGE_CACHE_CLEAR', raising=False)
+    monkeypatch.delenv('STAGE_CACHE_MAX_MB', raising=False)
+    fuente = tmp_path / 'codigo.py'
+    fuente.write_text("VERSION = 1\n", encoding='utf-8')
+    csv = tmp_path / 'datos.csv'
+    csv.write_text("a,b\n1,x\n", encoding='utf-8')
+    return stage_cache.open_cache(str(tmp_path / 'cache'), str(fuente)), str(csv), fuente
+
+def test_clave_cambia_con_csv_codigo_y_parametros(cache, tmp_path):
+    cache, csv, fuente = cache
+    construidas = []
+
+    def build():
+        construidas.append(1)
+        return pd.read_csv(csv)
+
+    clave = cache.key('carga', csv, 'c')
+    pd.testing.assert_frame_equal(cache.frames(clave, build), cache.frames(clave, build))
+    assert len(construidas) == 1
+
+    # Parámetro distinto
+    assert cache.key('carga', csv, 'pyarrow') != clave
+    # Código distinto (otra versión de los .py fuente)
+    fuente.write_text("VERSION = 2\n", encoding='utf-8')
+    otra = stage_cache.open_cache(cache.dir, str(fuente))
+    assert otra.key('carga', csv, 'c') != clave
+    # CSV distinto: se vuelve a construir
+    with open(csv, 'a', encoding='utf-8') as f:
+        f.write("2,y\n")
+    nueva = cache.key('carga', csv, 'c')
+    assert nueva != clave
+    assert len(cache.frames(nueva, build)) == 2 and len(construidas) == 2
+
+def test_lru_respeta_max_mb(cache, monkeypatch):
+    cache, csv, fuente = cache
+    monkeypatch.setenv('STAGE_CACHE_MAX_MB', '1')
+    cache = stage_cache.open_cache(cache.dir, str(fuente))
+    assert cache.max_bytes == 1024 * 1024
+    df = pd.DataFrame({'x': np.arange(25_000, dtype=np.int64)})  # ~400 KB por entrada (con el índice)
+
+    for i, clave in enumerate(['a-1', 'b-2']):
+        cache.put_frames(clave, df)
+        os.utime(os.path.join(cache.dir, clave), (1000 + i, 1000 + i))
+    # Leer 'a' la marca como usada recientemente: al agregar 'c' se elimina 'b'
+    assert cache.get_frames('a-1') is not None
+    cache.put_frames('c-3', df)
+    assert cache.get_frames('b-2') is None
+    assert cache.get_frames('a-1') is not None and cache.get_frames('c-3') is not None
+
+    cache.put_frames('d-4', df)
+    entradas = [e for e in os.listdir(cache.dir) if os.path.isdir(os.path.join(cache.dir, e))]
+    tamano = sum(os.path.getsize(os.path.join(cache.dir, e, f))
+                 for e in entradas for f in os.listdir(os.path.join(cache.dir, e)))
+    assert tamano <= cache.max_bytes and 'd-4' in entradas
+
+def test_salidas_vigentes_solo_con_el_mismo_hash(cache, tmp_path):
+    cache, csv, fuente = cache
+    salida = tmp_path / 'salida.sql'
+    salida.write_text("BEGIN;\nCOMMIT;\n", encoding='utf-8')
+    clave = cache.key('sql', csv, str(salida))
+    assert not cache.outputs_current(clave)
+    cache.record_outputs(clave, [str(salida)])
+    assert cache.outputs_current(clave)
+
+    salida.write_text("BEGIN;\n-- editado\nCOMMIT;\n", encoding='utf-8')
+    assert not cache.outputs_current(clave)
+    salida.unlink()
+    assert not cache.outputs_current(clave)
+
+def test_script_regenera_sql_modificado(tmp_path, monkeypatch, capsys):
+    paths = utils.get_project_paths(str(tmp_path / 'scripts' / 'script.py'))
+    monkeypatch.setattr(utils, 'get_project_paths', lambda script_path: paths)
+    for var in ('SQL_OUTPUT_FORMAT', 'SQL_COMPRESSION', 'SQL_SHARDS', 'DELTA_MODE', 'CATALOG_REGISTRY',
+                'DB_LOAD', 'STAGE_CACHE_CLEAR', 'STAGE_CACHE_MAX_MB', 'NETFLIX_DATE_ADDED_AS_DATE'):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv('STAGE_CACHE', '1')
+    (tmp_path / 'raw').mkdir()
+    (tmp_path / 'sql').mkdir()
+    generadores.escribir_csv('netflix', 200, paths['raw'])
+    salida = tmp_path / 'sql' / 'netflix_normalized.sql'
+
+    normalize_netflix.main()
+    original = salida.read_bytes()
+    capsys.readouterr()
+    normalize_netflix.main()
+    assert "se omite la generación" in capsys.readouterr().out
+
+    # El .sql editado a mano ya no coincide con su hash: se vuelve a generar
+    salida.write_bytes(original.replace(b"COMMIT;", b"ROLLBACK;"))
+    normalize_netflix.main()
+    assert "se omite la generación" not in capsys.readouterr().out
+    assert salida.read_bytes() == original
@@ -1,6 +1,13 @@
 import pandas as pd
+import numpy as np
+import codecs
+import io
 import os
 import datetime
+import queue
+import tempfile
+import threading
+import profiling
 
 # --- SECCIÓN 1: GESTIÓN DE RUTAS ---
 
@@ -17,36 +24,236 @@ def get_project_paths(script_path):
     paths = {
         'root': base_dir,
         'raw': os.path.join(base_dir, 'raw'),
-        'sql': os.path.join(base_dir, 'sql')
+        'sql': os.path.join(base_dir, 'sql'),
+        # Estado persistente entre ejecuciones (registro de IDs, huellas de filas)
+        'state': os.path.join(base_dir, 'sql', 'state'),
+        # Caché de etapas (descartable: se puede borrar en cualquier momento)
+        'cache': os.path.join(base_dir, 'sql', 'cache'),
+        # Reportes de perfilado (PIPELINE_PROFILE=1)
+        'profile': os.path.join(base_dir, 'sql', 'profile')
     }
     return paths
 
 # --- SECCIÓN 2: CARGA Y LIMPIEZA DE DATOS ---
 
-def load_data(filepath):
+class CsvSchema:
     """
-    Carga robusta de CSV. Intenta UTF-8 primero, si falla usa ISO-8859-1.
+    Esquema de lectura de un CSV, aplicado al leer (ver load_data):
+    - usecols: lista de columnas a leer o función que decide por nombre (None = todas).
+    - categories: columnas de texto con pocos valores distintos, leídas como category.
+    - downcast_ints: reduce las columnas int64 a int32 cuando sus valores caben.
+    - dtypes: dtypes fijos por columna ({columna: dtype}). En la lectura por bloques
+      cada bloque infiere sus tipos: una clave como InvoiceNo sale int64 en los
+      bloques sin facturas 'C...' y texto en el resto si no se fija aquí.
+    Los float se mantienen en float64 para que los literales SQL no cambien.
+    """
+
+    def __init__(self, usecols=None, categories=(), downcast_ints=True, dtypes=None):
+        self.usecols = usecols
+        self.categories = list(categories)
+        self.downcast_ints = downcast_ints
+        self.dtypes = dict(dtypes or {})
+
+    def keep(self, col):
+        """True si la columna se lee."""
+        if self.usecols is None:
+            return True
+        if callable(self.usecols):
+            return self.usecols(col)
+        return col in self.usecols
+
+    def read_csv_kwargs(self, engine=None, columns=None):
+        """
+        Parámetros de pd.read_csv que aplican el esquema durante el parseo.
+        columns: nombres de la cabecera del CSV; el motor pyarrow no acepta usecols
+        como función y la necesita para resolverla a una lista.
+        """
+        dtype = dict(self.dtypes, **{c: 'category' for c in self.categories})
+        if engine != 'pyarrow':
+            return {'usecols': self.keep, 'dtype': dtype}
+        kwargs = {'dtype': dtype}
+        if callable(self.usecols):
+            if columns is None:
+                raise ValueError("CsvSchema: el motor pyarrow necesita la cabecera para aplicar usecols")
+            kwargs['usecols'] = [c for c in columns if self.usecols(c)]
+        elif self.usecols is not None:
+            kwargs['usecols'] = list(self.usecols)
+        return kwargs
+
+    def apply(self, df):
+        """Completa el esquema sobre un DataFrame ya leído (idempotente)."""
+        cols = [c for c in df.columns if self.keep(c)]
+        if len(cols) < len(df.columns):
+            df = df[cols].copy()
+        for col, dtype in self.dtypes.items():
+            if col in df.columns and df[col].dtype != pd.Series([], dtype=dtype).dtype:
+                df[col] = df[col].astype(dtype)
+        for col in self.categories:
+            if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        if self.downcast_ints:
+            df = downcast_integers(df)
+        return df
+
+def downcast_integers(df, dtype=np.int32):
+    """Convierte a dtype las columnas int64 cuyos valores caben en él."""
+    info = np.iinfo(dtype)
+    for col in df.columns:
+        serie = df[col]
+        if serie.dtype == np.int64 and len(serie) and info.min <= serie.min() and serie.max() <= info.max:
+            df[col] = serie.astype(dtype)
+    return df
+
+CSV_ENGINES = ('c', 'pyarrow')
+
+def get_csv_engine(default=None):
+    """
+    Lee el motor de pd.read_csv desde CSV_ENGINE: 'c' (por defecto) o 'pyarrow'
+    (paquete opcional, lectura multihilo). No aplica a la lectura por bloques.
+    """
+    value = os.environ.get('CSV_ENGINE', '').strip().lower()
+    if not value:
+        return default
+    if value not in CSV_ENGINES:
+        raise ValueError(f"CSV_ENGINE debe ser uno de {CSV_ENGINES}, no '{value}'")
+    return value
+
+class Utf8OrLatin1Reader(io.RawIOBase):
+    """
+    Lectura binaria de un CSV como UTF-8 en una sola pasada: los bytes UTF-8 válidos
+    pasan tal cual y, desde el primer byte que no lo es, el resto del archivo se
+    transcodifica de ISO-8859-1 a UTF-8. Así pd.read_csv parsea el archivo una
+    única vez con encoding='utf-8', sin volver a empezar al encontrar un byte inválido.
+    latin1_offset: byte desde el que se leyó como ISO-8859-1 (None si todo era UTF-8).
+    """
+
+    def __init__(self, filepath, block_size=1 << 20):
+        self._file = open(filepath, 'rb')
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._block_size = block_size
+        self._held = b''  # secuencia multibyte incompleta al final del bloque anterior
+        self._out = b''
+        self._consumed = 0
+        self.latin1_offset = None
+
+    def readable(self):
+        return True
+
+    def _convert(self, block):
+        if self.latin1_offset is not None:
+            return block.decode('ISO-8859-1').encode('utf-8')
+        data = self._held + block
+        inicio = self._consumed - len(data)
+        try:
+            self._decoder.decode(block, final=not block)
+        except UnicodeDecodeError as e:
+            # e.start es relativo a los bytes pendientes del decoder + el bloque
+            self.latin1_offset = inicio + e.start
+            return data[:e.start] + data[e.start:].decode('ISO-8859-1').encode('utf-8')
+        self._held = self._decoder.getstate()[0]
+        return data[:len(data) - len(self._held)]
+
+    def readinto(self, buffer):
+        while not self._out:
+            block = self._file.read(self._block_size)
+            self._consumed += len(block)
+            self._out = self._convert(block)
+            if not block:
+                break
+        n = min(len(buffer), len(self._out))
+        buffer[:n] = self._out[:n]
+        self._out = self._out[n:]
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+def open_csv(filepath):
+    """Abre un CSV como flujo UTF-8 (ver Utf8OrLatin1Reader) para pd.read_csv."""
+    return io.BufferedReader(Utf8OrLatin1Reader(filepath))
+
+def _warn_latin1(filepath, reader):
+    if reader.raw.latin1_offset is not None:
+        print(f"Advertencia: UTF-8 falló para {filepath} en el byte {reader.raw.latin1_offset}, "
+              f"continuando con ISO-8859-1")
+
+@profiling.stage()
+def load_data(filepath, chunksize=None, schema=None, engine=None):
+    """
+    Carga robusta de CSV. Usa UTF-8 y, desde el primer byte que no lo es, ISO-8859-1
+    (el archivo se parsea una sola vez, ver Utf8OrLatin1Reader).
     Maneja errores si el archivo no existe.
+    Con chunksize devuelve un iterador de bloques (ver iter_csv_chunks).
+    schema: CsvSchema con las columnas a leer, categóricas y downcasting.
+    engine: motor de pd.read_csv ('c' o 'pyarrow', ver get_csv_engine).
     """
     if not os.path.exists(filepath):
         print(f"ERROR: No se encontró el archivo en: {filepath}")
         return None
-        
-    try:
-        return pd.read_csv(filepath, encoding='utf-8')
-    except UnicodeDecodeError:
-        print(f"Advertencia: UTF-8 falló para {filepath}, intentando con ISO-8859-1")
-        return pd.read_csv(filepath, encoding='ISO-8859-1')
 
+    if chunksize:
+        return iter_csv_chunks(filepath, chunksize, schema=schema)
+
+    kwargs = {}
+    if schema is not None:
+        columns = None
+        if engine == 'pyarrow' and callable(schema.usecols):
+            # pyarrow necesita usecols como lista: se resuelve con la cabecera
+            with open_csv(filepath) as f:
+                columns = pd.read_csv(f, nrows=0, encoding='utf-8').columns
+        kwargs = schema.read_csv_kwargs(engine, columns)
+    with open_csv(filepath) as f:
+        df = pd.read_csv(f, encoding='utf-8', engine=engine, **kwargs)
+    _warn_latin1(filepath, f)
+    return schema.apply(df) if schema is not None else df
+
+def get_chunksize(default=None):
+    """
+    Lee el tamaño de bloque (filas) para la lectura por bloques desde CSV_CHUNKSIZE.
+    Sin valor (o <= 0) los CSV se leen completos en memoria.
+    """
+    value = os.environ.get('CSV_CHUNKSIZE', '').strip()
+    if not value:
+        return default
+    size = int(value)
+    return size if size > 0 else None
+
+def iter_csv_chunks(filepath, chunksize, schema=None, **read_csv_kwargs):
+    """
+    Lee un CSV por bloques de chunksize filas. Usa UTF-8 y, desde el primer byte que
+    no lo es, ISO-8859-1 (ver Utf8OrLatin1Reader): las filas ya entregadas no se repiten.
+    schema: CsvSchema aplicado a cada bloque (las categorías son propias de cada bloque).
+    """
+    if schema is not None:
+        read_csv_kwargs = dict(schema.read_csv_kwargs(), **read_csv_kwargs)
+        for chunk in iter_csv_chunks(filepath, chunksize, **read_csv_kwargs):
+            yield schema.apply(chunk)
+        return
+
+    with open_csv(filepath) as f:
+        yield from pd.read_csv(f, encoding='utf-8', chunksize=chunksize, **read_csv_kwargs)
+    _warn_latin1(filepath, f)
+
+def fill_text(serie, value):
+    """fillna para una columna de texto, también categórica (value se agrega como categoría)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype) and value not in serie.cat.categories:
+        if not serie.isna().any():
+            return serie
+        serie = serie.cat.add_categories([value])
+    return serie.fillna(value)
+
+@profiling.stage()
 def clean_text_columns(df, columns):
     """
     Rellena valores nulos en columnas de texto especificadas con 'N/A'.
     """
     for col in columns:
         if col in df.columns:
-            df[col] = df[col].fillna('N/A')
+            df[col] = fill_text(df[col], 'N/A')
     return df
 
+@profiling.stage(detail=lambda df, col_name, id_col_name: col_name)
 def create_catalog(df, col_name, id_col_name):
     """
     Normaliza una columna que contiene listas (ej. "Acción, Drama") en un catálogo separado.
@@ -54,60 +261,280 @@ def create_catalog(df, col_name, id_col_name):
         1. catalog_df: DataFrame con IDs únicos y nombres.
         2. relation_df: Tabla intermedia para relación muchos-a-muchos.
     """
-    # 1. Copia y limpieza básica
-    temp_df = df[['show_id', col_name]].copy()
-    # Asegurar que no sea nulo y convertir a string para evitar errores en el split
-    temp_df = temp_df[temp_df[col_name].notna() & (temp_df[col_name] != 'N/A')]
-    
-    # 2. Separar listas (Atomicidad)
-    temp_df[col_name] = temp_df[col_name].astype(str).apply(lambda x: x.split(', '))
-    exploded_df = temp_df.explode(col_name)
-    exploded_df[col_name] = exploded_df[col_name].str.strip()
-    
-    # 3. Crear catálogo único
-    unique_vals = exploded_df[col_name].unique()
-    catalog_df = pd.DataFrame(unique_vals, columns=['name']).sort_values('name')
-    # Crear ID numérico
-    catalog_df[id_col_name] = range(1, len(catalog_df) + 1)
-    
-    # 4. Crear relación (Tabla pivote)
-    relation_df = exploded_df.merge(catalog_df, left_on=col_name, right_on='name')
-    relation_df = relation_df[['show_id', id_col_name]]
-    
-    return catalog_df[[id_col_name, 'name']], relation_df
+    return create_catalogs(df, {col_name: id_col_name})[col_name]
+
+@profiling.stage(detail=lambda df, columns, key_col='show_id': ", ".join(columns))
+def create_catalogs(df, columns, key_col='show_id'):
+    """
+    Construye varios catálogos en una sola pasada sobre el DataFrame.
+    columns: diccionario {columna_con_listas: nombre_columna_id}.
+    Retorna un diccionario {columna: (catalog_df, relation_df)}.
+
+    Los valores de todas las columnas se unen y separan por ', ' de una sola vez;
+    el número de elementos de cada fila sale de contar separadores, así que la
+    clave de la relación se obtiene con np.repeat en lugar de explode. Los IDs se
+    asignan con factorize(sort=True) sobre los nombres distintos (orden alfabético,
+    desde 1) y la relación se arma con esos códigos enteros, sin merge por nombre.
+    """
+    keys = df[key_col].to_numpy()
+    valores, conteos, claves = [], [], []
+    for col in columns:
+        serie = df[col]
+        # Asegurar que no sea nulo ni 'N/A'
+        mask = (serie.notna() & (serie != 'N/A')).to_numpy()
+        vals = serie[mask].astype(str).tolist()
+        valores.append(vals)
+        conteos.append(np.fromiter((v.count(', ') for v in vals), dtype=np.int64, count=len(vals)) + 1)
+        claves.append(keys[mask])
+
+    # Separar listas (Atomicidad): un único split sobre todas las columnas
+    todos = [v for vals in valores for v in vals]
+    partes = ', '.join(todos).split(', ') if todos else []
+
+    results = {}
+    inicio = 0
+    for (col, id_col), n, k in zip(columns.items(), conteos, claves):
+        fin = inicio + int(n.sum())
+        nombres = np.array(partes[inicio:fin], dtype=object)
+        inicio = fin
+
+        # Catálogo único: strip solo sobre los valores distintos y luego
+        # códigos 0..n-1 en orden alfabético -> IDs 1..n
+        crudos, distintos = pd.factorize(nombres)
+        limpios = np.array([v.strip() for v in distintos], dtype=object)
+        orden, uniques = pd.factorize(limpios, sort=True)
+        codes = orden[crudos]
+        catalog_df = pd.DataFrame({id_col: np.arange(1, len(uniques) + 1), 'name': uniques})
+
+        # Relación (tabla pivote) a partir de los códigos enteros
+        relation_df = pd.DataFrame({key_col: np.repeat(k, n), id_col: codes + 1})
+
+        results[col] = (catalog_df, relation_df)
+    return results
 
 # --- SECCIÓN 3: GENERACIÓN DE SQL ---
 
-def df_to_sql_insert(df, table_name):
+def _sql_literal(v):
+    """Literal SQL de un único valor (misma regla que usa df_to_sql_insert)."""
+    if pd.isna(v):
+        return "NULL"
+    if isinstance(v, str):
+        # Escapar comillas simples (O'Reilly -> O''Reilly)
+        clean_str = v.replace("'", "''")
+        return f"'{clean_str}'"
+    if isinstance(v, (datetime.date, datetime.time, pd.Timestamp)):
+        return f"'{v}'"
+    if isinstance(v, datetime.timedelta):
+        return f"'{_format_time(v)}'"
+    if isinstance(v, pd.Period):
+        return f"'{v}'"
+    return str(v)
+
+def _format_time(v):
+    """Un timedelta (hora desde la medianoche) como 'HH:MM:SS[.ffffff]', igual que str(datetime.time)."""
+    micros = pd.Timedelta(v).value // 1000
+    segundos, micros = divmod(micros, 1_000_000)
+    minutos, segundos = divmod(segundos, 60)
+    horas, minutos = divmod(minutos, 60)
+    texto = f"{horas:02d}:{minutos:02d}:{segundos:02d}"
+    return f"{texto}.{micros:06d}" if micros else texto
+
+def _format_unique(col, fmt):
+    """Aplica fmt a cada valor distinto de col una sola vez y lo expande por fila."""
+    codes, uniques = pd.factorize(col)
+    # Centinela al final para los nulos (código -1); _render_column los reemplaza
+    textos = np.array([fmt(v) for v in uniques] + [""], dtype=object)
+    return textos[codes]
+
+def _quote(values):
+    """Envuelve un array de strings entre comillas simples (sin escapar)."""
+    return "'" + values + "'"
+
+def _escape_sql_text(col):
+    """Escapa y entrecomilla una columna de strings como literal SQL."""
+    return _quote(col.str.replace("'", "''", regex=False).to_numpy(dtype=object, na_value=""))
+
+def _render_column(col, value_fn, text_fn, temporal_fn, null):
+    """
+    Núcleo común del renderizado por columnas.
+    - value_fn: regla valor por valor (fallback para columnas mixtas).
+    - text_fn: transformación en bloque de una columna de strings.
+    - temporal_fn: transformación de fechas/horas ya convertidas a str.
+    - null: token para valores nulos.
+    """
+    n = len(col)
+    if n == 0:
+        return np.empty(0, dtype=object)
+
+    # Categóricas: se renderizan solo las categorías y se expanden por código
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        categories = _render_column(pd.Series(col.cat.categories), value_fn, text_fn, temporal_fn, null)
+        codes = col.cat.codes.to_numpy()
+        rendered = np.append(categories, null).astype(object)
+        return rendered[codes]
+
+    na_mask = col.isna().to_numpy()
+    dtype = col.dtype
+
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        # str(Timestamp) de cada valor distinto, igual que iterrows: astype(str)
+        # omite la hora si todas son medianoche y usa la precisión común de la columna
+        out = temporal_fn(_format_unique(col, str))
+    elif pd.api.types.is_timedelta64_dtype(dtype):
+        out = temporal_fn(_format_unique(col, _format_time))
+    elif isinstance(dtype, pd.PeriodDtype):
+        # period[D] (date_parsing.as_dates): 'YYYY-MM-DD'
+        out = temporal_fn(_format_unique(col, str))
+    elif isinstance(dtype, np.dtype) and dtype.kind == 'f':
+        # repr de float de Python == str de np.float64 (mínima representación exacta).
+        # tolist() lleva float32 a float de Python, como iterrows: 0.10000000149011612
+        out = np.array(list(map(repr, col.to_numpy().tolist())), dtype=object)
+    elif isinstance(dtype, np.dtype) and dtype.kind in 'iu':
+        out = np.array(list(map(str, col.to_numpy().tolist())), dtype=object)
+    elif isinstance(dtype, np.dtype) and dtype.kind == 'b':
+        out = col.to_numpy().astype(str).astype(object)
+    elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        kind = pd.api.types.infer_dtype(col, skipna=True)
+        if kind == 'empty':
+            out = np.full(n, null, dtype=object)
+        elif kind == 'string':
+            out = text_fn(col)
+        elif kind in ('date', 'time', 'datetime'):
+            # Los nulos quedan en "" (astype(str) sobre None falla en pandas 3)
+            out = temporal_fn(_format_unique(col, str))
+        else:
+            # Columnas mixtas: caemos a la regla valor por valor
+            return col.map(value_fn).to_numpy(dtype=object)
+    else:
+        # Tipos de extensión (Int64, boolean, ...): regla valor por valor
+        return col.astype(object).map(value_fn).to_numpy(dtype=object)
+
+    out[na_mask] = null
+    return out
+
+def _iterrows_dtypes(df):
+    """
+    Replica la conversión de tipos de iterrows: si todas las columnas comparten un
+    dtype no-objeto (ej. int + float), los valores se promueven a ese dtype común.
+    """
+    common = df.iloc[:0].to_numpy().dtype
+    if len(df.columns) > 1 and common != object:
+        return df.astype(common)
+    if common == object:
+        # En filas de tipo objeto los float32 llegan como float de Python (float64)
+        narrow = {c: 'float64' for c, t in df.dtypes.items()
+                  if isinstance(t, np.dtype) and t.kind == 'f' and t.itemsize < 8}
+        if narrow:
+            return df.astype(narrow)
+    return df
+
+def render_sql_column(col):
+    """
+    Convierte una columna completa a sus literales SQL de una sola vez.
+    Devuelve un array de objetos (str) con un literal por fila: 'texto', NULL, 123...
+    """
+    return _render_column(col, _sql_literal, _escape_sql_text, _quote, "NULL")
+
+def render_sql_rows(df, iterrows_compat=True):
+    """
+    Renderiza un DataFrame a la tupla de valores SQL de cada fila: "'a', 1, NULL".
+    iterrows_compat: promueve los dtypes como iterrows (ver _iterrows_dtypes), para
+    que df_to_sql_insert sea idéntico al original. Las tablas con DDL derivado de
+    sus dtypes (NormalizationPlan) lo desactivan: un INTEGER sale 1 y no 1.0.
+    """
+    if iterrows_compat:
+        df = _iterrows_dtypes(df)
+    columns = [render_sql_column(df.iloc[:, i]) for i in range(len(df.columns))]
+    if not columns:
+        return [""] * len(df)
+
+    # Unión en bloque: join en C sobre las columnas ya renderizadas
+    return [", ".join(values) for values in zip(*columns)]
+
+def get_batch_size(default=None):
+    """
+    Lee el tamaño de lote para INSERT multi-fila desde la variable de entorno
+    SQL_BATCH_SIZE. Sin valor (o <= 0) se usa el modo clásico de una fila por INSERT.
+    """
+    value = os.environ.get('SQL_BATCH_SIZE', '').strip()
+    if not value:
+        return default
+    size = int(value)
+    return size if size > 0 else None
+
+OUTPUT_FORMATS = ('insert', 'copy', 'tsv')
+
+def get_output_format(default='insert'):
+    """
+    Lee el formato de la sección de datos desde SQL_OUTPUT_FORMAT:
+    'insert' (por defecto), 'copy' (COPY FROM stdin en el .sql) o 'tsv'
+    (un .tsv por tabla y el .sql como script de carga con \\copy).
+    """
+    value = os.environ.get('SQL_OUTPUT_FORMAT', '').strip().lower()
+    if not value:
+        return default
+    if value not in OUTPUT_FORMATS:
+        raise ValueError(f"SQL_OUTPUT_FORMAT debe ser uno de {OUTPUT_FORMATS}, no '{value}'")
+    return value
+
+def conflict_clause(columns=None, upsert=None):
+    """
+    Cláusula ON CONFLICT de los INSERT. Por defecto DO NOTHING; con upsert (lista de
+    columnas de la clave primaria) actualiza el resto de columnas con EXCLUDED.
+    """
+    if not upsert:
+        return "ON CONFLICT DO NOTHING"
+    updates = [f"{c} = EXCLUDED.{c}" for c in columns if c not in upsert]
+    if not updates:
+        return f"ON CONFLICT ({', '.join(upsert)}) DO NOTHING"
+    return f"ON CONFLICT ({', '.join(upsert)}) DO UPDATE SET {', '.join(updates)}"
+
+def sql_insert_statements(df, table_name, columns=None, batch_size=None, upsert=None, iterrows_compat=True):
+    """
+    Genera la lista de sentencias INSERT para un DataFrame.
+    - columns: nombres de columna SQL a listar en el INSERT (por defecto, ninguno
+      en modo fila a fila y los de df.columns en modo por lotes).
+    - batch_size: si se indica, agrupa hasta batch_size filas por sentencia:
+      INSERT INTO t (cols) VALUES (...),(...) ON CONFLICT DO NOTHING;
+    - upsert: columnas de la clave primaria; las filas existentes se actualizan
+      (ON CONFLICT (pk) DO UPDATE) en lugar de ignorarse.
+    - iterrows_compat: ver render_sql_rows.
+    """
+    rows = render_sql_rows(df, iterrows_compat)
+    # Usamos ON CONFLICT DO NOTHING para evitar errores si se corre dos veces (opcional)
+    sql_columns = columns if columns is not None else [str(c) for c in df.columns]
+    suffix = f" {conflict_clause(sql_columns, upsert)};"
+
+    if batch_size:
+        if columns is None:
+            columns = [str(c) for c in df.columns]
+        prefix = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES\n"
+        return [
+            prefix + ",\n".join([f"({val_str})" for val_str in rows[i:i + batch_size]]) + suffix
+            for i in range(0, len(rows), batch_size)
+        ]
+
+    cols_str = f" ({', '.join(columns)})" if columns is not None else ""
+    prefix = f"INSERT INTO {table_name}{cols_str} VALUES ("
+    return [prefix + val_str + ")" + suffix for val_str in rows]
+
+@profiling.stage(detail=lambda df, table_name, batch_size=None: table_name)
+def df_to_sql_insert(df, table_name, batch_size=None):
     """
     Convierte un DataFrame en una cadena larga de sentencias INSERT INTO.
     Maneja Strings, Fechas, Números y Nulos.
+    El renderizado es por columnas (sin iterrows): cada columna se convierte a
+    literal SQL una sola vez y luego se concatenan en bloque.
+    Con batch_size se emiten INSERT multi-fila con lista explícita de columnas.
     """
-    statements = []
-    
     # Cabecera para legibilidad
-    statements.append(f"\n-- Datos para tabla: {table_name} --")
-    
-    for _, row in df.iterrows():
-        vals = []
-        for v in row:
-            if pd.isna(v):
-                vals.append("NULL")
-            elif isinstance(v, str):
-                # Escapar comillas simples (O'Reilly -> O''Reilly)
-                clean_str = v.replace("'", "''")
-                vals.append(f"'{clean_str}'")
-            elif isinstance(v, (datetime.date, datetime.time, pd.Timestamp)):
-                vals.append(f"'{v}'")
-            else:
-                vals.append(str(v))
-        
-        val_str = ", ".join(vals)
-        # Usamos ON CONFLICT DO NOTHING para evitar errores si se corre dos veces (opcional)
-        statements.append(f"INSERT INTO {table_name} VALUES ({val_str}) ON CONFLICT DO NOTHING;")
-    
+    header = f"\n-- Datos para tabla: {table_name} --"
+    statements = [header]
+    statements.extend(sql_insert_statements(df, table_name, batch_size=batch_size))
+
     return "\n".join(statements)
 
+@profiling.stage()
 def write_sql_file(content_list, output_path):
     """
     Escribe una lista de contenidos (strings) en un archivo SQL.
@@ -123,7 +550,352 @@ def write_sql_file(content_list, output_path):
                 f.write("\n".join(content_list))
             else:
                 f.write(content_list)
-                
+
+        profiling.record_bytes(os.path.getsize(output_path))
         print("¡SQL Generado exitosamente!")
     except Exception as e:
         print(f"Error escribiendo archivo: {e}")
+
+# --- SECCIÓN 4: EXPORTACIÓN COPY (PostgreSQL) ---
+
+COPY_NULL = "\\N"
+
+# Escapes del formato texto de COPY: barra invertida, tabulador y saltos de línea
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def _copy_value(v):
+    """Valor en formato texto de COPY (misma regla de tipos que _sql_literal)."""
+    if pd.isna(v):
+        return COPY_NULL
+    if isinstance(v, datetime.timedelta):
+        return _format_time(v)
+    return str(v).translate(_COPY_ESCAPES)
+
+def _escape_copy_text(col):
+    """Escapa una columna de strings para el formato texto de COPY."""
+    return col.str.translate(_COPY_ESCAPES).to_numpy(dtype=object, na_value="")
+
+def render_copy_column(col):
+    """Convierte una columna completa al formato texto de COPY (\\N para nulos)."""
+    return _render_column(col, _copy_value, _escape_copy_text, lambda values: values, COPY_NULL)
+
+def render_copy_rows(df):
+    """
+    Renderiza un DataFrame a líneas de COPY separadas por tabulador.
+    A diferencia de los INSERT no se promueven dtypes (COPY no acepta "1.0" en INTEGER).
+    """
+    columns = [render_copy_column(df.iloc[:, i]) for i in range(len(df.columns))]
+    if not columns:
+        return [""] * len(df)
+    return ["\t".join(values) for values in zip(*columns)]
+
+def sql_copy_block(df, table_name, columns=None):
+    """
+    Genera un bloque COPY ... FROM stdin; con sus datos y el terminador \\.
+    Compatible con psql (el bloque se puede ejecutar con psql -f).
+    """
+    if columns is None:
+        columns = [str(c) for c in df.columns]
+    lines = [f"COPY {table_name} ({', '.join(columns)}) FROM stdin;"]
+    lines.extend(render_copy_rows(df))
+    lines.append("\\.")
+    return lines
+
+def df_to_copy(df, table_name, columns=None):
+    """
+    Igual que df_to_sql_insert pero con un bloque COPY en lugar de INSERTs.
+    """
+    header = f"\n-- Datos para tabla: {table_name} --"
+    return "\n".join([header, *sql_copy_block(df, table_name, columns)])
+
+def write_table_tsv(df, table_name, tsv_dir, columns=None):
+    """
+    Escribe los datos de una tabla en <tsv_dir>/<tabla>.tsv (formato texto de COPY)
+    y devuelve la línea \\copy de psql que la carga.
+    """
+    os.makedirs(tsv_dir, exist_ok=True)
+    if columns is None:
+        columns = [str(c) for c in df.columns]
+    tsv_path = os.path.join(tsv_dir, f"{table_name}.tsv")
+    with open(tsv_path, 'w', encoding='utf-8', newline='\n') as f:
+        # Por bloques de filas para no materializar la tabla entera como texto
+        for start in range(0, len(df), STREAM_CHUNK_ROWS):
+            lines = render_copy_rows(df.iloc[start:start + STREAM_CHUNK_ROWS])
+            f.write("".join([line + "\n" for line in lines]))
+    return psql_copy_command(table_name, columns, tsv_dir)
+
+def psql_copy_command(table_name, columns, tsv_dir):
+    """Línea \\copy de psql que carga <tsv_dir>/<tabla>.tsv."""
+    # Ruta relativa a la carpeta del script SQL (psql se ejecuta desde ahí)
+    rel_path = os.path.join(os.path.basename(os.path.normpath(tsv_dir)), f"{table_name}.tsv")
+    return f"\\copy {table_name} ({', '.join(columns)}) FROM '{rel_path}'"
+
+def df_to_sql_data(df, table_name, output_format='insert', batch_size=None, tsv_dir=None):
+    """
+    Sección de datos de una tabla según el formato de salida:
+    - 'insert': sentencias INSERT (fila a fila o por lotes con batch_size).
+    - 'copy': bloque COPY ... FROM stdin; dentro del mismo script.
+    - 'tsv': escribe <tsv_dir>/<tabla>.tsv y devuelve el \\copy que lo carga.
+    """
+    header = f"\n-- Datos para tabla: {table_name} --"
+    lines = iter_table_lines(df, table_name, output_format, batch_size, tsv_dir)
+    return "\n".join([header, *lines])
+
+# --- SECCIÓN 5: ESCRITURA EN STREAMING ---
+
+# Filas renderizadas por bloque: acota la memoria del texto generado
+STREAM_CHUNK_ROWS = 50_000
+
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+def get_compression(default=None):
+    """
+    Lee la compresión del script SQL desde SQL_COMPRESSION: 'gzip', 'zstd' o vacío.
+    """
+    value = os.environ.get('SQL_COMPRESSION', '').strip().lower()
+    if not value:
+        return default
+    if value not in COMPRESSIONS:
+        raise ValueError(f"SQL_COMPRESSION debe ser uno de {tuple(COMPRESSIONS)}, no '{value}'")
+    return value
+
+def iter_table_lines(df, table_name, output_format='insert', batch_size=None, tsv_dir=None,
+                     columns=None, chunk_rows=STREAM_CHUNK_ROWS, upsert=None, iterrows_compat=True):
+    """
+    Genera las líneas de datos de una tabla (sin cabecera) renderizando por bloques
+    de chunk_rows filas, de modo que nunca se materializa la tabla entera como texto.
+    Los bloques son múltiplos de batch_size, así los lotes salen igual que sin bloques.
+    Con upsert la tabla se emite siempre como INSERT (COPY no resuelve conflictos).
+    iterrows_compat: ver render_sql_rows (solo afecta a los INSERT).
+    """
+    if output_format == 'insert' or upsert:
+        step = max(1, chunk_rows // batch_size) * batch_size if batch_size else chunk_rows
+        for start in range(0, len(df), step):
+            yield from sql_insert_statements(df.iloc[start:start + step], table_name,
+                                             columns=columns, batch_size=batch_size, upsert=upsert,
+                                             iterrows_compat=iterrows_compat)
+    elif output_format == 'copy':
+        if columns is None:
+            columns = [str(c) for c in df.columns]
+        yield f"COPY {table_name} ({', '.join(columns)}) FROM stdin;"
+        for start in range(0, len(df), chunk_rows):
+            yield from render_copy_rows(df.iloc[start:start + chunk_rows])
+        yield "\\."
+    elif output_format == 'tsv':
+        yield write_table_tsv(df, table_name, tsv_dir, columns)
+    else:
+        raise ValueError(f"Formato de salida desconocido: {output_format}")
+
+class TableSpool:
+    """
+    Acumulador en disco de una tabla que se genera por bloques (lectura por chunks).
+    Cada bloque se renderiza al llegar y se guarda en un archivo temporal (o
+    directamente en el .tsv), de modo que SqlWriter.write_spool pueda volcar las
+    tablas al script en el orden de FKs sin tenerlas en memoria.
+    iterrows_compat: ver render_sql_rows.
+    """
+
+    def __init__(self, table_name, output_format='insert', batch_size=None, tsv_dir=None,
+                 explicit_columns=False, iterrows_compat=True):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato de salida desconocido: {output_format}")
+        self.table_name = table_name
+        self.output_format = output_format
+        self.batch_size = batch_size
+        self.tsv_dir = tsv_dir
+        self.explicit_columns = explicit_columns
+        self.iterrows_compat = iterrows_compat
+        self.columns = None
+        self.sample = None  # DataFrame vacío con los dtypes del primer bloque (para DDL)
+        self.rows = 0
+
+        if output_format == 'tsv':
+            os.makedirs(tsv_dir, exist_ok=True)
+            self.tsv_path = os.path.join(tsv_dir, f"{table_name}.tsv")
+            self._file = open(self.tsv_path, 'w', encoding='utf-8', newline='\n')
+        else:
+            self._file = tempfile.TemporaryFile('w+', encoding='utf-8', newline='\n')
+
+    def append(self, df):
+        """Renderiza un bloque de filas y lo agrega al archivo de la tabla."""
+        if self.sample is None:
+            self.sample = df.iloc[:0].copy()
+            self.columns = [str(c) for c in df.columns]
+        columns = self.columns if self.explicit_columns else None
+        for start in range(0, len(df), STREAM_CHUNK_ROWS):
+            part = df.iloc[start:start + STREAM_CHUNK_ROWS]
+            if self.output_format == 'insert':
+                lines = sql_insert_statements(part, self.table_name, columns=columns,
+                                              batch_size=self.batch_size, iterrows_compat=self.iterrows_compat)
+            else:
+                lines = render_copy_rows(part)
+            self._file.write("".join([line + "\n" for line in lines]))
+        self.rows += len(df)
+
+    def iter_blocks(self, block_size=1 << 20):
+        """Itera el contenido acumulado por bloques de texto."""
+        self._file.flush()
+        self._file.seek(0)
+        while True:
+            block = self._file.read(block_size)
+            if not block:
+                break
+            yield block
+
+    def close(self):
+        self._file.close()
+
+class SqlWriter:
+    """
+    Escritor de scripts SQL en streaming (context manager).
+    Escribe DDL y tablas de forma incremental a través de un buffer, con
+    compresión gzip/zstd opcional al vuelo, sin guardar el script en memoria.
+    Con background (por defecto cuando hay compresión) la compresión y la
+    escritura corren en un hilo aparte mientras se renderiza el siguiente bloque:
+    zlib y zstd liberan el GIL, así que ambas tareas se solapan.
+
+    Uso:
+        with utils.SqlWriter(ruta, compression='gzip') as sql:
+            sql.write(ddl)
+            sql.write_table(df, 'tabla')
+    """
+
+    def __init__(self, output_path, compression=None, header=True, verbose=True, buffer_size=1 << 20,
+                 background=None):
+        if compression is None:
+            # Inferir por extensión (.gz / .zst)
+            compression = next((c for c, ext in COMPRESSIONS.items() if output_path.endswith(ext)), None)
+        elif compression not in COMPRESSIONS:
+            raise ValueError(f"Compresión desconocida: {compression}")
+        if compression and not output_path.endswith(COMPRESSIONS[compression]):
+            output_path += COMPRESSIONS[compression]
+
+        self.path = output_path
+        self.compression = compression
+        self.header = header
+        self.verbose = verbose
+        self.buffer_size = buffer_size
+        self.background = compression is not None if background is None else background
+        self.bytes_written = 0
+        self._raw = None
+        self._stream = None
+        self._queue = None
+        self._thread = None
+        self._error = None
+
+    def __enter__(self):
+        if self.verbose:
+            print(f"\n--- Generando script SQL en: {self.path} ---")
+        if self.compression == 'zstd':
+            # Dependencia opcional: solo se necesita si se pide zstd
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("La compresión zstd requiere el paquete 'zstandard' (pip install zstandard)") from None
+
+        self._raw = open(self.path, 'wb', buffering=self.buffer_size)
+        if self.compression == 'gzip':
+            import gzip
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=6)
+        elif self.compression == 'zstd':
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+
+        if self.background:
+            # Cola acotada: el renderizado no se adelanta más de unos pocos bloques
+            self._queue = queue.Queue(maxsize=8)
+            self._thread = threading.Thread(target=self._drain, daemon=True)
+            self._thread.start()
+
+        if self.header:
+            self.write("-- Script generado automáticamente\n")
+            self.write("-- Base de Datos: PostgreSQL\n\n")
+        return self
+
+    def write(self, text):
+        """Escribe texto tal cual (DDL, BEGIN/COMMIT, comentarios...)."""
+        data = text.encode('utf-8')
+        profiling.record_bytes(len(data))
+        if self._queue is not None:
+            if self._error is not None:
+                raise self._error
+            self._queue.put(data)
+        else:
+            self._stream.write(data)
+        self.bytes_written += len(data)
+
+    def _drain(self):
+        # Hilo escritor: comprime y escribe los bloques en orden de llegada
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            if self._error is None:
+                try:
+                    self._stream.write(data)
+                except Exception as e:
+                    # Se sigue vaciando la cola para no bloquear al productor
+                    self._error = e
+
+    def write_lines(self, lines):
+        """Escribe un iterable de líneas, cada una terminada en salto de línea."""
+        block = []
+        for line in lines:
+            block.append(line)
+            if len(block) >= STREAM_CHUNK_ROWS:
+                self.write("\n".join(block) + "\n")
+                block = []
+        if block:
+            self.write("\n".join(block) + "\n")
+
+    @profiling.stage(detail=lambda self, df, table_name, *args, **kwargs: table_name)
+    def write_table(self, df, table_name, output_format='insert', batch_size=None, tsv_dir=None,
+                    columns=None, header=True, upsert=None, iterrows_compat=True):
+        """
+        Escribe la sección de datos de una tabla (misma salida que df_to_sql_data)
+        renderizando por bloques de filas. upsert / iterrows_compat: ver sql_insert_statements.
+        """
+        if header:
+            self.write(f"\n-- Datos para tabla: {table_name} --\n")
+        self.write_lines(iter_table_lines(df, table_name, output_format, batch_size, tsv_dir, columns,
+                                          upsert=upsert, iterrows_compat=iterrows_compat))
+
+    def write_spool(self, spool, header=True):
+        """
+        Escribe la sección de datos de una tabla acumulada en un TableSpool
+        (misma salida que write_table) y cierra el spool.
+        """
+        if header:
+            self.write(f"\n-- Datos para tabla: {spool.table_name} --\n")
+        columns = spool.columns or []
+        if spool.output_format == 'tsv':
+            spool.close()
+            self.write(psql_copy_command(spool.table_name, columns, spool.tsv_dir) + "\n")
+            return
+        if spool.output_format == 'copy':
+            self.write(f"COPY {spool.table_name} ({', '.join(columns)}) FROM stdin;\n")
+        for block in spool.iter_blocks():
+            self.write(block)
+        if spool.output_format == 'copy':
+            self.write("\\.\n")
+        spool.close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+        if exc_type is None and self._error is not None:
+            # Error del hilo escritor que no llegó a verse en write()
+            if self.verbose:
+                print(f"Error escribiendo archivo: {self._error}")
+            raise self._error
+        if self.verbose:
+            if exc_type is None:
+                print("¡SQL Generado exitosamente!")
+            else:
+                print(f"Error escribiendo archivo: {exc}")
+        return False